@@ -0,0 +1,339 @@
+"""
+Aggregation helpers shared by the pages and the PDF/Excel generators
+"""
+import numpy as np
+import pandas as pd
+
+
+def _rank_keys(series, ascending):
+    """Float keys where smaller ranks first (missing values rank last)"""
+    if pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_timedelta64_dtype(series):
+        values = series.to_numpy().view('i8').astype(float)
+        values[series.isna().to_numpy()] = np.nan
+    else:
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    keys = values if ascending else -values
+    return np.where(np.isnan(keys), np.inf, keys)
+
+
+def percent(part, total):
+    """Share of part in total, in percent (0 when total is zero: empty filter)"""
+    return part / total * 100 if total else 0.0
+
+
+def top_n(df, column, n=15, label_column=None, ascending=False, rest_agg='sum', rest_label='Autres'):
+    """
+    First n rows of df ranked by column, without sorting the whole frame
+
+    Same result as df.sort_values(column, ascending=ascending).head(n), with ties
+    kept in their original row order (groupby output is sorted by key, so ties
+    are ordered by label). Selection is an O(len) partition around the n-th key;
+    only the candidates are sorted.
+
+    Args:
+        df: Aggregated dataframe (one row per vehicle, POI...)
+        column: Numeric column to rank on
+        n: Number of rows to keep
+        label_column: Label column of the "rest" row (defaults to the first column)
+        ascending: Rank smallest values first
+        rest_agg: Aggregation of column over the rows left out ('sum' for additive
+            measures, 'max' for speeds...), a dictionary column -> aggregation
+            for several columns, or None to skip the "rest" row
+        rest_label: Label of the "rest" row
+
+    Returns:
+        (top, rest): top rows in rank order, and a one-row dataframe aggregating
+        the other rows (None if every row fits in the top or rest_agg is None)
+    """
+    keys = _rank_keys(df[column], ascending)
+    if n >= len(keys):
+        order = np.argsort(keys, kind='stable')
+    else:
+        # Tous les candidats <= n-ième clé (égalités comprises), puis tri stable des seuls candidats
+        kth = np.partition(keys, n - 1)[n - 1]
+        candidates = np.flatnonzero(keys <= kth)
+        order = candidates[np.argsort(keys[candidates], kind='stable')][:n]
+
+    top = df.iloc[order]
+    if n >= len(keys) or rest_agg is None:
+        return top, None
+
+    others = np.ones(len(keys), dtype=bool)
+    others[order] = False
+    label_column = label_column or df.columns[0]
+    aggregations = rest_agg if isinstance(rest_agg, dict) else {column: rest_agg}
+    rest = pd.DataFrame({
+        label_column: [rest_label],
+        **{name: [df[name].iloc[others].agg(agg)] for name, agg in aggregations.items()},
+        'Nb': [int(others.sum())],
+    })
+    return top, rest
+
+
+def with_rest(top, rest):
+    """
+    Chart rows of a top_n result: the top rows followed by the "rest" row
+
+    The rest row is labelled with the number of rows it groups ("Autres (12)")
+    and placed last; labels become plain strings so the bar order is kept.
+    """
+    if rest is None:
+        return top
+    label_column = rest.columns[0]
+    label = f"{rest[label_column].iloc[0]} ({rest['Nb'].iloc[0]})"
+    rest = rest.drop(columns='Nb').assign(**{label_column: label})
+    return pd.concat([top.astype({label_column: str}), rest], ignore_index=True)
+
+
+# Feuille de conduite -> valeur de la colonne 'Période' de la table unifiée des trajets
+TRIP_PERIODS = {'conduite_journee': 'Jour', 'conduite_nocturne': 'Nuit'}
+
+
+def build_trips(sheets, entities):
+    """
+    Day and night trips of an upload in one table
+
+    Args:
+        sheets: Dictionary of dataframes keyed like data_loader.SHEET_NAMES
+        entities: EntityRegistry of the upload
+
+    Returns:
+        Dataframe with the vehicle rows of the day and night sheets
+        (Regroupement, Kilométrage, Vitesse maxi) and a categorical 'Période'
+    """
+    parts = []
+    for key, period in TRIP_PERIODS.items():
+        df = sheets[key]
+        df = df.loc[entities.mask(df['Regroupement'], 'vehicle'), ['Regroupement', 'Kilométrage', 'Vitesse maxi']]
+        parts.append(df.assign(Période=period))
+    trips = pd.concat(parts, ignore_index=True)
+    trips['Période'] = pd.Categorical(trips['Période'], categories=list(TRIP_PERIODS.values()))
+    return trips
+
+
+def day_night_summary(trips, limit=50):
+    """
+    Day/night metrics per vehicle in one grouped pass over the trips table
+
+    Args:
+        trips: Table returned by build_trips
+        limit: Speed above which a trip counts as an infraction (km/h)
+
+    Returns:
+        Dataframe with one row per vehicle (sorted by plate): 'Véhicule', then
+        'Trajets', 'Km', 'Vitesse Max' and 'Infractions' suffixed with the
+        period ('Km Jour', 'Km Nuit'...), zero when the vehicle has no trip in
+        that period, and 'Total' (Km Jour + Km Nuit)
+    """
+    periods = list(TRIP_PERIODS.values())
+    grouped = trips.assign(Infractions=trips['Vitesse maxi'] > limit).groupby(
+        ['Regroupement', 'Période'], observed=True, sort=True).agg(**{
+            'Trajets': ('Kilométrage', 'size'),
+            'Km': ('Kilométrage', 'sum'),
+            'Vitesse Max': ('Vitesse maxi', 'max'),
+            'Infractions': ('Infractions', 'sum'),
+        })
+    wide = grouped.unstack('Période', fill_value=0)
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([grouped.columns, periods]), fill_value=0)
+    wide.columns = [f'{metric} {period}' for metric, period in wide.columns]
+    wide = wide.fillna(0)
+    wide['Total'] = wide['Km Jour'] + wide['Km Nuit']
+    return wide.rename_axis('Véhicule').reset_index()
+
+
+def speed_infractions(vitesse, limit=50):
+    """
+    Infraction recap of the speed sheet (page table and PDF/Excel section)
+
+    Args:
+        vitesse: Vehicle rows of the 'vitesse' sheet
+        limit: Speed above which a row is an infraction (km/h)
+
+    Returns:
+        Every row above the limit, fastest first, with the columns 'Véhicule',
+        'Vitesse Max (km/h)', 'Départ' and 'Arrivée'
+    """
+    recap = vitesse.loc[vitesse['Vitesse maxi'] > limit,
+                        ['Regroupement', 'Vitesse maxi', 'Emplacement initial', "Lieu d'arrivée"]]
+    recap = recap.sort_values('Vitesse maxi', ascending=False, kind='stable')
+    recap.columns = ['Véhicule', 'Vitesse Max (km/h)', 'Départ', 'Arrivée']
+    return recap.reset_index(drop=True)
+
+
+def _trip_details(df, entities):
+    """Detail rows of a trip sheet with the day of their "202x-xx-xx" subtotal row"""
+    column = df['Regroupement']
+    days = column.astype(str).where(entities.mask(column, 'date')).ffill()
+    details = df[entities.mask(column, 'vehicle')].copy()
+    details.insert(0, 'Jour', days[entities.mask(column, 'vehicle')])
+    return details
+
+
+def vehicle_profile(sheets, entities):
+    """
+    Week of one vehicle across the eight sheets (drill-down page and PDF)
+
+    Args:
+        sheets: Sheets restricted to the vehicle, without its total rows
+            (data_loader.vehicle_data(data, vehicle, headers=False))
+        entities: EntityRegistry of the upload
+
+    Returns:
+        Dictionary with 'metrics' (list of label/value dicts), 'daily' (trips,
+        distance and max speed per day), 'notifications' (count per type),
+        'pois' (visits per POI), 'unauthorized' and 'night' (trip details)
+    """
+    trips = sheets['duree_distance']
+    trips = trips[entities.mask(trips['Regroupement'], 'vehicle')]
+    unauthorized = _trip_details(sheets['trajets_non_autorises'], entities)
+    night = _trip_details(sheets['conduite_nocturne'], entities)
+    day_trips = _trip_details(sheets['conduite_journee'], entities)
+
+    notifications = sheets['notifications']
+    notifications = notifications[notifications['Nom de notification'] != '-----']
+    notif_types = notifications['Nom de notification'].value_counts().loc[lambda counts: counts > 0].reset_index()
+    notif_types.columns = ['Type', 'Nombre']
+
+    temps_poi = sheets['temps_poi']
+    pois = temps_poi[entities.mask(temps_poi['Regroupement'], 'poi')]
+    pois = pois.groupby('Regroupement', observed=True)['Visites'].sum().reset_index()
+    pois.columns = ['POI', 'Visites']
+    pois = pois.sort_values('Visites', ascending=False)
+
+    # Par jour: trajets et distance (feuille Durée), vitesse maxi (sous-totaux de la feuille Vitesse)
+    daily = trips.assign(Jour=trips['Début'].astype(str).str[:10]).groupby('Jour').agg(
+        **{'Trajets': ('Distance Parcourue', 'size'), 'Distance (km)': ('Distance Parcourue', 'sum')})
+    speed = sheets['vitesse']
+    speed = speed[entities.mask(speed['Regroupement'], 'date')]
+    daily_speed = speed.groupby(speed['Regroupement'].astype(str))['Vitesse maxi'].max()
+    daily = daily.join(daily_speed.rename('Vitesse Max').rename_axis('Jour'), how='outer')
+    daily = daily.fillna({'Trajets': 0, 'Distance (km)': 0}).astype({'Trajets': int}).reset_index()
+
+    speeds = pd.concat([day_trips['Vitesse maxi'], night['Vitesse maxi'], speed['Vitesse maxi']])
+    metrics = [
+        {'label': 'Trajets', 'value': len(trips)},
+        {'label': 'Distance (km)', 'value': round(float(trips['Distance Parcourue'].sum()), 1)},
+        {'label': 'Trajets Non Autorisés', 'value': len(unauthorized)},
+        {'label': 'Trajets de Nuit', 'value': len(night)},
+        {'label': 'Distance Nuit (km)', 'value': round(float(night['Kilométrage'].sum()), 1)},
+        {'label': 'Notifications', 'value': len(notifications)},
+        {'label': 'Visites POI', 'value': int(pois['Visites'].sum())},
+        {'label': 'Vitesse Max (km/h)', 'value': int(speeds.max()) if len(speeds) else 0},
+    ]
+    return {
+        'metrics': metrics,
+        'daily': daily,
+        'notifications': notif_types,
+        'pois': pois,
+        'unauthorized': unauthorized,
+        'night': night,
+    }
+
+
+def _codes(series):
+    """Integer codes (-1 for missing) and labels of a column"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(dtype=np.int64), series.cat.categories
+    codes, labels = pd.factorize(series, sort=True)
+    return codes.astype(np.int64), labels
+
+
+class SparseCounts:
+    """
+    Crosstab of row counts stored as COO triplets (only the non-zero cells)
+
+    Attributes:
+        rows, columns: Labels of the observed rows / columns, in label order
+        row_codes, column_codes: Position in rows / columns of every non-zero cell
+        counts: Count of every non-zero cell
+        row_name, column_name: Names used for the labels in the output frames
+    """
+
+    def __init__(self, rows, columns, row_codes, column_codes, counts, row_name, column_name):
+        self.rows = rows
+        self.columns = columns
+        self.row_codes = row_codes
+        self.column_codes = column_codes
+        self.counts = counts
+        self.row_name = row_name
+        self.column_name = column_name
+
+    @property
+    def shape(self):
+        return len(self.rows), len(self.columns)
+
+    @property
+    def nnz(self):
+        return len(self.counts)
+
+    def row_totals(self):
+        """Total per row label"""
+        totals = np.bincount(self.row_codes, weights=self.counts, minlength=len(self.rows)).astype(np.int64)
+        return pd.Series(totals, index=pd.Index(self.rows, name=self.row_name), name='Total')
+
+    def column_totals(self):
+        """Total per column label"""
+        totals = np.bincount(self.column_codes, weights=self.counts, minlength=len(self.columns)).astype(np.int64)
+        return pd.Series(totals, index=pd.Index(self.columns, name=self.column_name), name='Total')
+
+    def to_long(self, value_name='Nombre'):
+        """One line per non-zero cell: row label, column label, count"""
+        return pd.DataFrame({
+            self.row_name: np.asarray(self.rows, dtype=object)[self.row_codes],
+            self.column_name: np.asarray(self.columns, dtype=object)[self.column_codes],
+            value_name: self.counts,
+        })
+
+    def to_dense(self, rows=None):
+        """
+        Dense frame (rows x columns, zeros filled), optionally for some row labels only
+
+        Args:
+            rows: Row labels to materialize, in this order (None: every row)
+        """
+        if rows is None:
+            positions = np.arange(len(self.rows))
+            labels = list(self.rows)
+        else:
+            labels = list(rows)
+            positions = pd.Index(self.rows).get_indexer(labels)
+        # Position de chaque ligne demandée dans le résultat (-1: non demandée)
+        target = np.full(len(self.rows), -1)
+        target[positions[positions >= 0]] = np.flatnonzero(positions >= 0)
+        keep = target[self.row_codes] >= 0
+        dense = np.zeros((len(labels), len(self.columns)), dtype=np.int64)
+        dense[target[self.row_codes[keep]], self.column_codes[keep]] = self.counts[keep]
+        return pd.DataFrame(dense, index=pd.Index(labels, name=self.row_name),
+                            columns=[str(column) for column in self.columns])
+
+
+def sparse_counts(df, row_column, column_column, row_name=None, column_name=None):
+    """
+    Count the rows of df per (row_column, column_column) pair without a dense pivot
+
+    The two columns are turned into integer codes (the categorical codes when
+    the columns are dictionary-encoded), compacted to the observed values, and
+    the pairs are counted with np.unique on code_row * n_columns + code_column,
+    which only materializes the non-empty cells (np.bincount would allocate
+    the full rows x columns array).
+
+    Returns:
+        SparseCounts
+    """
+    row_codes, row_labels = _codes(df[row_column])
+    column_codes, column_labels = _codes(df[column_column])
+    valid = (row_codes >= 0) & (column_codes >= 0)
+    observed_rows, row_codes = np.unique(row_codes[valid], return_inverse=True)
+    observed_columns, column_codes = np.unique(column_codes[valid], return_inverse=True)
+
+    width = max(len(observed_columns), 1)
+    cells, counts = np.unique(row_codes.astype(np.int64) * width + column_codes, return_counts=True)
+    return SparseCounts(
+        rows=np.asarray(row_labels)[observed_rows],
+        columns=np.asarray(column_labels)[observed_columns],
+        row_codes=cells // width,
+        column_codes=cells % width,
+        counts=counts,
+        row_name=row_name or row_column,
+        column_name=column_name or column_column,
+    )
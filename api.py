@@ -0,0 +1,468 @@
+"""
+Local REST API over the report data and exports (Starlette)
+
+The loaders, the page generators (pdf_generators.PDF_GENERATORS) and the
+export queue of the app, for the internal tools that need the aggregates or
+the reports without going through Streamlit:
+
+    POST   /uploads                       body: .xlsx workbook or .zip of workbooks (?name=...)
+    GET    /uploads/{id}                  workbooks, period, vehicles
+    DELETE /uploads/{id}                  release the upload
+    GET    /uploads/{id}/pages            pages with aggregates
+    GET    /uploads/{id}/pages/{page}     sheets and aggregate tables of a page (JSON, or Arrow
+                                          with ?format=arrow&table=<name>)
+    GET    /uploads/{id}/vehicles         plates
+    GET    /uploads/{id}/vehicles/{plate} profile of one vehicle (JSON or Arrow, same parameters)
+    POST   /uploads/{id}/exports?kind=... queue a full export (pdf, xlsx, html, parquet, feather, csv)
+    GET    /jobs/{id}                     status and queue position of an export
+    GET    /jobs/{id}/file                the exported file once done
+
+The page, vehicle and export endpoints take the filters of the app sidebar:
+?vehicle=<plate> (repeated) and ?start=/?end= (ISO dates).
+
+Uploads are parsed once in the process-wide shared_store (id = content hash,
+re-posting the same file returns the same id without parsing it again) and
+released after API_UPLOAD_TTL idle seconds, or as soon as memory_budget evicts
+them. Exports go through export_queue: same workers, round robin between
+clients, identical requests share one job; finished jobs are forgotten after
+the queue's EXPORT_RESULT_TTL. Both tables are swept on every request.
+
+Every data response carries an ETag derived from the upload content hash,
+the filter parameters and the request, and Cache-Control: no-cache. The ETag
+is computed from the URL alone: a client sending it back in If-None-Match
+gets 304 Not Modified before the filter is applied, the tables computed or the
+report downloaded again. Serialized bodies are cached in the 'aggregates'
+category of memory_budget. A filter that leaves a page without rows returns
+its (empty) tables with a 'message' field, not an error.
+
+Usage:
+    python api.py --port 8000
+    uvicorn api:app --port 8000
+
+Configuration (environment variables):
+    API_UPLOAD_TTL: seconds an unused upload stays in memory (default 3600)
+    API_MAX_UPLOAD_MB: largest accepted upload (default 200)
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import date
+from urllib.parse import quote
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import aggregates
+import columnar_export
+import data_loader
+import export_delivery
+import export_queue
+import memory_budget
+import pdf_generators
+import shared_store
+
+UPLOAD_TTL = int(os.environ.get('API_UPLOAD_TTL', '3600'))
+MAX_UPLOAD_SIZE = int(float(os.environ.get('API_MAX_UPLOAD_MB', '200')) * 1024 * 1024)
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Pages exposées: la fiche véhicule a sa propre route (/vehicles/{plate})
+PAGES = [page for page in pdf_generators.PDF_GENERATORS if page != 'vehicule']
+
+# Id d'upload -> {'lease', 'name', 'used'}; id d'export -> (job, nom de fichier, type MIME)
+_uploads = {}
+_jobs = {}
+_responses = memory_budget.BudgetedCache('api_responses')
+
+
+def _error(status, message):
+    return HTTPException(status_code=status, detail=message)
+
+
+async def _http_error(request, exc):
+    return JSONResponse({'error': exc.detail}, status_code=exc.status_code, headers=exc.headers)
+
+
+# --- Uploads ---
+
+def _expire_uploads():
+    """Forget the uploads idle for UPLOAD_TTL seconds or evicted by the memory budget"""
+    now = time.time()
+    for upload_id, upload in list(_uploads.items()):
+        # Bail révoqué: sa vue retiendrait encore les feuilles que le budget vient de libérer
+        if upload['lease'].revoked or now - upload['used'] > UPLOAD_TTL:
+            del _uploads[upload_id]
+            upload['lease'].release()
+
+
+def _sweep():
+    """Drop the expired uploads and export jobs (called by every request: no background thread)"""
+    _expire_uploads()
+    _expire_jobs()
+
+
+def _upload(upload_id):
+    """Lease of an upload, refreshed for the memory budget and the idle TTL"""
+    _sweep()
+    upload = _uploads.get(upload_id)
+    if upload is None:
+        raise _error(404, f"upload inconnu ou expiré, renvoyez le fichier: {upload_id}")
+    upload['used'] = time.time()
+    upload['lease'].touch()
+    return upload
+
+
+def _filter_params(request):
+    """(vehicles, start, end) of the ?vehicle=, ?start=, ?end= parameters, as given to apply_filter"""
+    params = request.query_params
+    try:
+        start = date.fromisoformat(params['start']) if params.get('start') else None
+        end = date.fromisoformat(params['end']) if params.get('end') else None
+    except ValueError:
+        raise _error(400, "dates attendues au format AAAA-MM-JJ (start, end)")
+    return tuple(params.getlist('vehicle')), start, end
+
+
+def _filtered(request, upload):
+    """Data of an upload restricted by the ?vehicle=, ?start=, ?end= parameters"""
+    return data_loader.apply_filter(upload['lease'].data, *_filter_params(request))
+
+
+def _summary(upload_id, upload):
+    data = upload['lease'].data
+    first_day, last_day = data.index.first_day, data.index.last_day
+    return {
+        'id': upload_id,
+        'name': upload['name'],
+        'workbooks': [{'name': workbook['name'], 'duplicate': workbook['duplicate']} for workbook in data.workbooks],
+        'period': {'start': first_day.isoformat() if first_day else None,
+                   'end': last_day.isoformat() if last_day else None},
+        'vehicles': sorted(map(str, data_loader.get_entities(data).vehicles)),
+        'links': {'pages': f"/uploads/{upload_id}/pages", 'vehicles': f"/uploads/{upload_id}/vehicles",
+                  'exports': f"/uploads/{upload_id}/exports"},
+    }
+
+
+async def create_upload(request):
+    _sweep()
+    payload = await request.body()
+    if not payload:
+        raise _error(400, "corps de requête vide: envoyez le classeur .xlsx ou une archive .zip")
+    if len(payload) > MAX_UPLOAD_SIZE:
+        raise _error(413, f"fichier trop volumineux (maximum {MAX_UPLOAD_SIZE // (1024 * 1024)} Mo)")
+    name = request.query_params.get('name', 'rapport.xlsx')
+    # Même clé que l'app (load_data): un fichier déjà importé n'est pas relu
+    upload_id = data_loader.merged_hash([data_loader.content_hash(payload)])
+    upload = _uploads.get(upload_id)
+    if upload is not None:
+        upload['used'] = time.time()
+        return JSONResponse(_summary(upload_id, upload))
+
+    source = io.BytesIO(payload)
+    source.name = name
+    try:
+        lease = await run_in_threadpool(shared_store.get_store().acquire, upload_id,
+                                        lambda: data_loader.read_workbooks([source]))
+    except ValueError as e:
+        raise _error(422, str(e))
+    _uploads[upload_id] = upload = {'lease': lease, 'name': name, 'used': time.time()}
+    return JSONResponse(_summary(upload_id, upload), status_code=201,
+                        headers={'Location': f"/uploads/{upload_id}"})
+
+
+async def get_upload(request):
+    upload_id = request.path_params['upload_id']
+    return JSONResponse(_summary(upload_id, _upload(upload_id)))
+
+
+async def delete_upload(request):
+    upload_id = request.path_params['upload_id']
+    _upload(upload_id)
+    _uploads.pop(upload_id)['lease'].release()
+    return Response(status_code=204)
+
+
+# --- Agrégats ---
+
+def _etag(*parts):
+    return '"' + hashlib.sha256(repr(parts).encode()).hexdigest()[:32] + '"'
+
+
+def _not_modified(request, etag):
+    tags = [tag.strip().removeprefix('W/') for tag in request.headers.get('if-none-match', '').split(',')]
+    return etag in tags or '*' in tags
+
+
+async def _cached(request, etag, media_type, build, headers=None):
+    """
+    Response whose body depends only on its ETag
+
+    304 when the client already has it; otherwise the body cached for the
+    ETag, built in a worker thread (build, without arguments) on a miss.
+    """
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', **(headers or {})}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = _responses.get(etag)
+    if body is None:
+        body = await run_in_threadpool(build)
+        _responses.put(etag, body, {'aggregates': len(body)})
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def _named_tables(data, page, sections):
+    """
+    (name, title, dataframe) of a page, named like the BI export (columnar_export.collect_tables)
+
+    donnees/<sheet> are the sheets of the page (none if page is None),
+    agregats/<section> the non-empty tables of its sections.
+    """
+    tables = columnar_export.collect_tables(data, current_page=page, report_content=sections)
+    titles = iter([section.get('title') for section in sections
+                   if section.get('table') is not None and not section['table'].empty])
+    return [(name, data_loader.SHEET_NAMES[name.removeprefix('donnees/')] if name.startswith('donnees/') else next(titles), df)
+            for name, df in tables.items()]
+
+
+def _tables_json(header, tables):
+    """JSON object with the header fields and the tables (orient='split', written by pandas)"""
+    items = [f'{{"name": {json.dumps(name)}, "title": {json.dumps(title, ensure_ascii=False)}, '
+             f'"table": {df.to_json(orient="split", index=False, date_format="iso", force_ascii=False)}}}'
+             for name, title, df in tables]
+    return (json.dumps(header, ensure_ascii=False)[:-1] + ', "tables": [' + ', '.join(items) + ']}').encode()
+
+
+def _arrow_stream(tables, name):
+    import pyarrow as pa
+
+    if name is None and len(tables) == 1:
+        name = tables[0][0]
+    matches = [df for table_name, _, df in tables if table_name == name]
+    if not matches:
+        raise _error(400, "paramètre table requis pour le format arrow, parmi: "
+                          + ", ".join(table_name for table_name, _, _ in tables))
+    table = columnar_export.to_arrow(matches[0])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+async def _tables_response(request, upload, resource, header, tables):
+    """
+    JSON or Arrow response of tables, keyed by upload content, filter parameters and resource
+
+    The ETag only depends on the request: the filter is applied (and header,
+    tables called with the filtered data) when the body has to be built.
+    """
+    fmt = request.query_params.get('format', 'json')
+    if fmt not in ('json', 'arrow'):
+        raise _error(400, f"format inconnu: {fmt} (json ou arrow)")
+    table = request.query_params.get('table')
+    filters = _filter_params(request)
+    etag = _etag(upload['lease'].data.content_hash, filters, resource, fmt, table if fmt == 'arrow' else None)
+
+    def filtered():
+        return data_loader.apply_filter(upload['lease'].data, *filters)
+
+    if fmt == 'json':
+        def build():
+            data = filtered()
+            return _tables_json(header(data), tables(data))
+        return await _cached(request, etag, 'application/json', build)
+    return await _cached(request, etag, ARROW_STREAM, lambda: _arrow_stream(tables(filtered()), table))
+
+
+async def list_pages(request):
+    upload_id = request.path_params['upload_id']
+    _upload(upload_id)
+    return JSONResponse({'pages': [{'page': page, 'url': f"/uploads/{upload_id}/pages/{page}"} for page in PAGES]})
+
+
+async def get_page(request):
+    page = request.path_params['page']
+    if page not in PAGES:
+        raise _error(404, f"page inconnue: {page} (pages: {', '.join(PAGES)})")
+    upload = _upload(request.path_params['upload_id'])
+    return await _tables_response(request, upload, ('page', page), lambda data: _page_header(data, page),
+                                  lambda data: _named_tables(data, page, pdf_generators.page_content(page, data)))
+
+
+def _page_header(data, page):
+    header = {'page': page, 'filters': _filters_json(data)}
+    if not data_loader.page_has_rows(data, page):
+        header['message'] = pdf_generators.NO_DATA_MESSAGE
+    return header
+
+
+def _filters_json(data):
+    if not data.filters:
+        return None
+    return {'vehicles': data.filters['vehicles'],
+            'start': data.filters['start'].isoformat() if data.filters['start'] else None,
+            'end': data.filters['end'].isoformat() if data.filters['end'] else None}
+
+
+async def list_vehicles(request):
+    upload_id = request.path_params['upload_id']
+    data = _filtered(request, _upload(upload_id))
+    return JSONResponse({'vehicles': [{'vehicle': str(vehicle), 'url': f"/uploads/{upload_id}/vehicles/{quote(str(vehicle))}"}
+                                      for vehicle in data_loader.vehicle_choices(data)]})
+
+
+def _vehicle_sections(data, vehicle):
+    vdata = data_loader.vehicle_data(data, vehicle, headers=False)
+    profile = aggregates.vehicle_profile(vdata, vdata.entities)
+    metrics = {'title': 'metrics', 'table': pd.DataFrame(profile['metrics'])}
+    return [metrics] + [{'title': name, 'table': profile[name]}
+                        for name in ('daily', 'notifications', 'pois', 'unauthorized', 'night')]
+
+
+async def get_vehicle(request):
+    vehicle = request.path_params['vehicle']
+    upload = _upload(request.path_params['upload_id'])
+    choices = {str(choice): choice for choice in data_loader.get_entities(upload['lease'].data).vehicles}
+    if vehicle not in choices:
+        raise _error(404, f"véhicule inconnu: {vehicle}")
+    return await _tables_response(request, upload, ('vehicle', vehicle),
+                                  lambda data: {'vehicle': vehicle, 'filters': _filters_json(data)},
+                                  lambda data: _named_tables({}, None, _vehicle_sections(data, choices[vehicle])))
+
+
+# --- Exports ---
+
+def _build_pdf(data):
+    import export_utils
+    output = export_utils.create_pdf_report("Rapport Complet", pdf_generators.generate_full_report(data),
+                                            output=export_delivery.spooled_output())
+    return export_delivery.read_all(output)
+
+
+def _build_xlsx(data):
+    import export_utils
+    output = export_utils.export_data_to_excel(data, current_page=None,
+                                               report_content=pdf_generators.generate_structured_report(data),
+                                               output=export_delivery.spooled_output())
+    return export_delivery.read_all(output)
+
+
+def _build_html(data):
+    import export_utils
+    output = export_utils.create_html_report("Rapport Complet", pdf_generators.generate_full_report(data),
+                                             output=export_delivery.spooled_output())
+    return export_delivery.read_all(output)
+
+
+def _build_data(data, fmt):
+    tables = columnar_export.collect_tables(data, report_content=pdf_generators.generate_structured_report(data))
+    return export_delivery.read_all(columnar_export.export_columnar(tables, fmt, output=export_delivery.spooled_output()))
+
+
+# Type d'export -> (clé de la file, comme dans l'app, fonction, nom de fichier, type MIME)
+EXPORTS = {
+    'pdf': ('pdf_all', _build_pdf, "Rapport_Complet.pdf", 'application/pdf'),
+    'xlsx': ('excel_all', _build_xlsx, "Rapport_Complet.xlsx", XLSX),
+    'html': ('html_all', _build_html, "Rapport_Complet.html", 'text/html'),
+    **{fmt: (f"data_all_{fmt}", lambda data, fmt=fmt: _build_data(data, fmt), f"Donnees_Completes.{fmt}.zip",
+             'application/zip')
+       for fmt in columnar_export.FORMATS},
+}
+
+
+def _expire_jobs():
+    ttl = export_queue.get_scheduler().result_ttl
+    now = time.time()
+    for job_id, (job, *_) in list(_jobs.items()):
+        if job.finished is not None and now - job.finished > ttl:
+            del _jobs[job_id]
+
+
+def _job_json(job):
+    status = {'id': job.id, 'status': job.status, 'url': f"/jobs/{job.id}"}
+    if job.status == 'queued':
+        status['position'] = export_queue.get_scheduler().position(job)
+    elif job.status == 'done':
+        status['file'] = f"/jobs/{job.id}/file"
+    elif job.status == 'error':
+        status['error'] = job.error
+    return status
+
+
+async def create_export(request):
+    kind = request.query_params.get('kind')
+    if kind not in EXPORTS:
+        raise _error(400, f"kind requis parmi: {', '.join(EXPORTS)}")
+    data = _filtered(request, _upload(request.path_params['upload_id']))
+    queue_kind, build, file_name, mime = EXPORTS[kind]
+    # Équité de la file: un client = une adresse (ou l'en-tête X-Client-Id)
+    client = request.headers.get('x-client-id') or (request.client.host if request.client else 'api')
+    job = export_queue.get_scheduler().submit(f"api:{client}", (data.content_hash, queue_kind, repr(data.filters)),
+                                              lambda: build(data))
+    _jobs[job.id] = (job, file_name, mime)
+    return JSONResponse(_job_json(job), status_code=202, headers={'Location': f"/jobs/{job.id}"})
+
+
+def _job(request):
+    _sweep()
+    try:
+        return _jobs[int(request.path_params['job_id'])]
+    except (KeyError, ValueError):
+        raise _error(404, f"export inconnu ou expiré: {request.path_params['job_id']}")
+
+
+async def get_job(request):
+    job, _, _ = _job(request)
+    return JSONResponse(_job_json(job))
+
+
+async def get_job_file(request):
+    job, file_name, mime = _job(request)
+    if job.pending:
+        raise _error(409, f"export en cours, consultez /jobs/{job.id}")
+    result = job.result
+    if result is None:
+        raise _error(410, f"export indisponible: {job.error}")
+    # Même contenu importé, type et filtre: même fichier, même ETag d'un export à l'autre
+    etag = _etag(*job.key)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache',
+               'Content-Disposition': f'attachment; filename="{file_name}"'}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(result, media_type=mime, headers=headers)
+
+
+routes = [
+    Route('/uploads', create_upload, methods=['POST']),
+    Route('/uploads/{upload_id}', get_upload, methods=['GET']),
+    Route('/uploads/{upload_id}', delete_upload, methods=['DELETE']),
+    Route('/uploads/{upload_id}/pages', list_pages, methods=['GET']),
+    Route('/uploads/{upload_id}/pages/{page}', get_page, methods=['GET']),
+    Route('/uploads/{upload_id}/vehicles', list_vehicles, methods=['GET']),
+    Route('/uploads/{upload_id}/vehicles/{vehicle}', get_vehicle, methods=['GET']),
+    Route('/uploads/{upload_id}/exports', create_export, methods=['POST']),
+    Route('/jobs/{job_id}', get_job, methods=['GET']),
+    Route('/jobs/{job_id}/file', get_job_file, methods=['GET']),
+]
+
+app = Starlette(routes=routes, exception_handlers={HTTPException: _http_error})
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API REST locale des données et exports des rapports hebdomadaires.")
+    parser.add_argument('--host', default='127.0.0.1', help="Adresse d'écoute (défaut: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="Port (défaut: 8000)")
+    args = parser.parse_args(argv)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,21 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-import export_utils
+import hmac
+import importlib
+import os
+import pathlib
+import uuid
+import aggregates
+import columnar_export
+import data_loader
+import export_delivery
+import export_queue
+import memory_budget
 import pdf_generators
+import perf
+import shared_store
+import ui_components
 
 # Configuration de la page
 st.set_page_config(
@@ -15,44 +28,161 @@ st.set_page_config(
 )
 
 # Fonction pour charger les données
-@st.cache_data
-def load_data(excel_file):
-    # excel_file est maintenant un objet fichier (UploadedFile) ou un path
-    
-    sheets = {}
-    sheets['duree_distance'] = pd.read_excel(excel_file, sheet_name='Durée - Distance - Conso')
-    sheets['trajets_non_autorises'] = pd.read_excel(excel_file, sheet_name='Trajets Non Autorisé')
-    sheets['conduite_journee'] = pd.read_excel(excel_file, sheet_name='Conduite en Journée')
-    sheets['conduite_nocturne'] = pd.read_excel(excel_file, sheet_name='Conduite nocturne')
-    sheets['notifications'] = pd.read_excel(excel_file, sheet_name='Notifications')
-    sheets['temps_poi'] = pd.read_excel(excel_file, sheet_name='Temps passé dans POI et ...')
-    sheets['visites_poi'] = pd.read_excel(excel_file, sheet_name='Visites POI')
-    sheets['vitesse'] = pd.read_excel(excel_file, sheet_name='Vitesse de conduite')
-    
-    return sheets
+# Une seule copie en mémoire par contenu importé, partagée par toutes les sessions (shared_store);
+# la session garde un bail sur ces données tant qu'elle travaille sur ce fichier
+def load_data(upload_keys, files):
+    # files: objets fichier (UploadedFile) ou paths, classeurs .xlsx ou archives .zip
+    key = data_loader.merged_hash(digest for _, digest in upload_keys)
+    lease = st.session_state.get("data_lease")
+    if lease is not None and lease.key == key and not lease.revoked:
+        lease.touch()
+        return lease.data
+    if lease is not None:
+        lease.release()
+        st.session_state.data_lease = None
+
+    def read_uploads():
+        load_progress = st.progress(0.0, text="Lecture des rapports...")
+
+        def show_load_progress(done, total, name):
+            load_progress.progress(done / total, text=f"Lecture {done}/{total}: {os.path.basename(name)}")
+
+        data = data_loader.read_workbooks(files, progress=show_load_progress)
+        load_progress.empty()
+        return data
+
+    with st.spinner("Chargement des données..."):
+        lease = shared_store.get_store().acquire(key, read_uploads)
+    st.session_state.data_lease = lease
+    return lease.data
+
+# Import différé de la pile d'export (reportlab, xlsxwriter, kaleido):
+# elle n'est chargée qu'au premier clic sur un bouton d'export
+def get_export_utils():
+    return importlib.import_module("export_utils")
+
+# Vues serveur (perf, mémoire): montrées seulement si le paramètre d'URL donne le jeton ADMIN_TOKEN
+# (?perf=<jeton>, ?admin=<jeton>); sans ADMIN_TOKEN elles restent fermées
+def has_admin_access(param):
+    token = os.environ.get("ADMIN_TOKEN")
+    given = st.query_params.get(param)
+    return bool(token) and given is not None and hmac.compare_digest(given.encode(), token.encode())
+
+# Véhicule de la fiche véhicule (choisi sur la page, conservé dans la session pour les exports)
+def get_drilldown_vehicle(data):
+    choices = data_loader.vehicle_choices(data)
+    vehicle = st.session_state.get("drilldown_vehicle")
+    return vehicle if vehicle in choices else (choices[0] if choices else None)
+
+# Contenu et données d'export d'une page (la fiche véhicule ne porte que sur un véhicule)
+def get_page_content(page, data):
+    if page == "vehicule":
+        return pdf_generators.generate_vehicule_pdf(data, get_drilldown_vehicle(data))
+    return pdf_generators.page_content(page, data)
+
+def get_page_data(page, data):
+    if page == "vehicule" and get_drilldown_vehicle(data) is not None:
+        return data_loader.vehicle_data(data, get_drilldown_vehicle(data))
+    return data
+
+# Exports complets: construits par la file d'attente commune à toutes les sessions (export_queue).
+# build s'exécute hors du script Streamlit et renvoie les octets du fichier.
+def queue_export(kind, data, build, label, file_name, mime):
+    key = (data.content_hash, kind, repr(data.filters))
+    job = export_queue.get_scheduler().submit(st.session_state.session_id, key, build)
+    st.session_state.export_jobs[kind] = (job, label, file_name, mime)
+
+def show_export_jobs(polling):
+    scheduler = export_queue.get_scheduler()
+    jobs = st.session_state.export_jobs
+    for kind, (job, label, file_name, mime) in jobs.items():
+        if job.status == 'queued':
+            st.info(f"⏳ {label}: en file d'attente (position {scheduler.position(job)})")
+        elif job.status == 'running':
+            st.info(f"⚙️ {label}: génération en cours...")
+        elif job.status == 'done':
+            st.download_button(label=f"⬇️ {label}", data=job.result, file_name=file_name, mime=mime,
+                               key=f"download_{kind}", use_container_width=True)
+        else:
+            st.error(f"Erreur lors de la génération ({label}): {job.error}")
+    # Tous les exports sont prêts: un dernier passage complet arrête le rafraîchissement périodique
+    if polling and not any(job.pending for job, *_ in jobs.values()):
+        st.rerun()
+
+st.session_state.setdefault("session_id", uuid.uuid4().hex)
+st.session_state.setdefault("export_jobs", {})
 
 # Chargement du fichier via la sidebar
 st.sidebar.title("📂 Import de Données")
-uploaded_file = st.sidebar.file_uploader("Choisissez un rapport Excel", type=['xlsx'])
+uploaded_files = st.sidebar.file_uploader(
+    "Choisissez un ou plusieurs rapports Excel (ou une archive .zip)",
+    type=['xlsx', 'zip'],
+    accept_multiple_files=True
+)
 
-if uploaded_file is None:
+if not uploaded_files:
     st.info("👋 Bienvenue! Veuillez importer un fichier Excel pour commencer l'analyse.")
     st.markdown("""
     ### Comment utiliser cette application ?
     1. Regardez dans le menu à gauche (Sidebar)
     2. Cliquez sur **"Browse files"** ou glissez-déposez votre fichier Excel
+       (plusieurs rapports hebdomadaires ou une archive .zip sont fusionnés en une seule période)
     3. L'analyse se lancera automatiquement
     """)
     st.stop() # Arrête l'exécution si aucun fichier n'est chargé
 
 # Charger les données depuis le fichier uploadé
 try:
-    data = load_data(uploaded_file)
-    st.sidebar.success("Fichier chargé avec succès!")
+    with perf.timer('app.load_data'):
+        upload_keys = tuple(data_loader.upload_key(f) for f in uploaded_files)
+        data = load_data(upload_keys, uploaded_files)
+    merged = [w for w in data.workbooks if not w['duplicate']]
+    duplicates = len(data.workbooks) - len(merged)
+    if len(merged) > 1:
+        st.sidebar.success(f"{len(merged)} rapports chargés et fusionnés avec succès!")
+    else:
+        st.sidebar.success("Fichier chargé avec succès!")
+    if duplicates:
+        st.sidebar.caption(f"{duplicates} fichier(s) en double ignoré(s)")
+except data_loader.SchemaError as e:
+    st.error("Fichier non conforme au rapport hebdomadaire attendu:\n\n"
+             + "\n".join(f"- {problem}" for problem in e.problems))
+    st.stop()
 except Exception as e:
     st.error(f"Erreur lors de la lecture du fichier: {e}")
     st.stop()
 
+# Filtres globaux: toutes les pages et tous les exports travaillent sur les données filtrées
+st.sidebar.markdown("---")
+st.sidebar.title("🔎 Filtres")
+
+selected_vehicles = st.sidebar.multiselect(
+    "Véhicules",
+    sorted(data_loader.get_entities(data).vehicles, key=str),
+    placeholder="Tous les véhicules"
+)
+
+start_date, end_date = None, None
+first_day, last_day = data.index.first_day, data.index.last_day
+if first_day is not None:
+    period = st.sidebar.date_input(
+        "Période",
+        value=(first_day, last_day),
+        min_value=first_day,
+        max_value=last_day,
+        format="DD/MM/YYYY"
+    )
+    if len(period) == 2 and tuple(period) != (first_day, last_day):
+        start_date, end_date = period
+    elif len(period) == 1:
+        start_date = period[0]
+
+data = data_loader.apply_filter(data, selected_vehicles, start_date, end_date)
+if data.filters:
+    vehicles_label = f"{len(selected_vehicles)} véhicule(s)" if selected_vehicles else "tous les véhicules"
+    st.sidebar.caption(f"Filtre actif: {vehicles_label}, "
+                       f"{(start_date or first_day):%d/%m/%Y} → {(end_date or last_day):%d/%m/%Y}")
+
 # Navigation dans la sidebar
 st.sidebar.markdown("---")
 st.sidebar.title("📊 Navigation")
@@ -67,7 +197,8 @@ pages = {
     "🔔 Notifications": "notifications",
     "📍 Temps dans POI": "temps_poi",
     "📍 Visites POI": "visites_poi",
-    "🏎️ Vitesse de Conduite": "vitesse"
+    "🏎️ Vitesse de Conduite": "vitesse",
+    "🔍 Fiche Véhicule": "vehicule"
 }
 
 selection = st.sidebar.radio("Sélectionnez une analyse:", list(pages.keys()))
@@ -85,16 +216,18 @@ col1, col2 = st.sidebar.columns(2)
 with col1:
     # Export Excel - Page actuelle
     if st.button("📊 Excel (Page)", key="export_excel_current", use_container_width=True):
+        export_utils = get_export_utils()
         # Generate report content for the current page
         report_content = None
         if page in pdf_generators.PDF_GENERATORS:
-            report_content = pdf_generators.PDF_GENERATORS[page](data)
+            report_content = get_page_content(page, data)
             
-        excel_data = export_utils.export_data_to_excel(data, current_page=page, report_content=report_content)
-        filename = export_utils.get_filename(selection, "xlsx")
+        excel_data = export_utils.export_data_to_excel(get_page_data(page, data), current_page=page, report_content=report_content,
+                                                      output=export_delivery.spooled_output())
+        filename = export_delivery.get_filename(selection, "xlsx")
         st.sidebar.download_button(
             label="⬇️ Télécharger Excel",
-            data=excel_data,
+            data=export_delivery.read_all(excel_data),
             file_name=filename,
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             key="download_excel"
@@ -103,33 +236,31 @@ with col1:
 with col2:
     # Export Excel - Toutes les données
     if st.button("📑 Excel (Tout)", key="export_excel_all", use_container_width=True):
-        with st.spinner('Génération du rapport Excel complet...'):
+        def build_excel_all(data=data):
             # Generate structured report content (dict of sheets)
             full_report_content = pdf_generators.generate_structured_report(data)
-            
-            excel_data_all = export_utils.export_data_to_excel(data, current_page=None, report_content=full_report_content)
-            filename_all = export_utils.get_filename("Rapport_Complet", "xlsx")
-            st.sidebar.download_button(
-                label="⬇️ Télécharger Excel Complet",
-                data=excel_data_all,
-                file_name=filename_all,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_excel_all"
-            )
+            excel_data_all = get_export_utils().export_data_to_excel(data, current_page=None, report_content=full_report_content,
+                                                                     output=export_delivery.spooled_output())
+            return export_delivery.read_all(excel_data_all)
+
+        queue_export("excel_all", data, build_excel_all, "Excel Complet",
+                     export_delivery.get_filename("Rapport_Complet", "xlsx"),
+                     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 st.sidebar.markdown("---")
 
 # PDF Export - Page actuelle
 if st.sidebar.button("📄 PDF (Page)", key="export_pdf", use_container_width=True):
     try:
+        export_utils = get_export_utils()
         # Generate PDF content on-demand using the generator for the current page
         if page in pdf_generators.PDF_GENERATORS:
-            pdf_content = pdf_generators.PDF_GENERATORS[page](data)
-            pdf_data = export_utils.create_pdf_report(selection, pdf_content)
-            filename_pdf = export_utils.get_filename(selection, "pdf")
+            pdf_content = get_page_content(page, data)
+            pdf_data = export_utils.create_pdf_report(selection, pdf_content, output=export_delivery.spooled_output())
+            filename_pdf = export_delivery.get_filename(selection, "pdf")
             st.sidebar.download_button(
                 label="⬇️ Télécharger PDF",
-                data=pdf_data,
+                data=export_delivery.read_all(pdf_data),
                 file_name=filename_pdf,
                 mime="application/pdf",
                 key="download_pdf"
@@ -141,23 +272,100 @@ if st.sidebar.button("📄 PDF (Page)", key="export_pdf", use_container_width=Tr
 
 # PDF Export - Complet
 if st.sidebar.button("📑 PDF (Tout)", key="export_pdf_all", use_container_width=True):
-    try:
-        with st.spinner('Génération du rapport complet...'):
-            pdf_content = pdf_generators.generate_full_report(data)
-            pdf_data = export_utils.create_pdf_report("Rapport Complet", pdf_content)
-            filename_pdf = export_utils.get_filename("Rapport_Complet", "pdf")
+    def build_pdf_all(data=data):
+        pdf_content = pdf_generators.generate_full_report(data)
+        pdf_data = get_export_utils().create_pdf_report("Rapport Complet", pdf_content, output=export_delivery.spooled_output())
+        return export_delivery.read_all(pdf_data)
+
+    queue_export("pdf_all", data, build_pdf_all, "Rapport Complet (PDF)",
+                 export_delivery.get_filename("Rapport_Complet", "pdf"), "application/pdf")
+
+# Export HTML interactif (graphiques Plotly et tableaux complets, consultable hors ligne)
+col5, col6 = st.sidebar.columns(2)
+
+with col5:
+    if st.button("🌐 HTML (Page)", key="export_html", use_container_width=True):
+        if page in pdf_generators.PDF_GENERATORS:
+            html_data = get_export_utils().create_html_report(selection, get_page_content(page, data),
+                                                              output=export_delivery.spooled_output())
             st.sidebar.download_button(
-                label="⬇️ Télécharger Rapport Complet",
-                data=pdf_data,
-                file_name=filename_pdf,
-                mime="application/pdf",
-                key="download_pdf_all"
+                label="⬇️ Télécharger HTML",
+                data=export_delivery.read_all(html_data),
+                file_name=export_delivery.get_filename(selection, "html"),
+                mime="text/html",
+                key="download_html"
+            )
+        else:
+            st.sidebar.info("Export HTML non disponible pour cette page.")
+
+with col6:
+    if st.button("🌐 HTML (Tout)", key="export_html_all", use_container_width=True):
+        def build_html_all(data=data):
+            html_data = get_export_utils().create_html_report("Rapport Complet", pdf_generators.generate_full_report(data),
+                                                              output=export_delivery.spooled_output())
+            return export_delivery.read_all(html_data)
+
+        queue_export("html_all", data, build_html_all, "Rapport HTML",
+                     export_delivery.get_filename("Rapport_Complet", "html"), "text/html")
+
+# Export des données pour les outils BI (Parquet, Arrow IPC, CSV): feuilles normalisées + tableaux agrégés
+st.sidebar.markdown("---")
+data_format = st.sidebar.selectbox(
+    "Format des données (BI)",
+    list(columnar_export.FORMATS),
+    format_func=lambda fmt: columnar_export.FORMATS[fmt]['label'],
+    key="data_format"
+)
+
+col3, col4 = st.sidebar.columns(2)
+
+with col3:
+    if st.button("🗂️ Données (Page)", key="export_data_current", use_container_width=True):
+        report_content = get_page_content(page, data) if page in pdf_generators.PDF_GENERATORS else None
+        tables = columnar_export.collect_tables(get_page_data(page, data), current_page=page, report_content=report_content)
+        archive = columnar_export.export_columnar(tables, data_format, output=export_delivery.spooled_output())
+        st.sidebar.download_button(
+            label="⬇️ Télécharger Données",
+            data=export_delivery.read_all(archive),
+            file_name=export_delivery.get_filename(selection, f"{data_format}.zip"),
+            mime="application/zip",
+            key="download_data"
+        )
+
+with col4:
+    if st.button("🗂️ Données (Tout)", key="export_data_all", use_container_width=True):
+        def build_data_all(data=data, data_format=data_format):
+            tables = columnar_export.collect_tables(data, report_content=pdf_generators.generate_structured_report(data))
+            archive = columnar_export.export_columnar(tables, data_format, output=export_delivery.spooled_output())
+            return export_delivery.read_all(archive)
+
+        queue_export(f"data_all_{data_format}", data, build_data_all, "Toutes les Données",
+                     export_delivery.get_filename("Donnees_Completes", f"{data_format}.zip"), "application/zip")
+
+st.sidebar.caption("💡 **Excel/PDF/HTML**: Utilisez les boutons (Tout) pour le rapport complet")
+
+# Rapports déjà générés par le service de dossier surveillé (watcher.py) pour ce fichier, sans filtre
+if os.environ.get("WATCHER_STATE") and data.filters is None:
+    import watcher
+    prebuilt = watcher.prebuilt_reports(data.content_hash, os.environ["WATCHER_STATE"])
+    if prebuilt:
+        st.sidebar.markdown("**📦 Rapports pré-générés**")
+        for fmt, path in sorted(prebuilt.items()):
+            # Fichier lu au clic seulement (fonction), pas à chaque rerun de la page
+            st.sidebar.download_button(
+                label=f"⬇️ {os.path.basename(path)}",
+                data=lambda path=path: pathlib.Path(path).read_bytes(),
+                file_name=os.path.basename(path),
+                mime="application/pdf" if fmt == "pdf" else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key=f"download_prebuilt_{fmt}",
+                use_container_width=True
             )
-        st.sidebar.success("Rapport complet généré !")
-    except Exception as e:
-        st.sidebar.error(f"Erreur lors de la génération du rapport complet: {str(e)}")
-        
-st.sidebar.caption("💡 **Excel/PDF**: Utilisez les boutons (Tout) pour le rapport complet")
+
+# Suivi des exports complets de la session (rafraîchi chaque seconde tant qu'un export est en attente)
+if st.session_state.export_jobs:
+    export_polling = any(job.pending for job, *_ in st.session_state.export_jobs.values())
+    with st.sidebar:
+        st.fragment(run_every=1 if export_polling else None)(show_export_jobs)(export_polling)
 
 
 # Fonction utilitaire pour extraire les véhicules
@@ -184,8 +392,16 @@ def parse_duration(duration_str):
     except:
         return 0
 
+# Chronométrage du rendu de la page (agrégations + construction des graphiques)
+page_timer = perf.timer(f'app.page.{page}').start()
+
+# ===== FILTRE SANS DONNÉES =====
+if not data_loader.page_has_rows(data, page):
+    st.title(selection)
+    st.info(f"ℹ️ {pdf_generators.NO_DATA_MESSAGE}")
+
 # ===== PAGE SYNTHÈSE =====
-if page == "synthese":
+elif page == "synthese":
     st.title("📊 Rapport d'Analyses Détaillées")
     today_date = datetime.now().strftime("%d/%m/%Y")
     st.markdown(f"### BP - SADCI GAS PARAKOU - Rapport du {today_date}")
@@ -232,7 +448,7 @@ if page == "synthese":
     df_vehicles = df_duree[~df_duree['Regroupement'].str.startswith('202', na=False)]
     df_vehicles = df_vehicles[df_vehicles['Regroupement'].notna()]
     
-    distance_par_vehicule = df_vehicles.groupby('Regroupement')['Distance Parcourue'].sum().reset_index()
+    distance_par_vehicule = df_vehicles.groupby('Regroupement', observed=True)['Distance Parcourue'].sum().reset_index()
     distance_par_vehicule = distance_par_vehicule.sort_values('Distance Parcourue', ascending=True)
     
     fig = px.bar(
@@ -265,8 +481,8 @@ if page == "synthese":
     st.markdown("---")
     st.subheader("☀️🌙 Répartition Conduite Jour vs Nuit")
     
-    trajets_jour = len(data['conduite_journee'][~data['conduite_journee']['Regroupement'].str.startswith('202', na=False)])
-    trajets_nuit = len(data['conduite_nocturne'][~data['conduite_nocturne']['Regroupement'].str.startswith('202', na=False)])
+    trips_per_period = data_loader.get_trips(data)['Période'].value_counts()
+    trajets_jour, trajets_nuit = int(trips_per_period['Jour']), int(trips_per_period['Nuit'])
     
     fig_pie = px.pie(
         values=[trajets_jour, trajets_nuit],
@@ -278,9 +494,9 @@ if page == "synthese":
     
     col1, col2 = st.columns(2)
     with col1:
-        st.info(f"☀️ **Trajets de jour**: {trajets_jour} ({trajets_jour/(trajets_jour+trajets_nuit)*100:.1f}%)")
+        st.info(f"☀️ **Trajets de jour**: {trajets_jour} ({aggregates.percent(trajets_jour, trajets_jour + trajets_nuit):.1f}%)")
     with col2:
-        st.warning(f"🌙 **Trajets de nuit**: {trajets_nuit} ({trajets_nuit/(trajets_jour+trajets_nuit)*100:.1f}%)")
+        st.warning(f"🌙 **Trajets de nuit**: {trajets_nuit} ({aggregates.percent(trajets_nuit, trajets_jour + trajets_nuit):.1f}%)")
 
 # ===== PAGE DURÉE DISTANCE CONSO =====
 elif page == "duree":
@@ -294,14 +510,14 @@ elif page == "duree":
     # Métriques par véhicule
     st.subheader("📊 Distance Parcourue par Véhicule")
     
-    distance_stats = df_vehicles.groupby('Regroupement').agg({
+    distance_stats = df_vehicles.groupby('Regroupement', observed=True).agg({
         'Distance Parcourue': ['sum', 'mean', 'count']
     }).reset_index()
     distance_stats.columns = ['Véhicule', 'Distance Totale', 'Distance Moyenne', 'Nb Trajets']
-    distance_stats = distance_stats.sort_values('Distance Totale', ascending=False)
+    top_distance = aggregates.with_rest(*aggregates.top_n(distance_stats, 'Distance Totale'))
     
     fig1 = px.bar(
-        distance_stats.head(15),
+        top_distance,
         x='Véhicule',
         y='Distance Totale',
         title='Top 15 - Distance Totale par Véhicule (km)',
@@ -329,7 +545,7 @@ elif page == "duree":
     st.subheader("📈 Nombre de Trajets par Véhicule")
     
     fig2 = px.bar(
-        distance_stats.sort_values('Nb Trajets', ascending=False).head(15),
+        aggregates.with_rest(*aggregates.top_n(distance_stats, 'Nb Trajets')),
         x='Véhicule',
         y='Nb Trajets',
         title='Top 15 - Nombre de Trajets par Véhicule',
@@ -387,7 +603,7 @@ elif page == "duree":
     
     distance_stats['Distance Totale'] = distance_stats['Distance Totale'].round(2)
     distance_stats['Distance Moyenne'] = distance_stats['Distance Moyenne'].round(2)
-    st.dataframe(distance_stats, use_container_width=True, hide_index=True)
+    ui_components.paginated_dataframe(distance_stats, key="duree_recap", sort_by='Distance Totale')
 
 # ===== PAGE TRAJETS NON AUTORISÉS =====
 elif page == "trajets":
@@ -403,11 +619,11 @@ elif page == "trajets":
     # Incidents par véhicule
     st.subheader("📊 Nombre d'Incidents par Véhicule")
     
-    incidents_par_vehicule = df_vehicles.groupby('Regroupement').size().reset_index(name='Nb Incidents')
-    incidents_par_vehicule = incidents_par_vehicule.sort_values('Nb Incidents', ascending=False)
+    incidents_par_vehicule = df_vehicles.groupby('Regroupement', observed=True).size().reset_index(name='Nb Incidents')
+    top_incidents_par_vehicule = aggregates.with_rest(*aggregates.top_n(incidents_par_vehicule, 'Nb Incidents'))
     
     fig1 = px.bar(
-        incidents_par_vehicule.head(15),
+        top_incidents_par_vehicule,
         x='Regroupement',
         y='Nb Incidents',
         title='Top 15 - Véhicules avec le Plus d\'Incidents',
@@ -435,11 +651,11 @@ elif page == "trajets":
     st.markdown("---")
     st.subheader("📏 Kilométrage Non Autorisé par Véhicule")
     
-    km_non_auth = df_vehicles.groupby('Regroupement')['Kilométrage'].sum().reset_index()
-    km_non_auth = km_non_auth.sort_values('Kilométrage', ascending=False)
+    km_non_auth = df_vehicles.groupby('Regroupement', observed=True)['Kilométrage'].sum().reset_index()
+    top_km_non_auth = aggregates.with_rest(*aggregates.top_n(km_non_auth, 'Kilométrage'))
     
     fig2 = px.bar(
-        km_non_auth.head(15),
+        top_km_non_auth,
         x='Regroupement',
         y='Kilométrage',
         title='Top 15 - Kilométrage Non Autorisé (km)',
@@ -466,11 +682,11 @@ elif page == "trajets":
     st.markdown("---")
     st.subheader("🏎️ Vitesse Maximale lors des Trajets Non Autorisés")
     
-    vitesse_incidents = df_vehicles.groupby('Regroupement')['Vitesse maxi'].max().reset_index()
-    vitesse_incidents = vitesse_incidents.sort_values('Vitesse maxi', ascending=False)
+    vitesse_incidents = df_vehicles.groupby('Regroupement', observed=True)['Vitesse maxi'].max().reset_index()
+    top_vitesse_incidents = aggregates.with_rest(*aggregates.top_n(vitesse_incidents, 'Vitesse maxi', rest_agg='max'))
     
     fig3 = px.bar(
-        vitesse_incidents.head(15),
+        top_vitesse_incidents,
         x='Regroupement',
         y='Vitesse maxi',
         title='Vitesse Maximale Atteinte par Véhicule lors d\'Incidents',
@@ -499,41 +715,28 @@ elif page == "jour_nuit":
     st.title("☀️🌙 Analyse Comparative - Conduite Jour vs Nuit")
     st.markdown("---")
     
-    df_jour = data['conduite_journee'].copy()
-    df_nuit = data['conduite_nocturne'].copy()
-    
-    df_jour_v = df_jour[~df_jour['Regroupement'].str.startswith('202', na=False)]
-    df_jour_v = df_jour_v[df_jour_v['Regroupement'].notna()]
-    
-    df_nuit_v = df_nuit[~df_nuit['Regroupement'].str.startswith('202', na=False)]
-    df_nuit_v = df_nuit_v[df_nuit_v['Regroupement'].notna()]
+    # Une seule agrégation groupée jour/nuit par véhicule (table des trajets construite au chargement)
+    day_night = aggregates.day_night_summary(data_loader.get_trips(data))
     
     # Comparaison globale
     col1, col2 = st.columns(2)
     
     with col1:
-        st.metric("☀️ Trajets de Jour", len(df_jour_v))
-        km_jour = df_jour_v['Kilométrage'].sum()
+        st.metric("☀️ Trajets de Jour", int(day_night['Trajets Jour'].sum()))
+        km_jour = day_night['Km Jour'].sum()
         st.metric("Distance Jour (km)", f"{km_jour:.1f}")
     
     with col2:
-        st.metric("🌙 Trajets de Nuit", len(df_nuit_v))
-        km_nuit = df_nuit_v['Kilométrage'].sum()
+        st.metric("🌙 Trajets de Nuit", int(day_night['Trajets Nuit'].sum()))
+        km_nuit = day_night['Km Nuit'].sum()
         st.metric("Distance Nuit (km)", f"{km_nuit:.1f}")
     
     # Graphique comparatif par véhicule
     st.markdown("---")
     st.subheader("📊 Kilométrage Jour vs Nuit par Véhicule")
     
-    km_jour_par_v = df_jour_v.groupby('Regroupement')['Kilométrage'].sum().reset_index()
-    km_jour_par_v.columns = ['Véhicule', 'Km Jour']
-    
-    km_nuit_par_v = df_nuit_v.groupby('Regroupement')['Kilométrage'].sum().reset_index()
-    km_nuit_par_v.columns = ['Véhicule', 'Km Nuit']
-    
-    comparison = pd.merge(km_jour_par_v, km_nuit_par_v, on='Véhicule', how='outer').fillna(0)
-    comparison['Total'] = comparison['Km Jour'] + comparison['Km Nuit']
-    comparison = comparison.sort_values('Total', ascending=False).head(15)
+    comparison = aggregates.with_rest(*aggregates.top_n(
+        day_night, 'Total', rest_agg={'Total': 'sum', 'Km Jour': 'sum', 'Km Nuit': 'sum'}))
     
     fig = go.Figure()
     fig.add_trace(go.Bar(name='Jour', x=comparison['Véhicule'], y=comparison['Km Jour'], marker_color='#FFA500'))
@@ -559,14 +762,8 @@ elif page == "jour_nuit":
     st.markdown("---")
     st.subheader("🏎️ Vitesse Maximale - Jour vs Nuit")
     
-    vitesse_jour = df_jour_v.groupby('Regroupement')['Vitesse maxi'].max().reset_index()
-    vitesse_jour.columns = ['Véhicule', 'Vitesse Max Jour']
-    
-    vitesse_nuit = df_nuit_v.groupby('Regroupement')['Vitesse maxi'].max().reset_index()
-    vitesse_nuit.columns = ['Véhicule', 'Vitesse Max Nuit']
-    
-    vitesse_comp = pd.merge(vitesse_jour, vitesse_nuit, on='Véhicule', how='outer').fillna(0)
-    vitesse_comp = vitesse_comp.sort_values('Vitesse Max Jour', ascending=False).head(15)
+    vitesse_comp = aggregates.with_rest(*aggregates.top_n(
+        day_night, 'Vitesse Max Jour', rest_agg={'Vitesse Max Jour': 'max', 'Vitesse Max Nuit': 'max'}))
     
     fig2 = go.Figure()
     fig2.add_trace(go.Bar(name='Vitesse Max Jour', x=vitesse_comp['Véhicule'], y=vitesse_comp['Vitesse Max Jour'], marker_color='#FFA500'))
@@ -593,16 +790,7 @@ elif page == "limitation_vitesse":
     st.title("🚦 Analyse des Limitations de Vitesse - Infractions")
     st.markdown("---")
     
-    df_jour = data['conduite_journee'].copy()
-    df_nuit = data['conduite_nocturne'].copy()
     df_vitesse = data['vitesse'].copy()
-    df_trajets = data['trajets_non_autorises'].copy()
-    
-    df_jour_v = df_jour[~df_jour['Regroupement'].str.startswith('202', na=False)]
-    df_jour_v = df_jour_v[df_jour_v['Regroupement'].notna()]
-    
-    df_nuit_v = df_nuit[~df_nuit['Regroupement'].str.startswith('202', na=False)]
-    df_nuit_v = df_nuit_v[df_nuit_v['Regroupement'].notna()]
     
     df_vitesse_v = df_vitesse[~df_vitesse['Regroupement'].str.startswith('202', na=False)]
     df_vitesse_v = df_vitesse_v[df_vitesse_v['Regroupement'].notna()]
@@ -624,17 +812,17 @@ elif page == "limitation_vitesse":
     with col2:
         st.metric("Infractions > 90 km/h", len(infractions_90))
     with col3:
-        taux = len(infractions_50) / len(df_vitesse_v) * 100 if len(df_vitesse_v) > 0 else 0
+        taux = aggregates.percent(len(infractions_50), len(df_vitesse_v))
         st.metric("Taux d'Infraction", f"{taux:.1f}%")
     
     st.markdown("---")
     st.subheader("📊 Infractions par Véhicule (> 50 km/h)")
     
-    inf_par_vehicule = infractions_50.groupby('Regroupement').size().reset_index(name='Nb Infractions')
-    inf_par_vehicule = inf_par_vehicule.sort_values('Nb Infractions', ascending=False)
+    inf_par_vehicule = infractions_50.groupby('Regroupement', observed=True).size().reset_index(name='Nb Infractions')
+    top_inf_par_vehicule = aggregates.with_rest(*aggregates.top_n(inf_par_vehicule, 'Nb Infractions'))
     
     fig1 = px.bar(
-        inf_par_vehicule.head(15),
+        top_inf_par_vehicule,
         x='Regroupement',
         y='Nb Infractions',
         title='Top 15 - Véhicules avec le Plus d\'Infractions de Vitesse',
@@ -718,21 +906,23 @@ elif page == "limitation_vitesse":
     st.markdown("---")
     st.subheader("🕐 Infractions Jour vs Nuit")
     
-    jour_inf = df_jour_v[df_jour_v['Vitesse maxi'] > limite_urbaine]
-    nuit_inf = df_nuit_v[df_nuit_v['Vitesse maxi'] > limite_urbaine]
+    # Trajets et infractions jour/nuit: mêmes totaux par véhicule que la page Jour vs Nuit
+    day_night = aggregates.day_night_summary(data_loader.get_trips(data), limit=limite_urbaine)
+    trajets_jour, trajets_nuit = day_night['Trajets Jour'].sum(), day_night['Trajets Nuit'].sum()
+    jour_inf, nuit_inf = int(day_night['Infractions Jour'].sum()), int(day_night['Infractions Nuit'].sum())
     
     fig3 = go.Figure()
-    fig3.add_trace(go.Bar(name='Infractions Jour', x=['Jour', 'Nuit'], y=[len(jour_inf), len(nuit_inf)], 
+    fig3.add_trace(go.Bar(name='Infractions Jour', x=['Jour', 'Nuit'], y=[jour_inf, nuit_inf], 
                           marker_color=['#FFA500', '#1E3A5F']))
     fig3.update_layout(title='Comparaison des Infractions Jour vs Nuit', height=350)
     st.plotly_chart(fig3, use_container_width=True)
     
     col1, col2 = st.columns(2)
     with col1:
-        taux_jour = len(jour_inf) / len(df_jour_v) * 100 if len(df_jour_v) > 0 else 0
+        taux_jour = aggregates.percent(jour_inf, trajets_jour)
         st.warning(f"☀️ **Taux d'infraction jour**: {taux_jour:.1f}%")
     with col2:
-        taux_nuit = len(nuit_inf) / len(df_nuit_v) * 100 if len(df_nuit_v) > 0 else 0
+        taux_nuit = aggregates.percent(nuit_inf, trajets_nuit)
         st.error(f"🌙 **Taux d'infraction nuit**: {taux_nuit:.1f}%")
     
     st.markdown("""
@@ -756,10 +946,8 @@ elif page == "limitation_vitesse":
     st.markdown("---")
     st.subheader("📋 Tableau Récapitulatif des Infractions")
     
-    recap = df_vitesse_v[df_vitesse_v['Vitesse maxi'] > limite_urbaine][['Regroupement', 'Vitesse maxi', 'Emplacement initial', "Lieu d'arrivée"]]
-    recap = recap.sort_values('Vitesse maxi', ascending=False)
-    recap.columns = ['Véhicule', 'Vitesse Max (km/h)', 'Départ', 'Arrivée']
-    st.dataframe(recap.head(20), use_container_width=True, hide_index=True)
+    recap = aggregates.speed_infractions(df_vitesse_v, limit=limite_urbaine)
+    ui_components.paginated_dataframe(recap, key="vitesse_recap", sort_by='Vitesse Max (km/h)')
 
 # ===== PAGE NOTIFICATIONS =====
 elif page == "notifications":
@@ -775,7 +963,8 @@ elif page == "notifications":
     # Types de notifications
     st.subheader("📊 Distribution des Types de Notifications")
     
-    notif_types = df['Nom de notification'].value_counts().reset_index()
+    # Colonne catégorielle: value_counts liste aussi les types absents (0)
+    notif_types = df['Nom de notification'].value_counts().loc[lambda counts: counts > 0].reset_index()
     notif_types.columns = ['Type de Notification', 'Nombre']
     
     fig1 = px.pie(
@@ -807,11 +996,11 @@ elif page == "notifications":
     df_vehicles = df[~df['Regroupement'].str.startswith('202', na=False)]
     df_vehicles = df_vehicles[df_vehicles['Regroupement'].notna()]
     
-    notif_par_vehicule = df_vehicles.groupby('Regroupement').size().reset_index(name='Nombre')
-    notif_par_vehicule = notif_par_vehicule.sort_values('Nombre', ascending=False)
+    notif_par_vehicule = df_vehicles.groupby('Regroupement', observed=True).size().reset_index(name='Nombre')
+    top_notif_par_vehicule = aggregates.with_rest(*aggregates.top_n(notif_par_vehicule, 'Nombre'))
     
     fig2 = px.bar(
-        notif_par_vehicule.head(15),
+        top_notif_par_vehicule,
         x='Regroupement',
         y='Nombre',
         title='Top 15 - Véhicules avec le Plus de Notifications',
@@ -838,8 +1027,37 @@ elif page == "notifications":
     st.markdown("---")
     st.subheader("📋 Détail des Notifications par Type et Véhicule")
     
-    pivot = df_vehicles.pivot_table(index='Regroupement', columns='Nom de notification', aggfunc='size', fill_value=0)
-    st.dataframe(pivot, use_container_width=True)
+    # Matrice creuse véhicule x type: seules les cellules non nulles sont stockées
+    matrix = aggregates.sparse_counts(df_vehicles, 'Regroupement', 'Nom de notification',
+                                      row_name='Véhicule', column_name='Type')
+
+    if matrix.nnz:
+        long_counts = matrix.to_long()
+        fig3 = go.Figure(go.Heatmap(
+            x=long_counts['Type'],
+            y=long_counts['Véhicule'],
+            z=long_counts['Nombre'],
+            colorscale='Blues',
+            hoverongaps=False,
+            hovertemplate='%{y}<br>%{x}: %{z}<extra></extra>'
+        ))
+        fig3.update_layout(
+            title='Carte de Chaleur - Notifications par Véhicule et Type',
+            height=max(400, 18 * matrix.shape[0]),
+            xaxis_title='Type',
+            yaxis_title='Véhicule'
+        )
+        st.plotly_chart(fig3, use_container_width=True)
+
+    # Pagination sur les totaux; seules les lignes de la page affichée sont densifiées
+    totals = matrix.row_totals().reset_index()
+
+    def densify(page_rows):
+        dense = matrix.to_dense(rows=page_rows['Véhicule']).reset_index()
+        dense['Total'] = page_rows['Total'].to_numpy()
+        return dense
+
+    ui_components.paginated_dataframe(totals, key="notifications_pivot", sort_by='Total', materialize=densify)
 
 # ===== PAGE TEMPS POI =====
 elif page == "temps_poi":
@@ -849,21 +1067,20 @@ elif page == "temps_poi":
     df = data['temps_poi'].copy()
     df = df[df['Regroupement'].notna()]
     
-    # Identifier les POI (lignes qui ne sont pas des véhicules)
-    vehicles = get_vehicles(data['duree_distance'])
-    df_poi = df[~df['Regroupement'].isin(vehicles)]
-    df_poi = df_poi[~df_poi['Regroupement'].str.startswith('202', na=False)]
+    # Identifier les POI et les véhicules (registre construit au chargement)
+    entities = data_loader.get_entities(data)
+    df_poi = df[entities.mask(df['Regroupement'], 'poi')]
     
     st.subheader("📊 Visites et Temps par Point d'Intérêt")
     
-    poi_stats = df_poi.groupby('Regroupement').agg({
+    poi_stats = df_poi.groupby('Regroupement', observed=True).agg({
         'Visites': 'sum'
     }).reset_index()
     poi_stats.columns = ['POI', 'Total Visites']
-    poi_stats = poi_stats.sort_values('Total Visites', ascending=False)
+    top_poi_stats = aggregates.with_rest(*aggregates.top_n(poi_stats, 'Total Visites'))
     
     fig1 = px.bar(
-        poi_stats.head(15),
+        top_poi_stats,
         x='POI',
         y='Total Visites',
         title='Top 15 - Points d\'Intérêt les Plus Visités',
@@ -890,14 +1107,14 @@ elif page == "temps_poi":
     st.markdown("---")
     st.subheader("🚗 Visites POI par Véhicule")
     
-    df_vehicules = df[df['Regroupement'].isin(vehicles)]
+    df_vehicules = df[entities.mask(df['Regroupement'], 'vehicle')]
     
     if len(df_vehicules) > 0:
-        visites_vehicule = df_vehicules.groupby('Regroupement')['Visites'].sum().reset_index()
-        visites_vehicule = visites_vehicule.sort_values('Visites', ascending=False)
+        visites_vehicule = df_vehicules.groupby('Regroupement', observed=True)['Visites'].sum().reset_index()
+        top_visites_vehicule = aggregates.with_rest(*aggregates.top_n(visites_vehicule, 'Visites'))
         
         fig2 = px.bar(
-            visites_vehicule.head(15),
+            top_visites_vehicule,
             x='Regroupement',
             y='Visites',
             title='Nombre de Visites POI par Véhicule',
@@ -935,16 +1152,16 @@ elif page == "visites_poi":
     st.subheader("📊 Distribution des Visites par Lieu")
     
     # Séparer POI et véhicules
-    vehicles = get_vehicles(data['duree_distance'])
+    entities = data_loader.get_entities(data)
     
-    df_poi = df[df['Regroupement'].str.startswith('BP', na=False)]
+    df_poi = df[entities.mask(df['Regroupement'], 'poi')]
     
     if len(df_poi) > 0:
-        poi_visites = df_poi.groupby('Regroupement')['Visites'].sum().reset_index()
-        poi_visites = poi_visites.sort_values('Visites', ascending=False)
+        poi_visites = df_poi.groupby('Regroupement', observed=True)['Visites'].sum().reset_index()
+        top_poi_visites = aggregates.with_rest(*aggregates.top_n(poi_visites, 'Visites', n=20))
         
         fig1 = px.bar(
-            poi_visites.head(20),
+            top_poi_visites,
             x='Regroupement',
             y='Visites',
             title='Top 20 - POI par Nombre de Visites',
@@ -971,14 +1188,14 @@ elif page == "visites_poi":
     st.markdown("---")
     st.subheader("🚗 Visites par Véhicule")
     
-    df_vehicles = df[df['Regroupement'].isin(vehicles)]
+    df_vehicles = df[entities.mask(df['Regroupement'], 'vehicle')]
     
     if len(df_vehicles) > 0:
-        vehicle_visites = df_vehicles.groupby('Regroupement')['Visites'].sum().reset_index()
-        vehicle_visites = vehicle_visites.sort_values('Visites', ascending=False)
+        vehicle_visites = df_vehicles.groupby('Regroupement', observed=True)['Visites'].sum().reset_index()
+        top_vehicle_visites = aggregates.with_rest(*aggregates.top_n(vehicle_visites, 'Visites'))
         
         fig2 = px.bar(
-            vehicle_visites.head(15),
+            top_vehicle_visites,
             x='Regroupement',
             y='Visites',
             title='Visites POI par Véhicule',
@@ -1012,11 +1229,11 @@ elif page == "vitesse":
     # Vitesse maximale par véhicule
     st.subheader("📊 Vitesse Maximale par Véhicule")
     
-    vitesse_max = df_vehicles.groupby('Regroupement')['Vitesse maxi'].max().reset_index()
-    vitesse_max = vitesse_max.sort_values('Vitesse maxi', ascending=False)
+    vitesse_max = df_vehicles.groupby('Regroupement', observed=True)['Vitesse maxi'].max().reset_index()
+    top_vitesse_max = aggregates.with_rest(*aggregates.top_n(vitesse_max, 'Vitesse maxi', rest_agg='max'))
     
     fig1 = px.bar(
-        vitesse_max.head(15),
+        top_vitesse_max,
         x='Regroupement',
         y='Vitesse maxi',
         title='Top 15 - Vitesse Maximale Atteinte par Véhicule (km/h)',
@@ -1084,14 +1301,13 @@ elif page == "vitesse":
     st.markdown("---")
     st.subheader("📋 Statistiques de Vitesse par Véhicule")
     
-    vitesse_stats = df_vehicles.groupby('Regroupement').agg({
+    vitesse_stats = df_vehicles.groupby('Regroupement', observed=True).agg({
         'Vitesse maxi': ['max', 'mean', 'count']
     }).reset_index()
     vitesse_stats.columns = ['Véhicule', 'Vitesse Max', 'Vitesse Moyenne', 'Nb Trajets']
-    vitesse_stats = vitesse_stats.sort_values('Vitesse Max', ascending=False)
     vitesse_stats['Vitesse Moyenne'] = vitesse_stats['Vitesse Moyenne'].round(1)
     
-    st.dataframe(vitesse_stats, use_container_width=True, hide_index=True)
+    ui_components.paginated_dataframe(vitesse_stats, key="vitesse_stats", sort_by='Vitesse Max')
     
     st.markdown("""
     ### 📝 Recommandations Finales - Gestion de la Vitesse
@@ -1102,3 +1318,133 @@ elif page == "vitesse":
     4. **Incentives**: Récompenser les conducteurs respectueux des limites
     5. **Technologie**: Envisager l'installation de limiteurs de vitesse
     """)
+
+# ===== PAGE FICHE VÉHICULE =====
+elif page == "vehicule":
+    st.title("🔍 Fiche Véhicule")
+    st.markdown("---")
+    
+    choices = data_loader.vehicle_choices(data)
+    if not choices:
+        st.warning("Aucun véhicule dans les données.")
+        page_timer.stop()  # st.stop() saute la fin du script: temps de la page enregistré ici
+        st.stop()
+    if st.session_state.get("drilldown_vehicle") not in choices:
+        st.session_state["drilldown_vehicle"] = choices[0]
+    vehicle = st.selectbox("Véhicule", choices, key="drilldown_vehicle")
+    
+    # Lignes du véhicule lues dans la partition par véhicule construite au chargement
+    vdata = data_loader.vehicle_data(data, vehicle, headers=False)
+    profile = aggregates.vehicle_profile(vdata, vdata.entities)
+    
+    st.subheader(f"🎯 Semaine du véhicule {vehicle}")
+    for row in (profile['metrics'][:4], profile['metrics'][4:]):
+        for col, metric in zip(st.columns(4), row):
+            with col:
+                st.metric(metric['label'], metric['value'])
+    
+    st.markdown("---")
+    st.subheader("📅 Activité Journalière")
+    daily = profile['daily']
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        fig1 = px.bar(
+            daily,
+            x='Jour',
+            y='Distance (km)',
+            title='Distance Parcourue par Jour',
+            color='Trajets',
+            color_continuous_scale='Blues'
+        )
+        fig1.update_layout(height=400)
+        st.plotly_chart(fig1, use_container_width=True)
+    with col2:
+        fig2 = px.bar(
+            daily,
+            x='Jour',
+            y='Vitesse Max',
+            title='Vitesse Maximale par Jour',
+            color='Vitesse Max',
+            color_continuous_scale='YlOrRd'
+        )
+        fig2.add_hline(y=50, line_dash="dash", line_color="red", annotation_text="Limite 50 km/h")
+        fig2.update_layout(height=400)
+        st.plotly_chart(fig2, use_container_width=True)
+    
+    st.dataframe(daily.round(1), use_container_width=True, hide_index=True)
+    
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🔔 Notifications")
+        if len(profile['notifications']) > 0:
+            fig3 = px.pie(profile['notifications'], values='Nombre', names='Type', title='Notifications par Type')
+            st.plotly_chart(fig3, use_container_width=True)
+        else:
+            st.info("Aucune notification pour ce véhicule.")
+    with col2:
+        st.subheader("📍 Points d'Intérêt")
+        if len(profile['pois']) > 0:
+            st.dataframe(profile['pois'], use_container_width=True, hide_index=True)
+        else:
+            st.info("Aucune visite de POI pour ce véhicule.")
+    
+    trip_columns = ['Jour', 'Début', 'Emplacement initial', 'Fin', "Lieu d'arrivée", 'Durée', 'Kilométrage', 'Vitesse maxi']
+    st.markdown("---")
+    st.subheader("⚠️ Trajets Non Autorisés")
+    if len(profile['unauthorized']) > 0:
+        st.dataframe(profile['unauthorized'][trip_columns], use_container_width=True, hide_index=True)
+    else:
+        st.success("Aucun trajet non autorisé.")
+    
+    st.subheader("🌙 Conduite de Nuit")
+    if len(profile['night']) > 0:
+        st.dataframe(profile['night'][trip_columns], use_container_width=True, hide_index=True)
+    else:
+        st.success("Aucun trajet de nuit.")
+
+page_timer.stop()
+
+# Panneau de performance (optionnel): ?perf=<ADMIN_TOKEN> dans l'URL, ou PERF_PANEL=1 côté serveur
+if has_admin_access("perf") or os.environ.get("PERF_PANEL") == "1":
+    with st.sidebar.expander("⏱️ Perf", expanded=True):
+        st.caption("Temps par étape (tous utilisateurs, depuis le démarrage du serveur)")
+        st.dataframe(pd.DataFrame(perf.summary()), use_container_width=True, hide_index=True)
+        perf_counters = perf.counters()
+        if perf_counters:
+            st.json(perf_counters)
+        st.caption("Pool de rendu des graphiques")
+        st.json(importlib.import_module("render_pool").metrics())
+        st.caption("File d'attente des exports complets")
+        st.json(export_queue.metrics())
+        st.caption("Données importées partagées entre sessions")
+        st.json(shared_store.metrics())
+        if st.button("Réinitialiser", key="perf_reset"):
+            perf.reset()
+
+# Vue d'administration de la mémoire du serveur: ?admin=<ADMIN_TOKEN> dans l'URL
+if has_admin_access("admin"):
+    with st.sidebar.expander("🧠 Mémoire", expanded=True):
+        budget = memory_budget.get_budget()
+        usage = budget.usage()
+        st.progress(min(usage['total'] / usage['limit'], 1.0),
+                    text=f"{usage['total'] / 2**20:.1f} Mo utilisés sur {usage['limit'] / 2**20:.0f} Mo")
+        st.dataframe(pd.DataFrame([
+            {'Catégorie': category['label'], 'Entrées': category['entries'],
+             'Taille (Mo)': round(category['bytes'] / 2**20, 2), 'Évictions': category['evictions']}
+            for category in usage['categories'].values()
+        ]), use_container_width=True, hide_index=True)
+        budget_entries = budget.entries()
+        if budget_entries:
+            st.caption("Entrées, de la plus récemment utilisée à la prochaine évincée")
+            st.dataframe(pd.DataFrame([
+                {'Entrée': entry['label'], 'Taille (Mo)': round(entry['bytes'] / 2**20, 2),
+                 'Inactive (s)': entry['idle_s'], 'Accès': entry['hits']}
+                for entry in reversed(budget_entries)
+            ]), use_container_width=True, hide_index=True)
+        # Les données importées restent: les vider obligerait les sessions actives à relire leurs fichiers
+        if st.button("Vider les caches", key="memory_clear"):
+            for category in ('aggregates', 'figures', 'images', 'exports'):
+                budget.clear(category)
+            st.rerun()
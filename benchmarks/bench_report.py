@@ -0,0 +1,142 @@
+"""
+Report pipeline benchmark across synthetic fleet sizes
+
+Times data_loader.read_sheets, every PDF_GENERATORS entry, create_pdf_report,
+create_html_report and export_data_to_excel (full report) on synthetic workbooks
+of increasing scale, and prints the size of each output. The HTML report always
+embeds its figures (as Plotly JSON, nothing is rasterized).
+
+Usage:
+    python benchmarks/bench_report.py                      # small, medium, large
+    python benchmarks/bench_report.py --scale 500x4x8      # vehicles x weeks x rows per day
+    python benchmarks/bench_report.py --images --json resultats.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+import export_utils  # noqa: E402
+import pdf_generators  # noqa: E402
+from synthetic_workbook import write_workbook  # noqa: E402
+
+# Nom -> (véhicules, semaines, trajets par jour)
+SCALES = {
+    'small': (30, 1, 5),
+    'medium': (150, 4, 6),
+    'large': (400, 4, 8),
+}
+
+
+def parse_scale(value):
+    if value in SCALES:
+        return value, SCALES[value]
+    vehicles, weeks, rows = (int(part) for part in value.lower().split('x'))
+    return value, (vehicles, weeks, rows)
+
+
+def time_call(fn, repeat):
+    """Median wall time (seconds) of fn over repeat runs, plus the last result"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def strip_figures(content):
+    """Drop charts so the timings measure ReportLab/xlsxwriter rather than Kaleido"""
+    if isinstance(content, dict):
+        return {name: strip_figures(sections) for name, sections in content.items()}
+    return [{**section, 'figure': None} for section in content]
+
+
+def bench_scale(name, vehicles, weeks, rows_per_day, repeat, images, workdir):
+    path = os.path.join(workdir, f"fleet_{vehicles}x{weeks}x{rows_per_day}.xlsx")
+    if not os.path.exists(path):
+        write_workbook(path, vehicles, weeks, rows_per_day)
+    results = {'scale': name, 'vehicles': vehicles, 'weeks': weeks, 'rows_per_day': rows_per_day,
+               'xlsx_bytes': os.path.getsize(path), 'stages': {}}
+
+    seconds, data = time_call(lambda: data_loader.read_sheets(path), repeat)
+    results['rows'] = sum(len(df) for df in data.values())
+    results['stages']['load_data'] = seconds
+
+    for page, generator in pdf_generators.PDF_GENERATORS.items():
+        seconds, _ = time_call(lambda: generator(data), repeat)
+        results['stages'][f'generate.{page}'] = seconds
+
+    full_content = pdf_generators.generate_full_report(data)
+    html_content = full_content
+    structured_content = pdf_generators.generate_structured_report(data)
+    if not images:
+        full_content = strip_figures(full_content)
+        structured_content = strip_figures(structured_content)
+
+    seconds, pdf = time_call(lambda: export_utils.create_pdf_report("Rapport Complet", full_content), repeat)
+    results['stages']['create_pdf_report'] = seconds
+    results['pdf_bytes'] = len(pdf.getvalue())
+
+    seconds, html = time_call(lambda: export_utils.create_html_report("Rapport Complet", html_content), repeat)
+    results['stages']['create_html_report'] = seconds
+    results['html_bytes'] = len(html.getvalue())
+
+    seconds, xlsx = time_call(
+        lambda: export_utils.export_data_to_excel(data, current_page=None, report_content=structured_content), repeat)
+    results['stages']['export_data_to_excel'] = seconds
+    results['excel_bytes'] = len(xlsx.getvalue())
+    return results
+
+
+def print_results(all_results):
+    stages = list(all_results[0]['stages'])
+    header = f"{'étape':<32}" + "".join(f"{r['scale']:>14}" for r in all_results)
+    print(header)
+    print(f"{'(lignes)':<32}" + "".join(f"{r['rows']:>14}" for r in all_results))
+    print('-' * len(header))
+    for stage in stages:
+        print(f"{stage:<32}" + "".join(f"{r['stages'][stage] * 1000:>12.1f}ms" for r in all_results))
+    print('-' * len(header))
+    for output in ('pdf_bytes', 'html_bytes', 'excel_bytes'):
+        print(f"{output:<32}" + "".join(f"{r[output] / 1024:>12.0f}KB" for r in all_results))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline de rapport sur des flottes synthétiques.")
+    parser.add_argument('--scale', action='append',
+                        help="small, medium, large ou VxSxT (véhicules x semaines x trajets/jour); répétable")
+    parser.add_argument('--repeat', type=int, default=3, help="Répétitions par mesure (médiane)")
+    parser.add_argument('--images', action='store_true', help="Inclure le rendu Kaleido des graphiques")
+    parser.add_argument('--workdir', help="Dossier des classeurs générés (réutilisés d'un passage à l'autre)")
+    parser.add_argument('--json', help="Écrire les résultats bruts dans ce fichier")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    # Rendu dans le processus: le benchmark mesure le pipeline, pas le démarrage du pool
+    os.environ.setdefault('RENDER_POOL_SIZE', '0')
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench_report_')
+    os.makedirs(workdir, exist_ok=True)
+
+    all_results = []
+    for value in args.scale or list(SCALES):
+        name, (vehicles, weeks, rows_per_day) = parse_scale(value)
+        print(f"… {name}: {vehicles} véhicules, {weeks} semaine(s), {rows_per_day} trajets/jour", file=sys.stderr)
+        all_results.append(bench_scale(name, vehicles, weeks, rows_per_day, args.repeat, args.images, workdir))
+
+    print_results(all_results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as out:
+            json.dump(all_results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Top-N ranking benchmark: aggregates.top_n against a full sort
+
+Builds per-vehicle aggregates for fleets of thousands of vehicles (integer
+counts with many ties, like "Nb Incidents", and float distances) and times
+sort_values().head(), nlargest() and aggregates.top_n(), checking that
+top_n returns the same values.
+
+Usage:
+    python benchmarks/bench_topn.py
+    python benchmarks/bench_topn.py --vehicles 1000 10000 100000 --n 15 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aggregates  # noqa: E402
+
+
+def build_aggregate(vehicles, seed=0):
+    """One row per vehicle, like the groupby(...).reset_index() frames of the pages"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Véhicule': [f"V{i:06d} RB" for i in range(vehicles)],
+        'Nb Incidents': rng.integers(0, 40, vehicles),
+        'Distance Totale': rng.gamma(2.0, 300.0, vehicles),
+    })
+
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du classement Top N.")
+    parser.add_argument('--vehicles', type=int, nargs='+', default=[1000, 5000, 20000, 100000])
+    parser.add_argument('--n', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    print(f"{'véhicules':>10} {'colonne':<16} {'sort+head':>11} {'nlargest':>11} {'top_n':>11} {'+ Autres':>11}")
+    for vehicles in args.vehicles:
+        df = build_aggregate(vehicles)
+        for column in ('Nb Incidents', 'Distance Totale'):
+            expected = df.sort_values(column, ascending=False, kind='stable').head(args.n)
+            top, rest = aggregates.top_n(df, column, args.n)
+            assert top[column].tolist() == expected[column].tolist()
+            assert top['Véhicule'].tolist() == expected['Véhicule'].tolist()
+            assert np.isclose(rest[column].iloc[0], df[column].sum() - top[column].sum())
+
+            sort_head = time_call(lambda: df.sort_values(column, ascending=False).head(args.n), args.repeat)
+            nlargest = time_call(lambda: df.nlargest(args.n, column), args.repeat)
+            top_only = time_call(lambda: aggregates.top_n(df, column, args.n, rest_agg=None), args.repeat)
+            with_rest = time_call(lambda: aggregates.top_n(df, column, args.n), args.repeat)
+            print(f"{vehicles:>10} {column:<16} {sort_head * 1000:>9.3f}ms {nlargest * 1000:>9.3f}ms "
+                  f"{top_only * 1000:>9.3f}ms {with_rest * 1000:>9.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Import-time benchmark for the app startup path (python -X importtime)
+
+Compares the modules app.py imports on every cold start (read from its
+source, so the list follows the app) with the export stack
+(export_utils: reportlab, xlsxwriter, Kaleido) that is now loaded on first export.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5] [--top 15]
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXPORT_MODULES = ['export_utils']
+
+
+def startup_modules(path=os.path.join(ROOT, 'app.py')):
+    """
+    Modules imported by the app script outside of functions, in source order
+
+    Conditional imports (if blocks) count as startup imports; imports inside
+    functions and importlib calls (the deferred export stack) do not.
+    """
+    with open(path, encoding='utf-8') as source:
+        tree = ast.parse(source.read(), path)
+    modules = []
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            pending[:0] = [child for child in ast.iter_child_nodes(node) if isinstance(child, ast.stmt)]
+            continue
+        modules += [name for name in names if name not in modules and name not in EXPORT_MODULES]
+    return modules
+
+
+# Modules importés par app.py au démarrage
+STARTUP_MODULES = startup_modules()
+
+
+def run_importtime(modules):
+    """
+    Import modules in a fresh interpreter with -X importtime
+
+    Returns:
+        (total_ms, rows) where rows is a list of (cumulative_us, module_name)
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    rows = []
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time:   self |  cumulative | [indentation]module"
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        cumulative_us = int(cumulative_us)
+        name = name[1:]
+        rows.append((cumulative_us, name))
+        # Les modules de premier niveau ne sont pas indentés
+        if not name.startswith(' '):
+            total_us += cumulative_us
+    return total_us / 1000, rows
+
+
+def measure(label, modules, repeat, top):
+    totals = []
+    rows = []
+    for _ in range(repeat):
+        total_ms, rows = run_importtime(modules)
+        totals.append(total_ms)
+    print(f"\n{label}: {', '.join(modules)}")
+    print(f"  médiane {statistics.median(totals):.1f} ms | min {min(totals):.1f} ms | max {max(totals):.1f} ms")
+    print(f"  {top} imports les plus coûteux (cumulé, dernier passage):")
+    for cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"    {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+    return statistics.median(totals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure le temps d'import au démarrage de l'application.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    startup = measure("Démarrage app.py", STARTUP_MODULES, args.repeat, args.top)
+    with_export = measure("Démarrage + pile d'export", STARTUP_MODULES + EXPORT_MODULES, args.repeat, args.top)
+    print(f"\nCoût évité au démarrage (export différé): {with_export - startup:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
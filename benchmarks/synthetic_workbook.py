@@ -0,0 +1,244 @@
+"""
+Synthetic fleet workbook generator
+
+Produces workbooks with the same layout as the GPS provider's weekly export
+(Content sheet + the eight analysis sheets read by data_loader), including the
+Regroupement grouping conventions: vehicle summary rows, per-day subtotal rows
+whose Regroupement starts with "202", "-----" notification separators and
+POI/vehicle interleaving in the POI sheets.
+
+Usage:
+    python benchmarks/synthetic_workbook.py flotte.xlsx --vehicles 200 --weeks 4 --rows-per-day 8
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import SHEET_NAMES  # noqa: E402
+
+TOWNS = ['Cotonou', 'Abomey-Calavi', 'Porto-Novo', 'Parakou', 'Bohicon', 'Abomey', 'Ouidah', 'Comè',
+         'Savè', 'Dassa-Zoumè', 'Lokossa', 'Natitingou', 'Djougou', 'Kandi', 'Malanville', 'Aplahoué']
+ROADS = ['Rnie 1', 'Rnie 2', 'Rnie 3', 'Rnie 4', 'Rn 23 Bis', 'Boulevard De La Marina', 'Rue 12.166']
+NOTIFICATION_TYPES = [
+    ('BP - Entrée dans POI', 40), ('10min Parking Hors POI', 25), ('90min Station Parking', 7),
+    ('BP - Entrée Dans DEPOT', 6), ('BP - Sortie Du DEPOT', 6), ('BP - Perte de Connexion', 4),
+    ('BP - Entrée au Port', 1), ('BP - Sortie au Port', 1), ('12h Port Parking', 0.4),
+    ('15h Port Parking', 0.3), ('18h Port Parking', 0.3),
+]
+TRIP_COLUMNS = ['Regroupement', 'Début', 'Emplacement initial', 'Fin', "Lieu d'arrivée", 'Durée',
+                'Kilométrage', 'Vitesse maxi']
+
+
+def _hms(seconds):
+    seconds = int(seconds)
+    if seconds >= 86400:
+        return f"{seconds // 86400} jours {seconds % 86400 // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class _Fleet:
+    """Random but reproducible fleet: plates, POIs and trips"""
+
+    def __init__(self, vehicles, weeks, rows_per_day, seed):
+        self.rng = random.Random(seed)
+        letters = 'ABCDEFGHJKLMNPRSTUVWXYZ'
+        plates = set()
+        while len(plates) < vehicles:
+            plates.add(f"{self.rng.choice(letters)}{self.rng.choice(letters)} {self.rng.randint(1000, 9999)} RB")
+        self.vehicles = sorted(plates)
+        self.pois = sorted({f"{prefix} - {town}{suffix}"
+                            for prefix in ('BP', 'BPD', 'BPG')
+                            for town in TOWNS
+                            for suffix in ('', ' Marché', ' Centre')})
+        self.places = [f"{road}, {town}, Benin" for road in ROADS for town in TOWNS] + self.pois
+        start = datetime(2026, 1, 5)
+        self.days = [start + timedelta(days=i) for i in range(weeks * 7)]
+        self.rows_per_day = rows_per_day
+
+    def trips(self, vehicle, day, count, hours=(6, 20)):
+        """Chronological trips of one vehicle on one day"""
+        rng = self.rng
+        current = day.replace(hour=hours[0]) + timedelta(minutes=rng.randint(0, 59))
+        end_of_day = day.replace(hour=hours[1])
+        place = rng.choice(self.places)
+        trips = []
+        for _ in range(count):
+            duration = rng.randint(60, 5400)
+            end = current + timedelta(seconds=duration)
+            if end > end_of_day:
+                break
+            arrival = rng.choice(self.places)
+            km = round(duration / 3600 * rng.uniform(15, 70), 6)
+            trips.append({
+                'start': current, 'end': end, 'from': place, 'to': arrival,
+                'duration': duration, 'km': km, 'vmax': rng.randint(8, 115),
+                'parking': rng.randint(60, 7200),
+            })
+            current = end + timedelta(seconds=trips[-1]['parking'])
+            place = arrival
+        return trips
+
+
+def _duree_sheet(fleet):
+    rows = []
+    for vehicle in fleet.vehicles:
+        trips = [t for day in fleet.days for t in fleet.trips(vehicle, day, fleet.rows_per_day)]
+        if not trips:
+            continue
+        # Ligne récapitulative du véhicule puis détail des trajets
+        rows.append([vehicle, trips[0]['from'], str(trips[0]['start']), trips[-1]['to'], str(trips[-1]['end']),
+                     _hms(sum(t['duration'] for t in trips)), sum(t['km'] for t in trips),
+                     _hms(sum(t['parking'] for t in trips))])
+        for t in trips:
+            rows.append([vehicle, t['from'], str(t['start']), t['to'], str(t['end']), _hms(t['duration']),
+                         t['km'], _hms(t['parking'])])
+    return pd.DataFrame(rows, columns=['Regroupement', 'Emplacement initial', 'Début', "Lieu d'arrivée", 'Fin',
+                                       'Durée Trajet', 'Distance Parcourue', 'Temps Stationnement'])
+
+
+def _grouped_trip_sheet(fleet, share, hours, with_details=True):
+    """Vehicle summary row, then per day a "2026-..." subtotal row followed by the trips"""
+    rng = fleet.rng
+    rows = []
+    for vehicle in fleet.vehicles:
+        if rng.random() > share:
+            continue
+        per_day = []
+        for day in fleet.days:
+            if rng.random() < 0.4:
+                continue
+            trips = fleet.trips(vehicle, day, max(1, fleet.rows_per_day // 3), hours=hours)
+            if trips:
+                per_day.append((day, trips))
+        if not per_day:
+            continue
+        all_trips = [t for _, trips in per_day for t in trips]
+        rows.append(_trip_row(vehicle, all_trips))
+        for day, trips in per_day:
+            rows.append(_trip_row(day.strftime('%Y-%m-%d'), trips))
+            if with_details:
+                rows.extend(_trip_row(vehicle, [t]) for t in trips)
+    return rows
+
+
+def _trip_row(label, trips):
+    return [label, trips[0]['start'].strftime('%H:%M:%S'), trips[0]['from'], trips[-1]['end'].strftime('%H:%M:%S'),
+            trips[-1]['to'], _hms(sum(t['duration'] for t in trips)), sum(t['km'] for t in trips),
+            max(t['vmax'] for t in trips)]
+
+
+def _notifications_sheet(fleet):
+    rng = fleet.rng
+    names = [name for name, _ in NOTIFICATION_TYPES]
+    weights = [weight for _, weight in NOTIFICATION_TYPES]
+    rows = []
+    for vehicle in fleet.vehicles:
+        first = fleet.days[0] - timedelta(hours=rng.randint(1, 12))
+        rows.append([vehicle, '-----', str(first), '-----'])
+        for day in fleet.days:
+            for _ in range(rng.randint(0, max(1, fleet.rows_per_day))):
+                name = rng.choices(names, weights)[0]
+                when = day + timedelta(seconds=rng.randint(0, 86399))
+                rows.append([vehicle, name, str(when), f"{vehicle}: {name} à {rng.choice(fleet.pois)}."])
+    return pd.DataFrame(rows, columns=['Regroupement', 'Nom de notification', 'Heure de déclenchement',
+                                       'Texte de notification'])
+
+
+def _poi_sheets(fleet):
+    rng = fleet.rng
+    temps_rows, visites_rows = [], []
+    for vehicle in fleet.vehicles:
+        visits = []
+        for day in fleet.days:
+            for _ in range(rng.randint(0, max(1, fleet.rows_per_day // 4))):
+                enter = day + timedelta(seconds=rng.randint(0, 80000))
+                leave = enter + timedelta(seconds=rng.randint(30, 20000))
+                visits.append((rng.choice(fleet.pois), enter, leave))
+        if not visits:
+            continue
+        total = sum((leave - enter).total_seconds() for _, enter, leave in visits)
+        # Temps POI: ligne véhicule puis une ligne par POI
+        temps_rows.append([vehicle, str(min(v[1] for v in visits)), str(max(v[2] for v in visits)), _hms(total), len(visits)])
+        by_poi = {}
+        for poi, enter, leave in visits:
+            by_poi.setdefault(poi, []).append((enter, leave))
+        for poi, spans in sorted(by_poi.items()):
+            seconds = sum((leave - enter).total_seconds() for enter, leave in spans)
+            temps_rows.append([poi, str(spans[0][0]), str(spans[-1][1]), _hms(seconds), len(spans)])
+        # Visites POI: ligne POI suivie des lignes véhicule
+        for poi, enter, leave in visits:
+            visites_rows.append([poi, str(enter), str(leave), 1])
+            visites_rows.append([vehicle, str(enter), str(leave), 1])
+            visites_rows.append([vehicle, str(enter), str(leave), 1])
+    temps = pd.DataFrame(temps_rows, columns=['Regroupement', "Heure d'entrée", 'Heure sortie',
+                                              'Temps passé dans la zone', 'Visites'])
+    visites = pd.DataFrame(visites_rows, columns=['Regroupement', "Heure d'entrée", 'Heure sortie', 'Visites'])
+    return temps, visites
+
+
+def build_sheets(vehicles=30, weeks=1, rows_per_day=5, seed=0):
+    """
+    Build the eight analysis sheets of a synthetic weekly export
+
+    Args:
+        vehicles: Number of vehicles in the fleet
+        weeks: Number of weeks covered
+        rows_per_day: Trips per vehicle and per day (other sheets scale with it)
+        seed: Random seed (same arguments always give the same workbook)
+
+    Returns:
+        Dictionary of dataframes keyed like data_loader.SHEET_NAMES
+    """
+    fleet = _Fleet(vehicles, weeks, rows_per_day, seed)
+    speed_columns = ['Regroupement', 'Début', 'Emplacement initial', 'Fin', "Lieu d'arrivée", 'Vitesse maxi']
+    sheets = {
+        'duree_distance': _duree_sheet(fleet),
+        'trajets_non_autorises': pd.DataFrame(_grouped_trip_sheet(fleet, 0.8, (17, 23)), columns=TRIP_COLUMNS),
+        'conduite_journee': pd.DataFrame(_grouped_trip_sheet(fleet, 1.0, (6, 19)), columns=TRIP_COLUMNS),
+        'conduite_nocturne': pd.DataFrame(_grouped_trip_sheet(fleet, 0.7, (19, 23)), columns=TRIP_COLUMNS),
+        'notifications': _notifications_sheet(fleet),
+    }
+    sheets['temps_poi'], sheets['visites_poi'] = _poi_sheets(fleet)
+    # Vitesse: ligne véhicule puis une ligne par jour, sans détail des trajets
+    speed_rows = _grouped_trip_sheet(fleet, 1.0, (6, 22), with_details=False)
+    sheets['vitesse'] = pd.DataFrame([row[:5] + row[7:] for row in speed_rows], columns=speed_columns)
+    return sheets
+
+
+def write_workbook(path, vehicles=30, weeks=1, rows_per_day=5, seed=0):
+    """
+    Write a synthetic workbook to path (same arguments as build_sheets)
+
+    Returns:
+        Dictionary of row counts per sheet key
+    """
+    sheets = build_sheets(vehicles, weeks, rows_per_day, seed)
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        content = pd.DataFrame({'Rapport': ['BP - Rapport Mail Hebdo'] + list(SHEET_NAMES.values())})
+        content.to_excel(writer, sheet_name='Content', index=False)
+        for key, sheet_name in SHEET_NAMES.items():
+            sheets[key].to_excel(writer, sheet_name=sheet_name, index=False)
+    return {key: len(df) for key, df in sheets.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un classeur de flotte synthétique.")
+    parser.add_argument('output', help="Chemin du fichier XLSX à créer")
+    parser.add_argument('--vehicles', type=int, default=30)
+    parser.add_argument('--weeks', type=int, default=1)
+    parser.add_argument('--rows-per-day', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    counts = write_workbook(args.output, args.vehicles, args.weeks, args.rows_per_day, args.seed)
+    for key, count in counts.items():
+        print(f"{SHEET_NAMES[key]:<30} {count:>8} lignes")
+
+
+if __name__ == "__main__":
+    main()
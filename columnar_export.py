@@ -0,0 +1,134 @@
+"""
+Columnar data exports (Parquet, Arrow IPC / Feather, zipped CSV) for BI tools
+
+The sheets are already Arrow-friendly in memory: the repeated text columns are
+categoricals (-> Arrow dictionary arrays over the same codes) and the other
+text columns use pandas' Arrow-backed string dtype, so pa.Table.from_pandas
+reuses the buffers instead of converting row by row. Each table is written to
+its own file and the files are bundled in one zip archive:
+
+    donnees/<sheet>.<ext>       normalized sheets (data_loader.SHEET_NAMES keys)
+    agregats/<section>.<ext>    tables of the page sections (pdf_generators)
+"""
+import io
+import re
+import unicodedata
+import zipfile
+
+import pandas as pd
+import perf
+from data_loader import PAGE_SHEETS
+
+# Format -> libellé, extension des fichiers de l'archive, compression zip (Parquet/Feather sont déjà compressés)
+FORMATS = {
+    'parquet': {'label': 'Parquet', 'extension': 'parquet', 'compression': zipfile.ZIP_STORED},
+    'feather': {'label': 'Arrow IPC (Feather)', 'extension': 'arrow', 'compression': zipfile.ZIP_STORED},
+    'csv': {'label': 'CSV (zip)', 'extension': 'csv', 'compression': zipfile.ZIP_DEFLATED},
+}
+
+
+def _slug(text):
+    """File name of a section title ("Top 15 - Véhicules" -> "top_15_vehicules")"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return re.sub(r'[^0-9a-z]+', '_', text).strip('_') or 'table'
+
+
+def _iter_sections(report_content):
+    """Sections of a page (list) or of the structured report (dict of lists)"""
+    if isinstance(report_content, dict):
+        for sections in report_content.values():
+            yield from sections
+    elif report_content:
+        yield from report_content
+
+
+def collect_tables(data_sheets, current_page=None, report_content=None):
+    """
+    Tables of a columnar export
+
+    Args:
+        data_sheets: Dictionary of dataframes (FleetData)
+        current_page: If specified, export only the sheets of this page
+        report_content: Page sections (list) or structured report (dict), whose tables are exported too
+
+    Returns:
+        Dictionary archive path (without extension) -> dataframe
+    """
+    if current_page:
+        keys = PAGE_SHEETS.get(current_page, [])
+    else:
+        keys = list(data_sheets)
+
+    tables = {f"donnees/{key}": data_sheets[key] for key in keys if key in data_sheets}
+    for section in _iter_sections(report_content):
+        table = section.get('table')
+        if table is None or table.empty:
+            continue
+        name = f"agregats/{_slug(section.get('title'))}"
+        suffix = 2
+        while name in tables:
+            name = f"agregats/{_slug(section.get('title'))}_{suffix}"
+            suffix += 1
+        tables[name] = table
+    return tables
+
+
+def to_arrow(df):
+    """
+    Arrow table of a dataframe (index dropped)
+
+    Categoricals become dictionary arrays and Arrow-backed strings are reused
+    as is. Object columns mixing types (text and numbers in the same column)
+    have no Arrow type: they are written as text.
+    """
+    import pyarrow as pa
+
+    df = df.set_axis([str(column) for column in df.columns], axis=1)
+    mixed = [column for column in df.columns
+             if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True).startswith('mixed')]
+    if mixed:
+        df = df.assign(**{column: df[column].astype(str).where(df[column].notna()) for column in mixed})
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_table(table, fmt, sink):
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink, compression='zstd')
+    elif fmt == 'feather':
+        import pyarrow.feather as feather
+        feather.write_feather(table, sink, compression='zstd')
+    elif fmt == 'csv':
+        import pyarrow.csv as pa_csv
+        pa_csv.write_csv(table, sink)
+    else:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+
+
+@perf.timed('export.columnar')
+def export_columnar(tables, fmt, output=None):
+    """
+    Write tables to a zip archive, one file per table in the given format
+
+    Args:
+        tables: Dictionary archive path (without extension) -> dataframe (see collect_tables)
+        fmt: Key of FORMATS ('parquet', 'feather' or 'csv')
+        output: Binary file object to write to (default: a new BytesIO)
+
+    Returns:
+        The output object, positioned at its start
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+    spec = FORMATS[fmt]
+    output = output if output is not None else io.BytesIO()
+    with zipfile.ZipFile(output, 'w', compression=spec['compression']) as archive:
+        for name, df in tables.items():
+            with perf.timer('export.columnar.convert'):
+                table = to_arrow(df)
+            # Écriture directe dans l'entrée de l'archive, sans copie intermédiaire en mémoire
+            with archive.open(f"{name}.{spec['extension']}", 'w', force_zip64=True) as sink:
+                _write_table(table, fmt, sink)
+    output.seek(0)
+    return output
@@ -0,0 +1,26 @@
+import glob
+import os
+
+import pytest
+
+import data_loader
+
+# Classeurs rendus sans Chrome: pas de pool de renderers Kaleido pendant les tests
+os.environ.setdefault('RENDER_POOL_SIZE', '0')
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='session')
+def sample_workbook():
+    """Path of the weekly export shipped in attached_assets"""
+    paths = glob.glob(os.path.join(ROOT, 'attached_assets', '*.xlsx'))
+    if not paths:
+        pytest.skip("aucun classeur d'exemple dans attached_assets")
+    return paths[0]
+
+
+@pytest.fixture(scope='session')
+def fleet_data(sample_workbook):
+    """FleetData of the sample workbook (parsed once per test session)"""
+    return data_loader.read_sheets(sample_workbook)
@@ -0,0 +1,393 @@
+"""
+Data loading helpers shared by the Streamlit app and the batch CLI
+"""
+import hashlib
+import io
+import multiprocessing as mp
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import perf
+from aggregates import build_trips
+from entities import build_entity_registry
+from fleet_index import build_fleet_index, filter_sheets
+from workbook_schema import SchemaError, validate_workbook
+
+# Clé interne -> nom de la feuille dans le rapport Excel
+SHEET_NAMES = {
+    'duree_distance': 'Durée - Distance - Conso',
+    'trajets_non_autorises': 'Trajets Non Autorisé',
+    'conduite_journee': 'Conduite en Journée',
+    'conduite_nocturne': 'Conduite nocturne',
+    'notifications': 'Notifications',
+    'temps_poi': 'Temps passé dans POI et ...',
+    'visites_poi': 'Visites POI',
+    'vitesse': 'Vitesse de conduite',
+}
+
+# Feuilles lues par chaque page de l'app (et de PDF_GENERATORS)
+PAGE_SHEETS = {
+    'synthese': ['duree_distance', 'trajets_non_autorises', 'conduite_journee', 'conduite_nocturne'],
+    'duree': ['duree_distance'],
+    'trajets': ['trajets_non_autorises'],
+    'jour_nuit': ['conduite_journee', 'conduite_nocturne'],
+    'limitation_vitesse': ['conduite_journee', 'conduite_nocturne', 'vitesse'],
+    'notifications': ['notifications'],
+    'temps_poi': ['temps_poi'],
+    'visites_poi': ['visites_poi'],
+    'vitesse': ['vitesse'],
+    'vehicule': list(SHEET_NAMES),
+}
+
+# Colonnes répétées des milliers de fois -> dictionnaire partagé entre toutes les feuilles.
+# Départ et arrivée partagent le même dictionnaire de lieux.
+DICTIONARY_COLUMNS = {
+    'Regroupement': 'regroupement',
+    'Emplacement initial': 'lieux',
+    "Lieu d'arrivée": 'lieux',
+    'Nom de notification': 'notifications',
+}
+
+
+class FleetData(dict):
+    """
+    Parsed sheets of one upload (dict of dataframes keyed like SHEET_NAMES)
+
+    Derived structures built once per upload are carried as attributes, so
+    they travel with the sheets through st.cache_data and the exporters.
+
+    Attributes:
+        entities: EntityRegistry of the Regroupement values
+        index: FleetIndex of the rows (None once filtered)
+        trips: Day and night trips in one table (aggregates.build_trips)
+        filters: Active filter ({'vehicles', 'start', 'end'}), None for the full upload
+        source: Full upload a filtered FleetData was sliced from
+        content_hash: SHA-256 identifying the upload (the set of workbooks it was merged from)
+        workbooks: Workbooks of the upload ({'name', 'hash', 'duplicate'}), in merge order
+            then the skipped duplicates
+    """
+
+    def __init__(self, sheets, entities=None, index=None, trips=None, filters=None, source=None,
+                 content_hash=None, workbooks=None):
+        super().__init__(sheets)
+        self.entities = entities
+        self.index = index
+        self.trips = trips
+        self.filters = filters
+        self.source = source
+        self.content_hash = content_hash
+        self.workbooks = workbooks or []
+
+
+def get_entities(data):
+    """Entity registry of data, built on the fly for plain dicts of sheets"""
+    entities = getattr(data, 'entities', None)
+    if entities is None:
+        entities = build_entity_registry(data)
+    return entities
+
+
+def get_trips(data):
+    """Unified day/night trips table of data, built on the fly for plain dicts of sheets"""
+    trips = getattr(data, 'trips', None)
+    if trips is None:
+        trips = build_trips(data, get_entities(data))
+    return trips
+
+
+def page_has_rows(data, page):
+    """False when the active filter left no row in any sheet of a page (PAGE_SHEETS)"""
+    return any(len(data[key]) for key in PAGE_SHEETS.get(page, SHEET_NAMES) if key in data)
+
+
+def content_hash(payload):
+    """SHA-256 hex digest of some bytes"""
+    return hashlib.sha256(payload).hexdigest()
+
+
+def merged_hash(workbook_hashes):
+    """Content hash of an upload from the hashes of its distinct workbooks (order and duplicates ignored)"""
+    return content_hash(''.join(sorted(set(workbook_hashes))).encode())
+
+
+def _read_bytes(source):
+    """Name and content of an upload (UploadedFile, file-like object, path or bytes)"""
+    if isinstance(source, (bytes, bytearray)):
+        return 'rapport.xlsx', bytes(source)
+    if hasattr(source, 'getvalue'):
+        return getattr(source, 'name', 'rapport.xlsx'), source.getvalue()
+    if hasattr(source, 'read'):
+        return os.path.basename(getattr(source, 'name', 'rapport.xlsx')), source.read()
+    path = Path(source)
+    return path.name, path.read_bytes()
+
+
+def upload_key(source):
+    """(name, content hash) of an upload, used as the cache key of the app"""
+    name, payload = _read_bytes(source)
+    return name, content_hash(payload)
+
+
+def expand_uploads(sources):
+    """
+    Workbooks contained in a list of uploads
+
+    Args:
+        sources: Uploads (.xlsx workbooks or .zip archives of workbooks)
+
+    Returns:
+        List of (name, bytes), in upload then archive order
+    """
+    workbooks = []
+    for source in sources:
+        name, payload = _read_bytes(source)
+        if not zipfile.is_zipfile(io.BytesIO(payload)) or name.lower().endswith('.xlsx'):
+            workbooks.append((name, payload))
+            continue
+        with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+            members = [info for info in archive.infolist()
+                       if not info.is_dir() and info.filename.lower().endswith('.xlsx')
+                       and not info.filename.startswith('__MACOSX/')
+                       and not os.path.basename(info.filename).startswith('~$')]
+            if not members:
+                raise ValueError(f"{name}: aucun classeur .xlsx dans l'archive")
+            for info in members:
+                workbooks.append((f"{name}/{info.filename}", archive.read(info)))
+    return workbooks
+
+
+def validate_payload(name, payload):
+    """
+    Pre-flight check of one workbook (sheet list and header rows only)
+
+    Returns:
+        Layout of the workbook (see workbook_schema.validate_workbook)
+
+    Raises:
+        SchemaError: prefixed with the workbook name
+    """
+    with perf.timer('load.validate'):
+        try:
+            return validate_workbook(io.BytesIO(payload), SHEET_NAMES)
+        except SchemaError as e:
+            raise SchemaError([f"{name}: {problem}" for problem in e.problems]) from None
+
+
+def _parse_sheets(excel_file, layout):
+    """Raw dataframes of the SHEET_NAMES sheets of one workbook, columns renamed as in layout"""
+    sheets = {}
+    # Un seul ExcelFile: le classeur n'est ouvert et dézippé qu'une fois
+    with pd.ExcelFile(excel_file) as xl:
+        for key, (sheet_name, renames) in layout.items():
+            with perf.timer(f'load.sheet.{key}'):
+                sheets[key] = xl.parse(sheet_name).rename(columns=renames)
+            perf.incr('load.rows', len(sheets[key]))
+    return sheets
+
+
+def _parse_payload(payload, layout):
+    """Process pool entry point: parse one workbook given as bytes"""
+    return _parse_sheets(io.BytesIO(payload), layout)
+
+
+def _first_day(sheets):
+    """Earliest trip start of a parsed workbook (orders the weeks of a merged upload)"""
+    starts = pd.to_datetime(sheets['duree_distance']['Début'].astype(object), errors='coerce')
+    return starts.min() if starts.notna().any() else pd.Timestamp.max
+
+
+def read_sheets(excel_file):
+    """
+    Parse the analysis sheets of a weekly report
+
+    Args:
+        excel_file: Path or file-like object (e.g. Streamlit UploadedFile)
+
+    Returns:
+        FleetData (dictionary of dataframes keyed like SHEET_NAMES)
+
+    Raises:
+        SchemaError: the workbook lacks an expected sheet or column
+    """
+    name, payload = _read_bytes(excel_file)
+    layout = validate_payload(name, payload)
+    with perf.timer('load.read_sheets'):
+        sheets = _parse_sheets(io.BytesIO(payload), layout)
+    digest = content_hash(payload)
+    return _build_fleet_data(sheets, merged_hash([digest]), [{'name': name, 'hash': digest, 'duplicate': False}])
+
+
+def read_workbooks(sources, jobs=None, progress=None):
+    """
+    Parse and merge several weekly reports (a quarter uploaded at once)
+
+    Zip archives are expanded, workbooks with identical content are parsed
+    once, every workbook is validated (workbook_schema) before any of them is
+    parsed, and the remaining ones are parsed concurrently in a process pool.
+    The sheets are then concatenated week after week (ordered by first trip)
+    and encoded, indexed... once, like a single upload.
+
+    Args:
+        sources: Uploads (.xlsx workbooks or .zip archives, see expand_uploads)
+        jobs: Number of parser processes (default: one per workbook, at most the CPU count)
+        progress: Optional callback progress(done, total, name) called after each parsed workbook
+
+    Returns:
+        FleetData of the merged upload
+
+    Raises:
+        SchemaError: a workbook lacks an expected sheet or column
+    """
+    workbooks, seen = [], {}
+    for name, payload in expand_uploads(sources):
+        digest = content_hash(payload)
+        workbooks.append({'name': name, 'hash': digest, 'duplicate': digest in seen})
+        seen.setdefault(digest, payload)
+    unique = [workbook for workbook in workbooks if not workbook['duplicate']]
+    if not unique:
+        raise ValueError("Aucun classeur à charger")
+    # Contrôle de tous les classeurs avant de lancer la moindre lecture complète
+    layouts = {workbook['hash']: validate_payload(workbook['name'], seen[workbook['hash']]) for workbook in unique}
+
+    parsed = {}
+    jobs = min(jobs or os.cpu_count() or 1, len(unique))
+    with perf.timer('load.read_sheets'):
+        if jobs <= 1:
+            for done, workbook in enumerate(unique, 1):
+                parsed[workbook['hash']] = _parse_payload(seen[workbook['hash']], layouts[workbook['hash']])
+                if progress:
+                    progress(done, len(unique), workbook['name'])
+        else:
+            # spawn: ne pas dupliquer les threads du serveur Streamlit dans les processus de lecture
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=mp.get_context('spawn')) as pool:
+                futures = {pool.submit(_parse_payload, seen[workbook['hash']], layouts[workbook['hash']]): workbook
+                           for workbook in unique}
+                for done, future in enumerate(as_completed(futures), 1):
+                    workbook = futures[future]
+                    try:
+                        parsed[workbook['hash']] = future.result()
+                    except Exception as e:
+                        raise ValueError(f"{workbook['name']}: {e}") from e
+                    if progress:
+                        progress(done, len(unique), workbook['name'])
+
+    unique.sort(key=lambda workbook: (_first_day(parsed[workbook['hash']]), workbook['hash']))
+    with perf.timer('load.merge'):
+        sheets = {key: pd.concat([parsed[workbook['hash']][key] for workbook in unique], ignore_index=True)
+                  for key in SHEET_NAMES}
+    digest = merged_hash(workbook['hash'] for workbook in unique)
+    duplicates = [workbook for workbook in workbooks if workbook['duplicate']]
+    return _build_fleet_data(sheets, digest, unique + duplicates)
+
+
+def _build_fleet_data(sheets, digest, workbooks):
+    """Encode, classify and index parsed sheets into a FleetData"""
+    with perf.timer('load.encode'):
+        encode_sheets(sheets)
+    with perf.timer('load.entities'):
+        entities = build_entity_registry(sheets)
+    with perf.timer('load.index'):
+        index = build_fleet_index(sheets, entities)
+    with perf.timer('load.trips'):
+        trips = build_trips(sheets, entities)
+    return FleetData(sheets, entities=entities, index=index, trips=trips,
+                     content_hash=digest, workbooks=workbooks)
+
+
+def apply_filter(data, vehicles=None, start=None, end=None):
+    """
+    Restrict an upload to some vehicles and/or an inclusive date range
+
+    Args:
+        data: FleetData returned by read_sheets
+        vehicles: Iterable of plates (None or empty: every vehicle)
+        start, end: datetime.date bounds (None: open)
+
+    Returns:
+        FleetData with sliced sheets (data itself when no filter is active)
+    """
+    vehicles = list(vehicles) if vehicles else None
+    if vehicles is None and start is None and end is None:
+        return data
+    with perf.timer('filter.apply'):
+        sheets = filter_sheets(data, data.index, vehicles, start, end)
+        trips = build_trips(sheets, data.entities)
+    return FleetData(sheets, entities=data.entities, trips=trips,
+                     filters={'vehicles': vehicles, 'start': start, 'end': end}, source=data,
+                     content_hash=data.content_hash, workbooks=data.workbooks)
+
+
+def vehicle_choices(data):
+    """Plates offered by the drill-down: the filtered vehicles, else the whole fleet"""
+    filters = getattr(data, 'filters', None) or {}
+    return filters.get('vehicles') or list(get_entities(data).vehicles)
+
+
+def vehicle_data(data, vehicle, headers=True):
+    """
+    Rows of every sheet owned by one vehicle
+
+    Served from the vehicle partition of the upload's FleetIndex (no scan of
+    the other vehicles' rows); the date range of a filtered FleetData still
+    applies.
+
+    Args:
+        data: FleetData from read_sheets or apply_filter
+        vehicle: Plate
+        headers: Keep the per-vehicle total rows at the top of each block
+
+    Returns:
+        FleetData restricted to the vehicle
+    """
+    source = data.source if getattr(data, 'source', None) is not None else data
+    filters = getattr(data, 'filters', None) or {}
+    start, end = filters.get('start'), filters.get('end')
+    index = source.index
+    with perf.timer('filter.vehicle'):
+        sheets = {}
+        for key, df in source.items():
+            if key not in index.sheets:
+                sheets[key] = df
+            elif start is None and end is None:
+                sheets[key] = df.iloc[index.vehicle_positions(key, vehicle, headers)]
+            else:
+                positions = index.positions(key, [vehicle], start, end)
+                if not headers:
+                    positions = positions[~np.isin(positions, index.sheets[key].headers)]
+                sheets[key] = df.iloc[positions]
+    return FleetData(sheets, entities=source.entities,
+                     filters={'vehicles': [vehicle], 'start': start, 'end': end}, source=source,
+                     content_hash=source.content_hash, workbooks=source.workbooks)
+
+
+def encode_sheets(sheets):
+    """
+    Intern the repeated string columns into categoricals shared by all sheets
+
+    Every column of DICTIONARY_COLUMNS gets the same CategoricalDtype in every
+    sheet, so a vehicle has the same integer code in 'duree_distance' and in
+    'conduite_nocturne': cross-sheet lookups, isin() and groupbys then work on
+    codes instead of Python strings.
+
+    Args:
+        sheets: Dictionary of dataframes, modified in place
+
+    Returns:
+        Dictionary of dictionary name -> CategoricalDtype
+    """
+    values = {}
+    for df in sheets.values():
+        for column, dictionary in DICTIONARY_COLUMNS.items():
+            if column in df.columns:
+                values.setdefault(dictionary, set()).update(df[column].dropna().astype(str).unique())
+
+    dtypes = {name: pd.CategoricalDtype(sorted(vals)) for name, vals in values.items()}
+    for df in sheets.values():
+        for column, dictionary in DICTIONARY_COLUMNS.items():
+            if column in df.columns:
+                df[column] = df[column].astype(str).where(df[column].notna()).astype(dtypes[dictionary])
+    return dtypes
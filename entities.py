@@ -0,0 +1,109 @@
+"""
+Entity registry: what each Regroupement value stands for
+
+The GPS export mixes several kinds of rows in the Regroupement column: vehicle
+plates, points of interest, per-day subtotal rows ("2026-01-27") and
+separators ("-----", the "Total" footer). The registry tags every value once
+per upload so pages classify rows with an array lookup on the categorical
+codes instead of isin() on Python lists or string prefix tests.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+VEHICLE = 'vehicle'
+POI = 'poi'
+DATE = 'date'
+SEPARATOR = 'separator'
+KINDS = (VEHICLE, POI, DATE, SEPARATOR)
+
+SEPARATOR_VALUES = {'-----', 'total'}
+
+# Plaque d'immatriculation ("BS 8091 RB"); les POI ont un tiret ("BP - Abomey")
+PLATE_PATTERN = re.compile(r'[A-Z]{1,3} ?\d{1,4} ?[A-Z]{1,3}')
+
+
+def is_plate(value):
+    """True for a value written like a licence plate"""
+    return PLATE_PATTERN.fullmatch(str(value).strip()) is not None
+
+
+def classify(value, vehicles):
+    """Kind of a single Regroupement value given the set of known vehicles"""
+    text = str(value).strip()
+    if text.startswith('202'):
+        return DATE
+    if text.lower() in SEPARATOR_VALUES:
+        return SEPARATOR
+    if value in vehicles:
+        return VEHICLE
+    return POI
+
+
+class EntityRegistry:
+    """
+    Kind of every Regroupement value of an upload
+
+    Args:
+        categories: Regroupement values (the shared categorical dictionary)
+        vehicles: Vehicle plates, in order of appearance in 'duree_distance', then the
+            plates only found in the other sheets
+    """
+
+    def __init__(self, categories, vehicles):
+        self.categories = pd.Index(categories)
+        self.vehicles = list(vehicles)
+        vehicle_set = set(self.vehicles)
+        self.kinds = pd.Series([classify(value, vehicle_set) for value in self.categories],
+                               index=self.categories, dtype=object)
+        # Une table booléenne par type, indexée par code catégoriel.
+        # Dernière case = code -1 (valeur manquante), toujours False.
+        kinds = self.kinds.to_numpy()
+        self._lookup = {kind: np.append(kinds == kind, False) for kind in KINDS}
+
+    def kind(self, value):
+        """Kind of one value (None if unknown)"""
+        return self.kinds.get(value)
+
+    def mask(self, series, kind):
+        """
+        Boolean mask of the rows of series whose Regroupement is of the given kind
+
+        Uses the categorical codes when series shares the registry's dictionary,
+        and falls back to a value lookup otherwise.
+        """
+        if isinstance(series.dtype, pd.CategoricalDtype) and series.cat.categories.equals(self.categories):
+            return self._lookup[kind][series.cat.codes.to_numpy()]
+        return series.map(self.kinds).eq(kind).to_numpy()
+
+    def values_of(self, kind):
+        """All values of a kind"""
+        return self.kinds.index[self.kinds.to_numpy() == kind].tolist()
+
+
+def build_entity_registry(sheets):
+    """
+    Build the registry of an upload
+
+    Vehicles are the plates of the 'duree_distance' sheet (same rule as the
+    pages used so far), plus the values written like a plate in the other
+    sheets (a vehicle without trips can still have POI rows); dates and
+    separators are recognized by value; every other Regroupement value is a
+    point of interest.
+    """
+    column = sheets['duree_distance']['Regroupement']
+    vehicles = [v for v in column.dropna().unique()
+                if not str(v).startswith('202') and str(v).strip().lower() not in SEPARATOR_VALUES]
+
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories
+    else:
+        values = set()
+        for df in sheets.values():
+            if 'Regroupement' in df.columns:
+                values.update(df['Regroupement'].dropna().unique())
+        categories = sorted(values, key=str)
+    known = set(vehicles)
+    vehicles += [value for value in categories if value not in known and is_plate(value)]
+    return EntityRegistry(categories, vehicles)
@@ -0,0 +1,75 @@
+"""
+Delivery of generated exports without keeping several copies in memory
+
+The exporters (export_utils.create_pdf_report, export_data_to_excel,
+columnar_export.export_columnar) write into the file object given as
+`output`. A spooled temporary file keeps small exports in memory and moves
+larger ones to disk past EXPORT_SPOOL_MAX_MB, so the report is never held as
+a growing BytesIO plus its getvalue() copy. The file is then handed over
+once (read_all for st.download_button, iter_chunks for chunked writers and
+HTTP responses) and closed, which deletes the temporary file.
+
+Configuration (environment variables):
+    EXPORT_SPOOL_MAX_MB: size above which an export is spooled to disk (default 8)
+    EXPORT_CHUNK_KB: chunk size of iter_chunks (default 1024)
+"""
+import os
+import tempfile
+from datetime import datetime
+
+SPOOL_MAX_SIZE = int(os.environ.get('EXPORT_SPOOL_MAX_MB', 8)) * 1024 * 1024
+CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_KB', 1024)) * 1024
+
+
+def spooled_output():
+    """New temporary file for an export (in memory up to SPOOL_MAX_SIZE, then on disk)"""
+    if SPOOL_MAX_SIZE <= 0:
+        # SpooledTemporaryFile(max_size=0) ne bascule jamais sur disque
+        return tempfile.TemporaryFile(mode='w+b', prefix='export_')
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+b', prefix='export_')
+
+
+def iter_chunks(output, chunk_size=CHUNK_SIZE):
+    """
+    Content of an export file, chunk by chunk, from its start
+
+    The file is closed (and its temporary storage removed) once consumed, or
+    when the consumer stops early (generator closed or garbage collected).
+
+    Args:
+        output: Binary file object returned by an exporter
+        chunk_size: Bytes per chunk
+
+    Yields:
+        bytes chunks
+    """
+    try:
+        output.seek(0)
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        output.close()
+
+
+def read_all(output):
+    """
+    Whole content of an export file as one bytes object, then close the file
+
+    For APIs that need the payload at once (st.download_button): a single
+    read into the final bytes object, the temporary file is freed right after.
+    """
+    try:
+        output.seek(0)
+        return output.read()
+    finally:
+        output.close()
+
+
+def get_filename(page_name, file_format):
+    """Generate filename with timestamp"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    page_clean = page_name.replace(" ", "_").replace("/", "_")
+    return f"Rapport_{page_clean}_{timestamp}.{file_format}"
@@ -0,0 +1,207 @@
+"""
+Process-wide queue for the full-report exports
+
+The "(Tout)" exports (PDF, Excel, HTML, data) are the expensive requests of the
+app. Built in the Streamlit script thread, simultaneous clicks from several
+dispatchers each run their own report at the same time and starve the server.
+They are submitted here instead and built by a small pool of worker threads
+shared by every session of the server process:
+
+- at most EXPORT_WORKERS exports are built at once;
+- the next job is taken from the waiting sessions in turn (round robin), so a
+  session queueing several exports does not hold everybody else back;
+- identical requests (same upload content hash, export kind and filter) share
+  one job: the second dispatcher downloads the file built for the first one;
+- results are kept EXPORT_RESULT_TTL seconds to be downloaded, then dropped;
+  they count in the 'exports' category of memory_budget, which may drop them
+  earlier (the session then shows an error and the export can be run again).
+
+Configuration (environment variables):
+    EXPORT_WORKERS: number of worker threads (default 2)
+    EXPORT_RESULT_TTL: seconds a finished export stays available (default 600)
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import memory_budget
+import perf
+
+_job_ids = itertools.count(1)
+
+
+class ExportJob:
+    """
+    One export request, shared by the sessions that asked for the same file
+
+    Attributes:
+        id: Sequential job number
+        key: Deduplication key (content hash, export kind, filter)
+        status: 'queued', 'running', 'done' or 'error'
+        result: Export bytes once done
+        error: Error message when status is 'error'
+    """
+
+    def __init__(self, key, build):
+        self.id = next(_job_ids)
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self._build = build
+
+    @property
+    def pending(self):
+        return self.status in ('queued', 'running')
+
+
+class ExportScheduler:
+    """
+    Bounded pool of export threads with per-session round robin
+
+    Args:
+        workers: Number of exports built at the same time
+        result_ttl: Seconds a finished job stays available for download and deduplication
+    """
+
+    def __init__(self, workers=2, result_ttl=600):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._cond = threading.Condition()
+        # Session -> jobs en attente; l'ordre du dictionnaire est l'ordre de passage des sessions
+        self._waiting = OrderedDict()
+        self._jobs = {}
+        self._running = 0
+        self._counters = {'submitted': 0, 'deduplicated': 0, 'done': 0, 'errors': 0}
+        for number in range(workers):
+            threading.Thread(target=self._work, name=f"export-worker-{number}", daemon=True).start()
+
+    def submit(self, session_id, key, build):
+        """
+        Queue an export, or join the identical one already queued, running or finished
+
+        Args:
+            session_id: Identifier of the requesting session (fairness unit)
+            key: Deduplication key, e.g. (content hash, export kind, filter)
+            build: Function without arguments returning the export bytes; it runs
+                on a worker thread and must not call Streamlit
+
+        Returns:
+            ExportJob
+        """
+        with self._cond:
+            self._expire()
+            job = self._jobs.get(key)
+            if job is not None and job.status != 'error':
+                self._counters['deduplicated'] += 1
+                return job
+            job = ExportJob(key, build)
+            self._jobs[key] = job
+            self._waiting.setdefault(session_id, deque()).append(job)
+            self._counters['submitted'] += 1
+            self._cond.notify()
+            return job
+
+    def position(self, job):
+        """1-based place of a queued job in the order the workers will take it (0 if not queued)"""
+        with self._cond:
+            if job.status != 'queued':
+                return 0
+            # Tour par tour: le 1er job de chaque session, puis le 2e, etc.
+            queues = list(self._waiting.values())
+            position = 0
+            for turn in range(max(len(jobs) for jobs in queues)):
+                for jobs in queues:
+                    if turn < len(jobs):
+                        position += 1
+                        if jobs[turn] is job:
+                            return position
+            return 0
+
+    def _next_job(self):
+        session_id, jobs = next(iter(self._waiting.items()))
+        job = jobs.popleft()
+        del self._waiting[session_id]
+        if jobs:
+            # La session repasse en fin de tour
+            self._waiting[session_id] = jobs
+        return job
+
+    def _expire(self):
+        now = time.time()
+        for key, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > self.result_ttl:
+                del self._jobs[key]
+                memory_budget.get_budget().remove(('exports', job.id))
+
+    def _evict(self, job):
+        """Drop the file of a finished job (memory budget eviction)"""
+        with self._cond:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+            job.result = None
+            job.status = 'error'
+            job.error = "fichier retiré de la mémoire du serveur, relancez l'export"
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._waiting:
+                    self._cond.wait()
+                job = self._next_job()
+                job.status = 'running'
+                self._running += 1
+            try:
+                with perf.timer('export.queue.build', kind=str(job.key[1])):
+                    result, error = job._build(), None
+            except Exception as e:
+                result, error = None, str(e)
+            with self._cond:
+                self._running -= 1
+                job.result, job.error = result, error
+                job.status = 'done' if error is None else 'error'
+                job.finished = time.time()
+                job._build = None  # libère les données capturées par la fonction d'export
+                self._counters['done' if error is None else 'errors'] += 1
+            if error is None:
+                memory_budget.get_budget().add(('exports', job.id), {'exports': len(result)},
+                                               evict=lambda job=job: self._evict(job))
+
+    def metrics(self):
+        """Snapshot of workers, running and queued jobs and counters"""
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'running': self._running,
+                'queued': sum(len(jobs) for jobs in self._waiting.values()),
+                'waiting_sessions': len(self._waiting),
+                'kept_results': sum(1 for job in self._jobs.values() if job.status == 'done'),
+                **self._counters,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide export scheduler, starting its workers on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ExportScheduler(
+                workers=max(1, int(os.environ.get('EXPORT_WORKERS', '2'))),
+                result_ttl=int(os.environ.get('EXPORT_RESULT_TTL', '600')),
+            )
+    return _scheduler
+
+
+def metrics():
+    """Scheduler metrics, or an empty snapshot when no export was queued yet"""
+    if _scheduler is not None:
+        return _scheduler.metrics()
+    return {'workers': 0}
@@ -1,24 +1,51 @@
 import io
 import pandas as pd
-try:
-    import plotly.io as pio
-    # Test if kaleido is working
-    pio.kaleido.scope.chromium_args += ("--single-process",)
-except Exception as e:
-    print(f"Warning: Plotly image export may not work: {e}")
-    import plotly.io as pio
 from datetime import datetime
 import xlsxwriter
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak, Flowable
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import base64
+import copy
+import functools
+import hashlib
 import re
+from html import escape
+from data_loader import PAGE_SHEETS
+from export_delivery import get_filename  # noqa: F401 (défini hors de la pile d'export)
+import memory_budget
+import perf
+import render_pool
+import report_markdown
 
-def export_data_to_excel(data_sheets, current_page=None, report_content=None):
+
+# Images déjà rendues, par empreinte de la figure et des options; évincées par memory_budget
+_image_cache = memory_budget.BudgetedCache('images')
+
+
+def figure_to_image(fig, **kwargs):
+    """Rasterize a Plotly figure (pio.to_image arguments) on the shared warm renderer pool"""
+    perf.incr('export.images')
+    key = None
+    if hasattr(fig, 'to_json'):
+        key = hashlib.sha1((fig.to_json() + repr(sorted(kwargs.items()))).encode()).hexdigest()
+        image = _image_cache.get(key)
+        if image is not None:
+            perf.incr('export.images_cached')
+            return image
+    with perf.timer('export.to_image'):
+        image = render_pool.to_image(fig, **kwargs)
+    if key is not None:
+        _image_cache.put(key, image, {'images': len(image)})
+    return image
+
+
+@perf.timed('export.excel')
+def export_data_to_excel(data_sheets, current_page=None, report_content=None, output=None):
     """
     Export data to Excel file with optional report content (charts, text)
     
@@ -26,11 +53,13 @@ def export_data_to_excel(data_sheets, current_page=None, report_content=None):
         data_sheets: Dictionary of dataframes from the loaded Excel file
         current_page: If specified, export only data for this page. Otherwise export all.
         report_content: List of dictionaries with 'title', 'figure', 'text', etc. (from pdf_generators)
+        output: Seekable binary file object to write to (e.g. export_delivery.spooled_output()
+            or an open file); defaults to a new BytesIO
     
     Returns:
-        BytesIO object containing the Excel file
+        The output object containing the Excel file, positioned at its start
     """
-    output = io.BytesIO()
+    output = output if output is not None else io.BytesIO()
     
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         workbook = writer.book
@@ -89,7 +118,7 @@ def export_data_to_excel(data_sheets, current_page=None, report_content=None):
                         # Chart
                         if 'figure' in section and section['figure'] is not None:
                             try:
-                                img_bytes = pio.to_image(section['figure'], format='png', width=800, height=450, scale=1)
+                                img_bytes = figure_to_image(section['figure'], format='png', width=800, height=450, scale=1)
                                 image_data = io.BytesIO(img_bytes)
                                 worksheet.insert_image(row, 1, 'chart.png', {'image_data': image_data, 'x_scale': 0.7, 'y_scale': 0.7})
                                 row += 15 
@@ -158,18 +187,7 @@ def export_data_to_excel(data_sheets, current_page=None, report_content=None):
 
 def get_sheets_for_page(page):
     """Map analysis page to corresponding data sheets"""
-    page_mapping = {
-        'synthese': ['duree_distance', 'trajets_non_autorises', 'conduite_journee', 'conduite_nocturne'],
-        'duree': ['duree_distance'],
-        'trajets': ['trajets_non_autorises'],
-        'jour_nuit': ['conduite_journee', 'conduite_nocturne'],
-        'limitation_vitesse': ['conduite_journee', 'conduite_nocturne', 'vitesse'],
-        'notifications': ['notifications'],
-        'temps_poi': ['temps_poi'],
-        'visites_poi': ['visites_poi'],
-        'vitesse': ['vitesse']
-    }
-    return page_mapping.get(page, [])
+    return list(PAGE_SHEETS.get(page, []))
 
 
 def export_chart_to_image(fig, format='png'):
@@ -183,149 +201,437 @@ def export_chart_to_image(fig, format='png'):
     Returns:
         BytesIO object containing the image
     """
-    img_bytes = pio.to_image(fig, format=format, width=1200, height=600)
+    img_bytes = figure_to_image(fig, format=format, width=1200, height=600)
     return io.BytesIO(img_bytes)
 
 
-def create_html_report(page_name, charts_data, interpretations):
+_HTML_STYLE = """
+body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 40px; background-color: #f5f5f5; }
+.header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px;
+          border-radius: 10px; margin-bottom: 30px; }
+.header h1 { margin: 0; font-size: 28px; }
+.header p { margin: 10px 0 0 0; opacity: 0.9; }
+nav { background: white; padding: 15px 25px; border-radius: 8px; margin-bottom: 25px; }
+nav a { color: #667eea; margin-right: 18px; text-decoration: none; }
+h1.part { color: #764ba2; margin: 40px 0 20px 0; }
+.section { background: white; padding: 25px; margin-bottom: 25px; border-radius: 8px;
+           box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+.section h2 { color: #667eea; border-bottom: 2px solid #667eea; padding-bottom: 10px; margin-top: 0; }
+.metrics { display: flex; flex-wrap: wrap; gap: 15px; margin: 15px 0; }
+.metric { background: #f8f9fa; border: 1px solid #e0e0e0; border-radius: 5px; padding: 12px 20px; text-align: center; }
+.metric b { display: block; font-size: 20px; color: #2c3e50; }
+.metric span { font-size: 13px; color: #7f8c8d; }
+.chart { margin: 20px 0; min-height: 450px; }
+.interpretation { background: #f8f9fa; border-left: 4px solid #667eea; padding: 15px 20px; margin: 15px 0; border-radius: 5px; }
+table { border-collapse: collapse; margin: 15px 0; font-size: 13px; }
+th { background: #667eea; color: white; padding: 6px 10px; }
+td { border: 1px solid #e0e0e0; padding: 4px 10px; }
+tr:nth-child(even) td { background: #f8f9fa; }
+.table-wrap { max-height: 600px; overflow: auto; }
+.footer { text-align: center; color: #666; margin-top: 40px; padding-top: 20px; border-top: 1px solid #ddd; }
+@media print { body { margin: 20px; } .section { page-break-inside: avoid; } .table-wrap { max-height: none; } }
+"""
+
+# Rendu côté navigateur des graphiques et tableaux à partir des données JSON intégrées
+_HTML_LOADER = """
+document.querySelectorAll('script[data-figure]').forEach(function (node) {
+  var spec = JSON.parse(node.textContent);
+  var target = document.getElementById(node.getAttribute('data-figure'));
+  Plotly.newPlot(target, spec.data, spec.layout || {}, {responsive: true, displaylogo: false});
+});
+document.querySelectorAll('script[data-table]').forEach(function (node) {
+  var spec = JSON.parse(node.textContent);
+  var table = document.createElement('table');
+  var head = table.createTHead().insertRow();
+  spec.columns.forEach(function (column) {
+    var th = document.createElement('th'); th.textContent = column; head.appendChild(th);
+  });
+  var body = table.createTBody();
+  spec.data.forEach(function (row) {
+    var tr = body.insertRow();
+    row.forEach(function (value) { tr.insertCell().textContent = value === null ? '' : value; });
+  });
+  document.getElementById(node.getAttribute('data-table')).appendChild(table);
+});
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def _plotly_js():
+    """plotly.js bundle shipped with the plotly package (read once per process)"""
+    from plotly.offline import get_plotlyjs
+    return get_plotlyjs()
+
+
+def _json_script(payload, attribute, target):
+    """JSON data block; '</' is escaped so the payload cannot close the <script> element"""
+    payload = payload.replace('</', '<\\/')
+    return f'<script type="application/json" {attribute}="{target}">{payload}</script>\n'
+
+
+def _markdown_html(text):
+    """HTML of an interpretation text (report_markdown blocks)"""
+    parts = []
+    for block in report_markdown.parse_markdown(text):
+        kind = block[0]
+        if kind == 'heading':
+            level = min(block[1] + 1, 6)
+            parts.append(f"<h{level}>{report_markdown.inline_markup(block[2])}</h{level}>")
+        elif kind == 'paragraph':
+            parts.append("<p>" + "<br>".join(report_markdown.inline_markup(line) for line in block[1]) + "</p>")
+        elif kind in ('bullets', 'numbered'):
+            tag = 'ul' if kind == 'bullets' else 'ol'
+            items = "".join(f"<li>{report_markdown.inline_markup(item)}</li>" for item in block[1])
+            parts.append(f"<{tag}>{items}</{tag}>")
+        elif kind == 'table':
+            header = "".join(f"<th>{report_markdown.inline_markup(cell)}</th>" for cell in block[1])
+            rows = "".join("<tr>" + "".join(f"<td>{report_markdown.inline_markup(cell)}</td>" for cell in row) + "</tr>"
+                           for row in block[2])
+            parts.append(f"<table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table>")
+    return "\n".join(parts)
+
+
+@perf.timed('export.html')
+def create_html_report(page_name, charts_and_text, output=None):
     """
-    Create an HTML report that can be saved or printed to PDF
-    
+    Create a self-contained interactive HTML report (works offline)
+
+    Figures are embedded as Plotly JSON and drawn in the browser by a single
+    inlined plotly.js bundle: no image is rasterized. Section tables are
+    embedded in full as JSON (orient='split') and rendered client-side.
+
     Args:
         page_name: Name of the analysis page
-        charts_data: List of tuples (chart_title, fig_object)
-        interpretations: List of interpretation text blocks
-    
+        charts_and_text: Same sections as create_pdf_report (a "=== Title ===" section
+            starts a part of the full report)
+        output: Binary file object to write to (e.g. export_delivery.spooled_output());
+            defaults to a new BytesIO
+
     Returns:
-        HTML string
+        The output object containing the UTF-8 HTML, positioned at its start
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <title>Rapport d'Analyse - {page_name}</title>
-        <style>
-            body {{
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                margin: 40px;
-                background-color: #f5f5f5;
-            }}
-            .header {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 30px;
-                border-radius: 10px;
-                margin-bottom: 30px;
-            }}
-            .header h1 {{
-                margin: 0;
-                font-size: 28px;
-            }}
-            .header p {{
-                margin: 10px 0 0 0;
-                opacity: 0.9;
-            }}
-            .section {{
-                background: white;
-                padding: 25px;
-                margin-bottom: 25px;
-                border-radius: 8px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
-            .section h2 {{
-                color: #667eea;
-                border-bottom: 2px solid #667eea;
-                padding-bottom: 10px;
-                margin-top: 0;
-            }}
-            .chart {{
-                margin: 20px 0;
-                text-align: center;
-            }}
-            .chart img {{
-                max-width: 100%;
-                border-radius: 5px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.15);
-            }}
-            .interpretation {{
-                background: #f8f9fa;
-                border-left: 4px solid #667eea;
-                padding: 15px 20px;
-                margin: 15px 0;
-                border-radius: 5px;
-            }}
-            .footer {{
-                text-align: center;
-                color: #666;
-                margin-top: 40px;
-                padding-top: 20px;
-                border-top: 1px solid #ddd;
-            }}
-            @media print {{
-                body {{ margin: 20px; }}
-                .section {{ page-break-inside: avoid; }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>📊 Rapport d'Analyse - {page_name}</h1>
-            <p>BP - SADCI GAS PARAKOU</p>
-            <p>Généré le {timestamp}</p>
-        </div>
+    output = output if output is not None else io.BytesIO()
+    write = lambda text: output.write(text.encode('utf-8'))  # noqa: E731
+    timestamp = datetime.now().strftime("%d/%m/%Y %H:%M")
+    title = escape(page_name)
+
+    parts = [section['title'][4:-4] for section in charts_and_text
+             if re.fullmatch(r'=== .* ===', section.get('title') or '')]
+    write(f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>Rapport d'Analyse - {title}</title>
+<style>{_HTML_STYLE}</style>
+<script>{_plotly_js()}</script>
+</head>
+<body>
+<div class="header">
+<h1>📊 Rapport d'Analyse - {title}</h1>
+<p>BP - SADCI GAS PARAKOU</p>
+<p>Généré le {timestamp}</p>
+</div>
+""")
+    if parts:
+        write("<nav>" + "".join(f'<a href="#part-{i}">{escape(part)}</a>' for i, part in enumerate(parts)) + "</nav>\n")
+
+    part_number = 0
+    for number, section in enumerate(charts_and_text):
+        section_title = section.get('title') or ''
+        if re.fullmatch(r'=== .* ===', section_title):
+            write(f'<h1 class="part" id="part-{part_number}">{escape(section_title[4:-4])}</h1>\n')
+            part_number += 1
+            continue
+
+        write('<div class="section">\n')
+        if section_title:
+            write(f"<h2>{escape(section_title)}</h2>\n")
+        if section.get('metrics'):
+            write('<div class="metrics">' + "".join(
+                f"<div class=\"metric\"><b>{escape(str(m.get('value', '')))}</b><span>{escape(str(m.get('label', '')))}</span></div>"
+                for m in section['metrics']) + "</div>\n")
+        if section.get('table') is not None:
+            with perf.timer('export.html.table'):
+                payload = section['table'].to_json(orient='split', index=False, date_format='iso', force_ascii=False)
+            write(f'<div class="table-wrap" id="table-{number}"></div>\n')
+            write(_json_script(payload, 'data-table', f"table-{number}"))
+        if section.get('figure') is not None:
+            with perf.timer('export.html.figure'):
+                payload = section['figure'].to_json()
+            write(f'<div class="chart" id="figure-{number}"></div>\n')
+            write(_json_script(payload, 'data-figure', f"figure-{number}"))
+        if section.get('text'):
+            write(f'<div class="interpretation">\n{_markdown_html(section["text"])}\n</div>\n')
+        write('</div>\n')
+
+    write(f"""<div class="footer">
+<p>Document généré automatiquement par Data Insights Explorer</p>
+</div>
+<script>{_HTML_LOADER}</script>
+</body>
+</html>
+""")
+    output.seek(0)
+    return output
+
+
+# Tableaux du PDF: mêmes couleurs que l'en-tête du rapport, une ligne par enregistrement
+_TABLE_FONT, _TABLE_HEADER_FONT = ('Helvetica', 9), ('Helvetica-Bold', 10)
+_TABLE_ROW_HEIGHT, _TABLE_HEADER_HEIGHT = 16, 26
+_TABLE_PADDING = 12  # LEFTPADDING + RIGHTPADDING par défaut de ReportLab
+_TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), _TABLE_HEADER_FONT[0]),
+    ('FONTSIZE', (0, 0), (-1, 0), _TABLE_HEADER_FONT[1]),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e0e0e0')),
+    ('FONTNAME', (0, 1), (-1, -1), _TABLE_FONT[0]),
+    ('FONTSIZE', (0, 1), (-1, -1), _TABLE_FONT[1]),
+]
+_ROW_COLORS = [colors.white, colors.HexColor('#f8f9fa')]
+
+
+
+def _build_styles():
+    """ParagraphStyles of the PDF reports, built once at import"""
+    base = getSampleStyleSheet()
+    text = ParagraphStyle('CustomText', parent=base['Normal'], fontSize=10, spaceAfter=10, leading=14)
+    return {
+        'title': ParagraphStyle('CustomTitle', parent=base['Heading1'], fontSize=24,
+                                textColor=colors.HexColor('#667eea'), spaceAfter=12,
+                                alignment=TA_CENTER, fontName='Helvetica-Bold'),
+        'subtitle': ParagraphStyle('CustomSubtitle', parent=base['Normal'], fontSize=12,
+                                   textColor=colors.HexColor('#666666'), spaceAfter=20, alignment=TA_CENTER),
+        'heading': ParagraphStyle('CustomHeading', parent=base['Heading2'], fontSize=16,
+                                  textColor=colors.HexColor('#667eea'), spaceAfter=12, spaceBefore=20,
+                                  fontName='Helvetica-Bold'),
+        'text': text,
+        # Titres, listes et tableaux des textes d'interprétation (markdown)
+        'text_heading': ParagraphStyle('TextHeading', parent=text, fontName='Helvetica-Bold', fontSize=11,
+                                       textColor=colors.HexColor('#2c3e50'), spaceBefore=4, spaceAfter=6),
+        'bullet': ParagraphStyle('TextBullet', parent=text, leftIndent=18, bulletIndent=6, spaceAfter=3),
+        'table_cell': ParagraphStyle('TextTableCell', parent=text, fontSize=9, leading=11, spaceAfter=0),
+        'table_header': ParagraphStyle('TextTableHeader', parent=text, fontSize=9, leading=11, spaceAfter=0,
+                                       fontName='Helvetica-Bold', textColor=colors.whitesmoke),
+        'metric': ParagraphStyle('Metric', parent=base['Normal'], fontSize=12,
+                                 textColor=colors.HexColor('#2c3e50'), alignment=TA_CENTER,
+                                 fontName='Helvetica-Bold'),
+        'footer': ParagraphStyle('Footer', parent=base['Normal'], fontSize=8,
+                                 textColor=colors.grey, alignment=TA_CENTER),
+    }
+
+
+PDF_STYLES = _build_styles()
+
+
+def _paragraph(markup, style, bullet=None):
+    """Paragraph of inline markup; text ReportLab cannot parse is kept as plain text"""
+    try:
+        return Paragraph(markup, style, bulletText=bullet)
+    except ValueError:
+        return Paragraph(escape(re.sub(r'<[^>]*>', '', markup), quote=False), style, bulletText=bullet)
+
+
+@functools.lru_cache(maxsize=512)
+def _markdown_story(text):
+    """Flowables of a markdown text, kept as templates (see markdown_flowables)"""
+    styles = PDF_STYLES
+    story = []
+    for block in report_markdown.parse_markdown(text):
+        kind = block[0]
+        if kind == 'heading':
+            story.append(_paragraph(report_markdown.inline_markup(block[2]), styles['text_heading']))
+        elif kind == 'paragraph':
+            markup = '<br/>'.join(report_markdown.inline_markup(line) for line in block[1])
+            story.append(_paragraph(markup, styles['text']))
+        elif kind in ('bullets', 'numbered'):
+            for number, item in enumerate(block[1], start=1):
+                bullet = '•' if kind == 'bullets' else f'{number}.'
+                story.append(_paragraph(report_markdown.inline_markup(item), styles['bullet'], bullet))
+            story.append(Spacer(1, 6))
+        elif kind == 'table':
+            story.append(('table', block[1], block[2]))
+    return tuple(story)
+
+
+def _markdown_table(header, rows):
+    styles = PDF_STYLES
+    cells = [[_paragraph(report_markdown.inline_markup(cell), styles['table_header']) for cell in header]]
+    cells += [[_paragraph(report_markdown.inline_markup(cell), styles['table_cell']) for cell in row] for row in rows]
+    table = Table(cells, hAlign='LEFT')
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), _ROW_COLORS),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    return [table, Spacer(1, 10)]
+
+
+def markdown_flowables(text):
     """
-    
-    # Add charts and interpretations
-    for i, (title, interpretation) in enumerate(zip(charts_data, interpretations)):
-        html += f"""
-        <div class="section">
-            <h2>{title}</h2>
-        """
-        
-        if interpretation:
-            html += f"""
-            <div class="interpretation">
-                {interpretation}
-            </div>
-        """
-        
-        html += """
-        </div>
-        """
-    
-    html += """
-        <div class="footer">
-            <p>Document généré automatiquement par Data Insights Explorer</p>
-        </div>
-    </body>
-    </html>
+    ReportLab flowables of an interpretation text
+
+    Headings, paragraphs, bullet and numbered lists and '|' tables are read by
+    report_markdown. The parsed paragraphs are memoized per text (the same
+    interpretations come back for every export) and handed out as shallow
+    copies, since platypus stores layout state on the flowables it places.
+
+    Args:
+        text: Markdown text of a report section
+
+    Returns:
+        List of flowables, new for each call
     """
-    
-    return html
+    flowables = []
+    for item in _markdown_story(text):
+        if isinstance(item, tuple):
+            flowables.extend(_markdown_table(item[1], item[2]))
+        else:
+            flowables.append(copy.copy(item))
+    return flowables
+
+class PagedTable(Flowable):
+    """
+    Table of any length laid out one page at a time
+
+    A single ReportLab Table re-measures and re-styles all of its remaining
+    rows every time it is split across a page, so the layout time grows with
+    the square of the row count. Here rows have a fixed height and the column
+    widths are computed once: split() only builds the Table of the rows that
+    fit in the available height (header repeated) and hands the rest over as
+    another PagedTable, which keeps the work proportional to the row count.
+    """
+
+    def __init__(self, header, rows, col_widths, start=0):
+        super().__init__()
+        self.header = header
+        self.rows = rows
+        self.col_widths = col_widths
+        self.start = start
+
+    def _chunk(self, end):
+        count = end - self.start
+        # Alternance des couleurs continue d'une page à l'autre
+        row_colors = _ROW_COLORS if self.start % 2 == 0 else _ROW_COLORS[::-1]
+        table = Table([self.header] + self.rows[self.start:end], colWidths=self.col_widths,
+                      rowHeights=[_TABLE_HEADER_HEIGHT] + [_TABLE_ROW_HEIGHT] * count)
+        table.setStyle(TableStyle(_TABLE_STYLE + [('ROWBACKGROUNDS', (0, 1), (-1, -1), row_colors)]))
+        return table
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(self.col_widths)
+        self.height = _TABLE_HEADER_HEIGHT + _TABLE_ROW_HEIGHT * (len(self.rows) - self.start)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        fit = int((availHeight - _TABLE_HEADER_HEIGHT) // _TABLE_ROW_HEIGHT)
+        if fit < 3:
+            return []  # pas d'en-tête isolé en bas de page
+        end = min(self.start + fit, len(self.rows))
+        parts = [self._chunk(end)]
+        if end < len(self.rows):
+            parts.append(PagedTable(self.header, self.rows, self.col_widths, start=end))
+        return parts
+
+    def draw(self):
+        table = self._chunk(len(self.rows))
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+
+def _clip(text, font, width):
+    """Text shortened with an ellipsis to fit in width points (binary search on the length)"""
+    if stringWidth(text, *font) <= width:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if stringWidth(text[:middle] + '…', *font) <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + '…'
+
+
+def _clip_column(values, font, width):
+    """_clip over a column: short values are kept without measuring, each distinct long value is measured once"""
+    # Aucun glyphe Helvetica ne dépasse 1 em: un texte de moins de width/taille caractères tient toujours
+    long_values = values.str.len() > width // font[1]
+    if not long_values.any():
+        return values
+    clipped = {text: _clip(text, font, width) for text in values[long_values].unique()}
+    return values.where(~long_values, values[long_values].map(clipped))
 
 
-def get_filename(page_name, file_format):
-    """Generate filename with timestamp"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    page_clean = page_name.replace(" ", "_").replace("/", "_")
-    return f"Rapport_{page_clean}_{timestamp}.{file_format}"
+def _fit_widths(natural, available_width):
+    """Column widths within available_width: narrow columns keep their width, the wide ones share the rest"""
+    widths = list(natural)
+    wide, budget = list(range(len(natural))), available_width
+    while wide and sum(natural[i] for i in wide) > budget:
+        share = budget / len(wide)
+        narrow = [i for i in wide if natural[i] <= share]
+        if not narrow:
+            scale = budget / sum(natural[i] for i in wide)
+            for i in wide:
+                widths[i] = natural[i] * scale
+            break
+        budget -= sum(natural[i] for i in narrow)
+        wide = [i for i in wide if i not in narrow]
+    return widths
 
 
-def create_pdf_report(page_name, charts_and_text):
+def paged_table(df, available_width):
+    """
+    PagedTable of a dataframe, fitted to the page width
+
+    Column widths come from the header and the longest value of each column
+    (one vectorized pass). When the natural widths exceed the page, the
+    widest columns are narrowed and the values that no longer fit are
+    clipped so every row keeps a single line.
+
+    Args:
+        df: Dataframe to render (every row is kept)
+        available_width: Frame width in points (doc.width)
+
+    Returns:
+        PagedTable flowable
+    """
+    header = [str(column) for column in df.columns]
+    columns = [df[column].astype(str).where(df[column].notna(), '') for column in df.columns]
+
+    natural = []
+    for name, values in zip(header, columns):
+        longest = values.iloc[values.str.len().to_numpy().argmax()] if len(values) else ''
+        natural.append(max(stringWidth(name, *_TABLE_HEADER_FONT), stringWidth(longest, *_TABLE_FONT)) + _TABLE_PADDING)
+
+    col_widths = _fit_widths(natural, available_width)
+    if col_widths != natural:
+        header = [_clip(name, _TABLE_HEADER_FONT, width - _TABLE_PADDING) for name, width in zip(header, col_widths)]
+        columns = [_clip_column(values, _TABLE_FONT, width - _TABLE_PADDING) for values, width in zip(columns, col_widths)]
+
+    rows = list(map(list, zip(*(values.tolist() for values in columns)))) if columns else []
+    return PagedTable(header, rows, col_widths)
+
+
+@perf.timed('export.pdf')
+def create_pdf_report(page_name, charts_and_text, output=None):
     """
     Create a PDF report with charts and interpretations
     
     Args:
         page_name: Name of the analysis page
         charts_and_text: List of dictionaries with 'title', 'figure' (plotly fig or None), and 'text' keys
+        output: Binary file object to write to (e.g. export_delivery.spooled_output()
+            or an open file); defaults to a new BytesIO
     
     Returns:
-        BytesIO object containing the PDF
+        The output object containing the PDF, positioned at its start
     """
-    buffer = io.BytesIO()
+    buffer = output if output is not None else io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4,
                            rightMargin=50, leftMargin=50,
                            topMargin=50, bottomMargin=50)
@@ -333,72 +639,17 @@ def create_pdf_report(page_name, charts_and_text):
     # Container for the 'Flowable' objects
     elements = []
     
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#667eea'),
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=20,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#667eea'),
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName='Helvetica-Bold'
-    )
-    
-    text_style = ParagraphStyle(
-        'CustomText',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=10,
-        leading=14
-    )
-    
-    # Style pour les métriques
-    metric_style = ParagraphStyle(
-        'Metric',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.HexColor('#2c3e50'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    metric_label_style = ParagraphStyle(
-        'MetricLabel',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#7f8c8d'),
-        alignment=TA_CENTER
-    )
-    
+    styles = PDF_STYLES
+    text_style = styles['text']
+
     # Title page
     timestamp = datetime.now().strftime("%d/%m/%Y %H:%M")
     elements.append(Spacer(1, 1*inch))
-    elements.append(Paragraph(f"📊 Rapport d'Analyse", title_style))
-    elements.append(Paragraph(page_name, title_style))
+    elements.append(Paragraph(f"📊 Rapport d'Analyse", styles['title']))
+    elements.append(Paragraph(page_name, styles['title']))
     elements.append(Spacer(1, 0.3*inch))
-    elements.append(Paragraph("BP - SADCI GAS PARAKOU", subtitle_style))
-    elements.append(Paragraph(f"Généré le {timestamp}", subtitle_style))
+    elements.append(Paragraph("BP - SADCI GAS PARAKOU", styles['subtitle']))
+    elements.append(Paragraph(f"Généré le {timestamp}", styles['subtitle']))
     elements.append(Spacer(1, 0.5*inch))
     elements.append(PageBreak())
     
@@ -406,7 +657,7 @@ def create_pdf_report(page_name, charts_and_text):
     for section in charts_and_text:
         # Section title
         if 'title' in section and section['title']:
-            elements.append(Paragraph(section['title'], heading_style))
+            elements.append(Paragraph(section['title'], styles['heading']))
             elements.append(Spacer(1, 0.2*inch))
             
         # Metrics
@@ -414,23 +665,12 @@ def create_pdf_report(page_name, charts_and_text):
             # Create a table for metrics (up to 4 per row)
             metrics_data = section['metrics']
             if metrics_data:
-                # Prepare data for table
-                row_data = []
-                for m in metrics_data:
-                    val = Paragraph(str(m.get('value', '')), metric_style)
-                    lbl = Paragraph(m.get('label', ''), metric_label_style)
-                    row_data.append([val, lbl])
-                
-                # If we have metrics, create a table
-                # For simplicity in this version, we'll just stack them or do a simple row
-                # Let's do a single row table where each cell has value/label
-                
                 table_data = [[]]
                 for m in metrics_data:
                     val = str(m.get('value', ''))
                     lbl = m.get('label', '')
                     cell_text = f"<b>{val}</b><br/><font size=9 color='#777'>{lbl}</font>"
-                    table_data[0].append(Paragraph(cell_text, metric_style))
+                    table_data[0].append(Paragraph(cell_text, styles['metric']))
                 
                 t = Table(table_data, colWidths=[1.5*inch]*len(table_data[0]))
                 t.setStyle(TableStyle([
@@ -444,49 +684,21 @@ def create_pdf_report(page_name, charts_and_text):
                 elements.append(t)
                 elements.append(Spacer(1, 0.3*inch))
 
-        # Table
+        # Table (toutes les lignes, en-tête répété sur chaque page)
         if 'table' in section and section['table'] is not None:
-             try:
-                df = section['table']
-                # Limit rows to avoid huge PDFs
-                if len(df) > 50:
-                    df = df.head(50)
-                    elements.append(Paragraph("<i>(Affichage des 50 premières lignes uniquement)</i>", text_style))
-                
-                # Convert DataFrame to list of lists
-                data_list = [df.columns.values.tolist()] + df.values.tolist()
-                
-                # Create Table
-                # Calculate approximate widths based on content (naive)
-                col_widths = None # Auto
-                
-                t = Table(data_list)
-                
-                # Add style
-                t.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#667eea')),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0,0), (-1,0), 10),
-                    ('BOTTOMPADDING', (0,0), (-1,0), 12),
-                    ('BACKGROUND', (0,1), (-1,-1), colors.white),
-                    ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#e0e0e0')),
-                    ('FONTSIZE', (0,1), (-1,-1), 9),
-                    ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#f8f9fa')])
-                ]))
-                
-                elements.append(t)
+            try:
+                with perf.timer('export.pdf.table', rows=len(section['table'])):
+                    elements.append(paged_table(section['table'], doc.width))
                 elements.append(Spacer(1, 0.3*inch))
-             except Exception as e:
+            except Exception as e:
                 elements.append(Paragraph(f"<i>Tableau non disponible: {str(e)}</i>", text_style))
-        
+
         # Chart
         if 'figure' in section and section['figure'] is not None:
             try:
                 # Convert Plotly figure to image
-                img_bytes = pio.to_image(section['figure'], format='png', 
-                                        width=1400, height=700, scale=2)
+                img_bytes = figure_to_image(section['figure'], format='png',
+                                         width=1400, height=700, scale=2)
                 img_buffer = io.BytesIO(img_bytes)
                 
                 # Add image to PDF
@@ -498,45 +710,17 @@ def create_pdf_report(page_name, charts_and_text):
         
         # Interpretation text
         if 'text' in section and section['text']:
-            text = section['text']
-            
-            # Handle bold text: **text** -> <b>text</b>
-            text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
-            
-            # Clean other markdown
-            text = text.replace('###', '').replace('##', '')
-            text = text.replace('- ', '&bull; ')
-            text = text.replace('\n\n', '<br/><br/>')
-            text = text.replace('\n', '<br/>')
-            
-            # Split into paragraphs to add space between them
-            paragraphs = text.split('<br/><br/>')
-            for para in paragraphs:
-                if para.strip():
-                    try:
-                        elements.append(Paragraph(para.strip(), text_style))
-                        elements.append(Spacer(1, 0.1*inch))
-                    except Exception:
-                        # Fallback if ReportLab XML parser fails
-                        clean_para = para.strip().replace('<b>', '').replace('</b>', '')
-                        elements.append(Paragraph(clean_para, text_style))
+            elements.extend(markdown_flowables(section['text']))
 
-        
         elements.append(Spacer(1, 0.3*inch))
     
     # Footer
     elements.append(Spacer(1, 0.5*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.grey,
-        alignment=TA_CENTER
-    )
-    elements.append(Paragraph("Document généré automatiquement par Data Insights Explorer", footer_style))
+    elements.append(Paragraph("Document généré automatiquement par Data Insights Explorer", styles['footer']))
     
     # Build PDF
-    doc.build(elements)
+    with perf.timer('export.pdf.build', flowables=len(elements)):
+        doc.build(elements)
     buffer.seek(0)
     return buffer
 
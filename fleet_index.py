@@ -0,0 +1,281 @@
+"""
+Per-upload (vehicle, day) -> row positions index used by the sidebar filters
+and the vehicle drill-down
+
+Each sheet's rows are tagged once at load time with their owner vehicle (the
+categorical code of the plate) and their day, then grouped by (vehicle, day).
+Filtering selects the matching groups (a few hundred keys instead of every
+row) and gathers their positions, so the filtered sheets are iloc slices.
+
+Sheet layouts handled:
+- Vehicle rows own the rows that follow them (POI rows in 'temps_poi', day
+  subtotal and detail rows in the trip sheets); in 'visites_poi' a POI row
+  belongs to the vehicle rows that follow it.
+- Days come from a timestamp column when the sheet has one, otherwise from
+  the "2026-01-27" subtotal rows, carried forward over the detail rows.
+- The first vehicle row of a block in SUMMARY_COLUMNS sheets is a total over
+  the whole period (a "header"). It has no day: it is kept whenever rows of
+  its block are kept, and its SUMMARY_COLUMNS are recomputed from the kept
+  rows when a date range is active. Text columns (Durée, Début/Fin) of the
+  header still describe the whole period.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from entities import DATE, SEPARATOR, VEHICLE
+
+# Jour absent (ligne sans date): valeur de NaT en jours
+NO_DAY = np.iinfo(np.int64).min
+
+# Feuille -> (colonne horodatée, ou None pour les lignes "202x-xx-xx"; sens de propagation du véhicule)
+SHEET_LAYOUT = {
+    'duree_distance': ('Début', 'ffill'),
+    'trajets_non_autorises': (None, 'ffill'),
+    'conduite_journee': (None, 'ffill'),
+    'conduite_nocturne': (None, 'ffill'),
+    'notifications': ('Heure de déclenchement', 'ffill'),
+    'temps_poi': ("Heure d'entrée", 'ffill'),
+    'visites_poi': ("Heure d'entrée", 'bfill'),
+    'vitesse': (None, 'ffill'),
+}
+
+# Feuilles avec une ligne d'en-tête par véhicule -> colonnes recalculées sur la période filtrée
+_TRIP_TOTALS = {'Kilométrage': 'sum', 'Vitesse maxi': 'max'}
+SUMMARY_COLUMNS = {
+    'duree_distance': {'Distance Parcourue': 'sum'},
+    'trajets_non_autorises': _TRIP_TOTALS,
+    'conduite_journee': _TRIP_TOTALS,
+    'conduite_nocturne': _TRIP_TOTALS,
+    'temps_poi': {'Visites': 'sum'},
+    'vitesse': {'Vitesse maxi': 'max'},
+}
+
+
+def _to_days(values):
+    """Day numbers (days since epoch, NO_DAY for missing) of timestamps or date strings"""
+    stamps = pd.to_datetime(pd.Series(values).astype(object), errors='coerce')
+    return stamps.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').view('i8')
+
+
+def day_to_date(day):
+    """datetime.date of a day number"""
+    return np.datetime64(int(day), 'D').astype(date)
+
+
+def date_to_day(value):
+    """Day number of a datetime.date"""
+    return int(np.datetime64(value, 'D').view('i8'))
+
+
+class SheetIndex:
+    """
+    Row positions of one sheet grouped by (owner vehicle code, day)
+
+    Args:
+        vehicles: Owner vehicle code of every row (-1: no vehicle)
+        days: Day of every row (NO_DAY: undated)
+        blocks: Block number of every row (one block per vehicle run)
+        headers: Positions of the per-vehicle header rows
+    """
+
+    def __init__(self, vehicles, days, blocks, headers):
+        order = np.lexsort((days, vehicles))
+        keys_vehicles, keys_days = vehicles[order], days[order]
+        change = np.ones(len(order), dtype=bool)
+        change[1:] = (keys_vehicles[1:] != keys_vehicles[:-1]) | (keys_days[1:] != keys_days[:-1])
+        starts = np.flatnonzero(change)
+
+        self.size = len(order)
+        self.order = order
+        self.key_vehicles = keys_vehicles[starts]
+        self.key_days = keys_days[starts]
+        self.offsets = np.append(starts, len(order))
+        self.blocks = blocks
+        self.headers = headers
+        self.vehicles = vehicles
+        self.days = days
+        # Index partagé entre les sessions (shared_store): toute écriture doit lever une erreur
+        for array in (self.order, self.key_vehicles, self.key_days, self.offsets,
+                      self.blocks, self.headers, self.vehicles, self.days):
+            array.flags.writeable = False
+
+    def positions(self, vehicle_codes=None, start_day=None, end_day=None):
+        """
+        Sorted positions of the rows matching the filter (None: no filter at all)
+
+        Undated rows only match when no date bound is given, except headers
+        which follow the rows of their block.
+        """
+        if vehicle_codes is None and start_day is None and end_day is None:
+            return None
+        keep = np.ones(len(self.key_vehicles), dtype=bool)
+        if vehicle_codes is not None:
+            keep &= np.isin(self.key_vehicles, vehicle_codes)
+        dated = start_day is not None or end_day is not None
+        if dated:
+            keep &= self.key_days != NO_DAY
+            if start_day is not None:
+                keep &= self.key_days >= start_day
+            if end_day is not None:
+                keep &= self.key_days <= end_day
+
+        selected = np.flatnonzero(keep)
+        starts = self.offsets[selected]
+        lengths = self.offsets[selected + 1] - starts
+        # Concaténation des tranches [start, start + length) de self.order sans boucle Python
+        gather = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        positions = self.order[gather]
+
+        if dated and len(self.headers):
+            kept_blocks = np.unique(self.blocks[positions])
+            headers = self.headers[np.isin(self.blocks[self.headers], kept_blocks)]
+            if vehicle_codes is not None:
+                headers = headers[np.isin(self.vehicles[headers], vehicle_codes)]
+            positions = np.concatenate([positions, headers])
+        return np.sort(positions)
+
+    def vehicle_rows(self, code, headers=True):
+        """
+        Sorted positions of every row owned by one vehicle code
+
+        The keys are sorted by vehicle first, so a vehicle's rows are one
+        contiguous run of self.order: two binary searches, no scan.
+        """
+        lo = self.offsets[np.searchsorted(self.key_vehicles, code, side='left')]
+        hi = self.offsets[np.searchsorted(self.key_vehicles, code, side='right')]
+        positions = np.sort(self.order[lo:hi])
+        if not headers and len(self.headers):
+            positions = positions[~np.isin(positions, self.headers)]
+        return positions
+
+
+def _index_sheet(key, df, entities):
+    date_column, fill = SHEET_LAYOUT[key]
+    n = len(df)
+    column = df['Regroupement']
+    codes = pd.Categorical(column, categories=entities.categories).codes.astype(np.int64)
+    is_vehicle = entities.mask(column, VEHICLE)
+    is_date = entities.mask(column, DATE)
+
+    # Véhicule propriétaire: la plaque elle-même, propagée aux lignes POI/date; séparateurs -> aucun
+    owner = pd.Series(np.where(is_vehicle, codes, np.nan))
+    owner[entities.mask(column, SEPARATOR)] = -1
+    owner = owner.ffill() if fill == 'ffill' else owner.bfill()
+    vehicles = owner.fillna(-1).to_numpy(dtype=np.int64)
+
+    block_start = np.ones(n, dtype=bool)
+    block_start[1:] = vehicles[1:] != vehicles[:-1]
+    blocks = np.cumsum(block_start) - 1
+    headers = np.flatnonzero(block_start & is_vehicle) if key in SUMMARY_COLUMNS else np.array([], dtype=np.int64)
+
+    if date_column is not None:
+        days = _to_days(df[date_column])
+    else:
+        # Jour de la ligne "202x-xx-xx" précédente, remis à zéro au début de chaque bloc
+        parsed = _to_days(column[is_date].astype(str))
+        day_rows = np.full(n, np.nan)
+        day_rows[is_date] = np.where(parsed == NO_DAY, np.nan, parsed)
+        day_rows[block_start & ~is_date] = -np.inf
+        filled = pd.Series(day_rows).ffill().to_numpy()
+        dated = np.isfinite(filled)
+        days = np.full(n, NO_DAY, dtype=np.int64)
+        days[dated] = filled[dated]
+    days = np.array(days, dtype=np.int64)
+    days[headers] = NO_DAY
+    return SheetIndex(vehicles, days, blocks, headers)
+
+
+class FleetIndex:
+    """
+    Indexes of every sheet of an upload
+
+    Attributes:
+        sheets: Dictionary of SheetIndex keyed like the sheets
+        categories: Regroupement dictionary (vehicle codes index into it)
+        first_day, last_day: Date range covered by the dated rows (datetime.date)
+    """
+
+    def __init__(self, sheets, categories):
+        self.sheets = sheets
+        self.categories = categories
+        all_days = np.concatenate([index.days[index.days != NO_DAY] for index in sheets.values()])
+        self.first_day = day_to_date(all_days.min()) if len(all_days) else None
+        self.last_day = day_to_date(all_days.max()) if len(all_days) else None
+
+    def vehicle_codes(self, vehicles):
+        codes = self.categories.get_indexer(list(vehicles))
+        return codes[codes >= 0]
+
+    def vehicle_positions(self, key, vehicle, headers=True):
+        """Row positions of sheet key owned by one plate (empty if unknown)"""
+        code = self.categories.get_indexer([vehicle])[0]
+        if code < 0:
+            return np.array([], dtype=np.int64)
+        return self.sheets[key].vehicle_rows(code, headers)
+
+    def positions(self, key, vehicles=None, start=None, end=None):
+        """Row positions of sheet key for the given plates and date range (None: every row)"""
+        codes = self.vehicle_codes(vehicles) if vehicles is not None else None
+        return self.sheets[key].positions(
+            codes,
+            date_to_day(start) if start is not None else None,
+            date_to_day(end) if end is not None else None,
+        )
+
+
+def build_fleet_index(sheets, entities):
+    """Build the FleetIndex of an upload (sheets must contain every SHEET_LAYOUT key)"""
+    return FleetIndex({key: _index_sheet(key, sheets[key], entities) for key in SHEET_LAYOUT},
+                      entities.categories)
+
+
+def _recompute_headers(key, df, index, positions):
+    """Refresh the per-vehicle totals of the header rows from the kept rows of their block"""
+    is_header = np.isin(positions, index.headers)
+    if not is_header.any():
+        return df
+    blocks = index.blocks[positions]
+    date_column, _ = SHEET_LAYOUT[key]
+    children = ~is_header
+    if date_column is None:
+        # Feuilles de trajets: les sous-totaux journaliers suffisent (sans double compte du détail)
+        children &= df['Regroupement'].astype(str).str.startswith('202').to_numpy()
+
+    df = df.copy()
+    for column, agg in SUMMARY_COLUMNS[key].items():
+        totals = df[column][children].groupby(blocks[children]).agg(agg)
+        header_rows = np.flatnonzero(is_header)
+        values = totals.reindex(blocks[header_rows]).fillna(0).astype(df[column].dtype).to_numpy()
+        df.iloc[header_rows, df.columns.get_loc(column)] = values
+    return df
+
+
+def filter_sheets(data, index, vehicles=None, start=None, end=None):
+    """
+    Slice every sheet of data to the given plates and inclusive date range
+
+    Args:
+        data: Dictionary of dataframes the index was built from
+        index: FleetIndex of data
+        vehicles: Iterable of plates (None: every vehicle)
+        start, end: datetime.date bounds (None: open)
+
+    Returns:
+        Dictionary of filtered dataframes (same keys as data)
+    """
+    filtered = {}
+    for key, df in data.items():
+        if key not in index.sheets:
+            filtered[key] = df
+            continue
+        positions = index.positions(key, vehicles, start, end)
+        if positions is None:
+            filtered[key] = df
+            continue
+        sliced = df.iloc[positions]
+        if key in SUMMARY_COLUMNS and (start is not None or end is not None):
+            sliced = _recompute_headers(key, sliced, index.sheets[key], positions)
+        filtered[key] = sliced
+    return filtered
@@ -1,6 +1,125 @@
-def main():
-    print("Hello from repl-nix-workspace!")
+"""
+Batch generation of the weekly reports without Streamlit
+
+Usage:
+    python main.py "RAPPORT HEBDOMADAIRE*.xlsx" -o rapports/
+    python main.py dossier_hebdo/ -o rapports/ --jobs 4 --formats pdf
+"""
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import data_loader
+import export_utils
+import pdf_generators
+
+FORMATS = ('pdf', 'xlsx')
+
+
+def build_reports(excel_path, output_dir, formats=FORMATS, name=None):
+    """
+    Generate the full PDF and/or structured Excel report for one workbook
+
+    Args:
+        excel_path: Path of the weekly XLSX export
+        output_dir: Directory where the reports are written
+        formats: Iterable of formats to produce ('pdf', 'xlsx')
+        name: Prefix of the output files (default: the workbook name without extension)
+
+    Returns:
+        List of written file paths
+    """
+    excel_path = Path(excel_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    data = data_loader.read_sheets(excel_path)
+    stem = name or excel_path.stem
+    written = []
+
+    if 'pdf' in formats:
+        pdf_content = pdf_generators.generate_full_report(data)
+        pdf_path = output_dir / f"{stem}_Rapport_Complet.pdf"
+        # Écriture directe dans le fichier de sortie, sans copie du rapport en mémoire
+        with open(pdf_path, 'wb') as output:
+            export_utils.create_pdf_report("Rapport Complet", pdf_content, output=output)
+        written.append(str(pdf_path))
+
+    if 'xlsx' in formats:
+        report_content = pdf_generators.generate_structured_report(data)
+        xlsx_path = output_dir / f"{stem}_Rapport_Complet.xlsx"
+        with open(xlsx_path, 'wb') as output:
+            export_utils.export_data_to_excel(data, current_page=None, report_content=report_content, output=output)
+        written.append(str(xlsx_path))
+
+    return written
+
+
+def collect_inputs(paths):
+    """Expand files, directories and glob patterns into a sorted list of XLSX paths"""
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = glob.glob(os.path.join(path, '*.xlsx'))
+        else:
+            candidates = glob.glob(path) or [path]
+        for candidate in candidates:
+            # Ignorer les fichiers verrous d'Excel (~$Rapport.xlsx)
+            if not os.path.basename(candidate).startswith('~$'):
+                found.add(candidate)
+    return sorted(found)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Génère les rapports hebdomadaires (PDF/Excel) sans passer par Streamlit."
+    )
+    parser.add_argument('inputs', nargs='+', help="Fichiers XLSX, dossiers ou motifs glob")
+    parser.add_argument('-o', '--output-dir', default='rapports', help="Dossier de sortie (défaut: rapports)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Nombre de processus (défaut: nombre de cœurs)")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS),
+                        help="Formats à produire (défaut: pdf xlsx)")
+    args = parser.parse_args(argv)
+
+    # Chaque processus de travail garde son propre Kaleido chaud: pas de pool de renderers en plus
+    os.environ.setdefault('RENDER_POOL_SIZE', '0')
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        parser.error("aucun fichier XLSX trouvé")
+
+    failures = 0
+    jobs = max(1, min(args.jobs, len(inputs)))
+
+    if jobs == 1:
+        for excel_path in inputs:
+            try:
+                for path in build_reports(excel_path, args.output_dir, args.formats):
+                    print(f"✅ {path}")
+            except Exception as e:
+                failures += 1
+                print(f"❌ {excel_path}: {e}", file=sys.stderr)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(build_reports, excel_path, args.output_dir, args.formats): excel_path
+                for excel_path in inputs
+            }
+            for future in as_completed(futures):
+                try:
+                    for path in future.result():
+                        print(f"✅ {path}")
+                except Exception as e:
+                    failures += 1
+                    print(f"❌ {futures[future]}: {e}", file=sys.stderr)
+
+    print(f"{len(inputs) - failures}/{len(inputs)} rapport(s) généré(s) dans {args.output_dir}")
+    return 1 if failures else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Global memory budget for what the server keeps between reruns
+
+Every long-lived object of the app is registered here with its size, per
+category:
+
+    sheets      parsed uploads shared by the sessions (shared_store)
+    aggregates  tables of the cached page contents (pdf_generators.page_content)
+    figures     Plotly figures of the cached page contents
+    images      rasterized charts (export_utils.figure_to_image)
+    exports     finished export files waiting for download (export_queue)
+
+Entries are kept in least-recently-used order. When the total goes over the
+budget, the oldest entries are evicted through the callback given by their
+owner until the total fits again; the entry just added is never evicted by
+its own insertion. Sizes are estimates (deep memory usage of the frames,
+JSON size of the figures, length of the bytes).
+
+Configuration (environment variables):
+    MEMORY_BUDGET_MB: total budget (default 1024)
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+CATEGORIES = {
+    'sheets': "Données importées",
+    'aggregates': "Agrégats",
+    'figures': "Graphiques",
+    'images': "Images rendues",
+    'exports': "Fichiers d'export",
+}
+
+
+def estimate_size(value):
+    """Approximate memory footprint of a value, in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if hasattr(value, 'to_plotly_json') and hasattr(value, 'to_json'):
+        return len(value.to_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _label(name):
+    """Short readable form of an entry name: ('page_content', (hash, filter, 'duree')) -> 'page_content: duree (1a2b3c4d)'"""
+    owner, key = name if isinstance(name, tuple) and len(name) == 2 else ('', name)
+    if isinstance(key, tuple):
+        return f"{owner}: {key[-1]} ({str(key[0])[:8]})"
+    return f"{owner}: {str(key)[:12]}"
+
+
+class _Entry:
+    def __init__(self, sizes, evict):
+        self.sizes = sizes
+        self.evict = evict
+        self.created = self.used = time.time()
+        self.hits = 0
+
+
+class MemoryBudget:
+    """
+    LRU accounting of cached objects against a byte limit
+
+    Args:
+        limit: Budget in bytes
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._evictions = {category: 0 for category in CATEGORIES}
+
+    def add(self, name, sizes, evict):
+        """
+        Register (or replace) an entry and evict older ones if over budget
+
+        Args:
+            name: Unique entry name, e.g. ('images', digest)
+            sizes: Dictionary category -> bytes (an entry may span categories)
+            evict: Function without arguments dropping the object from its owner
+        """
+        with self._lock:
+            self._entries.pop(name, None)
+            self._entries[name] = _Entry(dict(sizes), evict)
+            victims = self._over_budget(keep=name)
+        self._evict(victims)
+
+    def touch(self, name):
+        """Mark an entry as just used (it moves to the end of the eviction order)"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry.used = time.time()
+                entry.hits += 1
+                self._entries.move_to_end(name)
+
+    def remove(self, name):
+        """Forget an entry its owner has dropped by itself (no callback)"""
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def set_limit(self, limit):
+        """Change the budget, evicting entries if the new one is smaller"""
+        with self._lock:
+            self.limit = limit
+            victims = self._over_budget()
+        self._evict(victims)
+
+    def clear(self, category=None):
+        """Evict every entry (of one category, if given)"""
+        with self._lock:
+            victims = [(name, self._entries.pop(name)) for name, entry in list(self._entries.items())
+                       if category is None or category in entry.sizes]
+        self._evict(victims)
+
+    def _total(self):
+        return sum(sum(entry.sizes.values()) for entry in self._entries.values())
+
+    def _over_budget(self, keep=None):
+        """Pop least recently used entries until the total fits (called with the lock held)"""
+        victims = []
+        total = self._total()
+        for name in list(self._entries):
+            if total <= self.limit:
+                break
+            if name == keep:
+                continue
+            entry = self._entries.pop(name)
+            total -= sum(entry.sizes.values())
+            victims.append((name, entry))
+        return victims
+
+    def _evict(self, victims):
+        # Rappels hors du verrou: le propriétaire peut lui-même appeler remove()
+        for name, entry in victims:
+            with self._lock:
+                for category in entry.sizes:
+                    self._evictions[category] = self._evictions.get(category, 0) + 1
+            entry.evict()
+
+    def usage(self):
+        """
+        Current usage per category
+
+        Returns:
+            Dictionary with 'limit' and 'total' (bytes) and 'categories':
+            category -> {'label', 'bytes', 'entries', 'evictions'}
+        """
+        with self._lock:
+            categories = {category: {'label': label, 'bytes': 0, 'entries': 0, 'evictions': self._evictions[category]}
+                          for category, label in CATEGORIES.items()}
+            for entry in self._entries.values():
+                for category, size in entry.sizes.items():
+                    categories[category]['bytes'] += size
+                    categories[category]['entries'] += 1
+            return {'limit': self.limit, 'total': self._total(), 'categories': categories}
+
+    def entries(self):
+        """Entries from the next to be evicted to the most recently used, for the admin view"""
+        now = time.time()
+        with self._lock:
+            return [{'name': name, 'label': _label(name), 'sizes': dict(entry.sizes), 'bytes': sum(entry.sizes.values()),
+                     'idle_s': round(now - entry.used), 'age_s': round(now - entry.created), 'hits': entry.hits}
+                    for name, entry in self._entries.items()]
+
+
+_budget = MemoryBudget(int(float(os.environ.get('MEMORY_BUDGET_MB', '1024')) * 1024 * 1024))
+
+
+def get_budget():
+    """Return the process-wide memory budget"""
+    return _budget
+
+
+class BudgetedCache:
+    """
+    Dictionary cache whose entries are accounted and evicted by the budget
+
+    Args:
+        name: Cache name (prefix of the budget entry names)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def get(self, key):
+        """Cached value of key, or None"""
+        with self._lock:
+            value = self._values.get(key)
+        if value is not None:
+            _budget.touch((self.name, key))
+        return value
+
+    def put(self, key, value, sizes):
+        """
+        Cache a value
+
+        Args:
+            key: Hashable cache key
+            value: Value to keep (not None)
+            sizes: Dictionary category -> bytes of value
+        """
+        with self._lock:
+            self._values[key] = value
+        _budget.add((self.name, key), sizes, evict=lambda: self._drop(key))
+
+    def _drop(self, key):
+        with self._lock:
+            self._values.pop(key, None)
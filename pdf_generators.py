@@ -4,12 +4,35 @@ PDF content generators for each analysis page
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import functools
+
+import aggregates
+import memory_budget
+import perf
+from data_loader import get_entities, get_trips, page_has_rows, vehicle_choices, vehicle_data
+
+NO_DATA_MESSAGE = "Aucune donnée pour ce filtre: élargissez la sélection de véhicules ou la période."
+
+
+def _unless_empty(page):
+    """Replace the sections of a generator by a single notice when the filter left the page without rows"""
+    def decorate(generate):
+        @functools.wraps(generate)
+        def wrapper(data, *args, **kwargs):
+            if not page_has_rows(data, page):
+                return [{'title': 'Aucune donnée', 'text': NO_DATA_MESSAGE}]
+            return generate(data, *args, **kwargs)
+        return wrapper
+    return decorate
+
 
 def get_vehicles(df):
     """Extract vehicle list from dataframe"""
     vehicles = df['Regroupement'].dropna().unique()
     return [v for v in vehicles if not str(v).startswith('202') and v != '-----']
 
+@perf.timed('generate.synthese')
+@_unless_empty('synthese')
 def generate_synthese_pdf(data):
     """Generate PDF content for Synthèse page"""
     content = []
@@ -52,7 +75,7 @@ Ce rapport fournit une **analyse approfondie et des interprétations complètes*
     df_vehicles = df_duree[~df_duree['Regroupement'].str.startswith('202', na=False)]
     df_vehicles = df_vehicles[df_vehicles['Regroupement'].notna()]
     
-    distance_par_vehicule = df_vehicles.groupby('Regroupement')['Distance Parcourue'].sum().reset_index()
+    distance_par_vehicule = df_vehicles.groupby('Regroupement', observed=True)['Distance Parcourue'].sum().reset_index()
     distance_par_vehicule = distance_par_vehicule.sort_values('Distance Parcourue', ascending=True)
     
     fig1 = px.bar(
@@ -85,8 +108,8 @@ Ce rapport fournit une **analyse approfondie et des interprétations complètes*
     })
     
     # Répartition Jour/Nuit
-    trajets_jour = len(data['conduite_journee'][~data['conduite_journee']['Regroupement'].str.startswith('202', na=False)])
-    trajets_nuit = len(data['conduite_nocturne'][~data['conduite_nocturne']['Regroupement'].str.startswith('202', na=False)])
+    trips_per_period = get_trips(data)['Période'].value_counts()
+    trajets_jour, trajets_nuit = int(trips_per_period['Jour']), int(trips_per_period['Nuit'])
     
     fig2 = px.pie(
         values=[trajets_jour, trajets_nuit],
@@ -96,8 +119,8 @@ Ce rapport fournit une **analyse approfondie et des interprétations complètes*
     )
     
     interpretation2 = f"""
-Trajets de jour: {trajets_jour} ({trajets_jour/(trajets_jour+trajets_nuit)*100:.1f}%)
-Trajets de nuit: {trajets_nuit} ({trajets_nuit/(trajets_jour+trajets_nuit)*100:.1f}%)
+Trajets de jour: {trajets_jour} ({aggregates.percent(trajets_jour, trajets_jour + trajets_nuit):.1f}%)
+Trajets de nuit: {trajets_nuit} ({aggregates.percent(trajets_nuit, trajets_jour + trajets_nuit):.1f}%)
 """
     
     content.append({
@@ -108,6 +131,8 @@ Trajets de nuit: {trajets_nuit} ({trajets_nuit/(trajets_jour+trajets_nuit)*100:.
     
     return content
 
+@perf.timed('generate.duree')
+@_unless_empty('duree')
 def generate_duree_pdf(data):
     """Generate PDF content for Durée-Distance-Conso page"""
     content = []
@@ -117,24 +142,25 @@ def generate_duree_pdf(data):
     df_vehicles = df_vehicles[df_vehicles['Regroupement'].notna()]
     
     # Distance stats
-    distance_stats = df_vehicles.groupby('Regroupement').agg({
+    distance_stats = df_vehicles.groupby('Regroupement', observed=True).agg({
         'Distance Parcourue': ['sum', 'mean', 'count']
     }).reset_index()
     distance_stats.columns = ['Véhicule', 'Distance Totale', 'Distance Moyenne', 'Nb Trajets']
-    distance_stats = distance_stats.sort_values('Distance Totale', ascending=False)
+    top_distance = aggregates.with_rest(*aggregates.top_n(distance_stats, 'Distance Totale'))
     
     # Round for display
-    display_stats = distance_stats.copy()
+    display_stats, _ = aggregates.top_n(distance_stats, 'Distance Totale', n=20, rest_agg=None)
+    display_stats = display_stats.copy()
     display_stats['Distance Totale'] = display_stats['Distance Totale'].round(2)
     display_stats['Distance Moyenne'] = display_stats['Distance Moyenne'].round(2)
     
     content.append({
         'title': 'Statistiques Détaillées',
-        'table': display_stats.head(20)
+        'table': display_stats
     })
     
     fig1 = px.bar(
-        distance_stats.head(15),
+        top_distance,
         x='Véhicule',
         y='Distance Totale',
         title='Top 15 - Distance Totale par Véhicule (km)',
@@ -161,7 +187,7 @@ def generate_duree_pdf(data):
     
     # Nb trajets
     fig2 = px.bar(
-        distance_stats.sort_values('Nb Trajets', ascending=False).head(15),
+        aggregates.with_rest(*aggregates.top_n(distance_stats, 'Nb Trajets')),
         x='Véhicule',
         y='Nb Trajets',
         title='Top 15 - Nombre de Trajets par Véhicule',
@@ -204,6 +230,8 @@ def generate_duree_pdf(data):
     
     return content
 
+@perf.timed('generate.trajets')
+@_unless_empty('trajets')
 def generate_trajets_pdf(data):
     """Generate PDF content for Trajets Non Autorisés page"""
     content = []
@@ -218,11 +246,11 @@ def generate_trajets_pdf(data):
     })
     
     # Incidents par véhicule
-    incidents_par_vehicule = df_vehicles.groupby('Regroupement').size().reset_index(name='Nb Incidents')
-    incidents_par_vehicule = incidents_par_vehicule.sort_values('Nb Incidents', ascending=False)
+    incidents_par_vehicule = df_vehicles.groupby('Regroupement', observed=True).size().reset_index(name='Nb Incidents')
+    top_incidents_par_vehicule = aggregates.with_rest(*aggregates.top_n(incidents_par_vehicule, 'Nb Incidents'))
     
     fig1 = px.bar(
-        incidents_par_vehicule.head(15),
+        top_incidents_par_vehicule,
         x='Regroupement',
         y='Nb Incidents',
         title='Top 15 - Véhicules avec le Plus d\'Incidents',
@@ -249,11 +277,11 @@ def generate_trajets_pdf(data):
     })
     
     # Kilométrage non autorisé
-    km_non_auth = df_vehicles.groupby('Regroupement')['Kilométrage'].sum().reset_index()
-    km_non_auth = km_non_auth.sort_values('Kilométrage', ascending=False)
+    km_non_auth = df_vehicles.groupby('Regroupement', observed=True)['Kilométrage'].sum().reset_index()
+    top_km_non_auth = aggregates.with_rest(*aggregates.top_n(km_non_auth, 'Kilométrage'))
     
     fig2 = px.bar(
-        km_non_auth.head(15),
+        top_km_non_auth,
         x='Regroupement',
         y='Kilométrage',
         title='Top 15 - Kilométrage Non Autorisé (km)',
@@ -279,11 +307,11 @@ def generate_trajets_pdf(data):
     })
 
     # Vitesse lors des incidents
-    vitesse_incidents = df_vehicles.groupby('Regroupement')['Vitesse maxi'].max().reset_index()
-    vitesse_incidents = vitesse_incidents.sort_values('Vitesse maxi', ascending=False)
+    vitesse_incidents = df_vehicles.groupby('Regroupement', observed=True)['Vitesse maxi'].max().reset_index()
+    top_vitesse_incidents = aggregates.with_rest(*aggregates.top_n(vitesse_incidents, 'Vitesse maxi', rest_agg='max'))
     
     fig3 = px.bar(
-        vitesse_incidents.head(15),
+        top_vitesse_incidents,
         x='Regroupement',
         y='Vitesse maxi',
         title='Vitesse Maximale lors d\'Incidents',
@@ -311,37 +339,28 @@ def generate_trajets_pdf(data):
     
     return content
 
+@perf.timed('generate.jour_nuit')
+@_unless_empty('jour_nuit')
 def generate_jour_nuit_pdf(data):
     """Generate PDF content for Conduite Jour vs Nuit page"""
     content = []
     
-    df_jour = data['conduite_journee'].copy()
-    df_nuit = data['conduite_nocturne'].copy()
-    
-    df_jour_v = df_jour[~df_jour['Regroupement'].str.startswith('202', na=False)]
-    df_nuit_v = df_nuit[~df_nuit['Regroupement'].str.startswith('202', na=False)]
+    day_night = aggregates.day_night_summary(get_trips(data))
     
     # Metrics
     content.append({
         'title': 'Comparaison Globale',
         'metrics': [
-            {'label': 'Trajets Jour', 'value': len(df_jour_v)},
-            {'label': 'Distance Jour (km)', 'value': int(df_jour_v['Kilométrage'].sum())},
-            {'label': 'Trajets Nuit', 'value': len(df_nuit_v)},
-            {'label': 'Distance Nuit (km)', 'value': int(df_nuit_v['Kilométrage'].sum())}
+            {'label': 'Trajets Jour', 'value': int(day_night['Trajets Jour'].sum())},
+            {'label': 'Distance Jour (km)', 'value': int(day_night['Km Jour'].sum())},
+            {'label': 'Trajets Nuit', 'value': int(day_night['Trajets Nuit'].sum())},
+            {'label': 'Distance Nuit (km)', 'value': int(day_night['Km Nuit'].sum())}
         ]
     })
     
     # Kilométrage jour vs nuit
-    km_jour_par_v = df_jour_v.groupby('Regroupement')['Kilométrage'].sum().reset_index()
-    km_jour_par_v.columns = ['Véhicule', 'Km Jour']
-    
-    km_nuit_par_v = df_nuit_v.groupby('Regroupement')['Kilométrage'].sum().reset_index()
-    km_nuit_par_v.columns = ['Véhicule', 'Km Nuit']
-    
-    comparison = pd.merge(km_jour_par_v, km_nuit_par_v, on='Véhicule', how='outer').fillna(0)
-    comparison['Total'] = comparison['Km Jour'] + comparison['Km Nuit']
-    comparison = comparison.sort_values('Total', ascending=False).head(15)
+    comparison = aggregates.with_rest(*aggregates.top_n(
+        day_night, 'Total', rest_agg={'Total': 'sum', 'Km Jour': 'sum', 'Km Nuit': 'sum'}))
     
     fig = go.Figure()
     fig.add_trace(go.Bar(name='Jour', x=comparison['Véhicule'], y=comparison['Km Jour'], marker_color='#FFA500'))
@@ -383,6 +402,8 @@ def generate_jour_nuit_pdf(data):
     
     return content
 
+@perf.timed('generate.limitation_vitesse')
+@_unless_empty('limitation_vitesse')
 def generate_limitation_vitesse_pdf(data):
     """Generate PDF for Limitation Vitesse"""
     content = []
@@ -403,11 +424,11 @@ def generate_limitation_vitesse_pdf(data):
     })
     
     # Chart infractions
-    inf_par_vehicule = infractions_50.groupby('Regroupement').size().reset_index(name='Nb Infractions')
-    inf_par_vehicule = inf_par_vehicule.sort_values('Nb Infractions', ascending=False)
+    inf_par_vehicule = infractions_50.groupby('Regroupement', observed=True).size().reset_index(name='Nb Infractions')
+    top_inf_par_vehicule = aggregates.with_rest(*aggregates.top_n(inf_par_vehicule, 'Nb Infractions'))
     
     fig1 = px.bar(
-        inf_par_vehicule.head(15),
+        top_inf_par_vehicule,
         x='Regroupement',
         y='Nb Infractions',
         title='Top 15 - Véhicules avec le Plus d\'Infractions',
@@ -448,6 +469,11 @@ def generate_limitation_vitesse_pdf(data):
 | Grave | Suspension 1 semaine |
 | Très Grave | Suspension 1 mois |
 """
+    content.append({
+        'title': 'Niveaux de Gravité des Infractions',
+        'text': interpretation2
+    })
+
     interpretation3 = """
 **Observations:**
 - Le taux d'infraction peut varier entre jour et nuit
@@ -467,9 +493,17 @@ def generate_limitation_vitesse_pdf(data):
         'title': 'Infractions Temporelles',
         'text': interpretation3
     })
+
+    # Récapitulatif complet (le PDF pagine le tableau, sans limite de lignes)
+    content.append({
+        'title': 'Récapitulatif des Infractions',
+        'table': aggregates.speed_infractions(df_v)
+    })
     
     return content
 
+@perf.timed('generate.notifications')
+@_unless_empty('notifications')
 def generate_notifications_pdf(data):
     """Generate PDF for Notifications"""
     content = []
@@ -484,7 +518,8 @@ def generate_notifications_pdf(data):
     })
     
     # Pie chart
-    notif_types = df['Nom de notification'].value_counts().reset_index()
+    # Colonne catégorielle: value_counts liste aussi les types absents (0)
+    notif_types = df['Nom de notification'].value_counts().loc[lambda counts: counts > 0].reset_index()
     notif_types.columns = ['Type', 'Nombre']
     
     fig1 = px.pie(
@@ -525,23 +560,51 @@ def generate_notifications_pdf(data):
         'title': 'Analyse des Alertes par Véhicule',
         'text': interpretation2
     })
+
+    # Matrice creuse véhicule x type (cellules non nulles uniquement)
+    df_vehicles = df[~df['Regroupement'].str.startswith('202', na=False)]
+    matrix = aggregates.sparse_counts(df_vehicles, 'Regroupement', 'Nom de notification',
+                                      row_name='Véhicule', column_name='Type')
+    if matrix.nnz:
+        long_counts = matrix.to_long()
+        fig2 = go.Figure(go.Heatmap(
+            x=long_counts['Type'],
+            y=long_counts['Véhicule'],
+            z=long_counts['Nombre'],
+            colorscale='Blues',
+            hoverongaps=False
+        ))
+        fig2.update_layout(
+            title='Notifications par Véhicule et Type',
+            height=max(400, 18 * matrix.shape[0])
+        )
+        content.append({
+            'title': 'Carte de Chaleur des Notifications',
+            'figure': fig2
+        })
+        content.append({
+            'title': 'Détail des Notifications par Véhicule et Type',
+            'table': long_counts.sort_values('Nombre', ascending=False, kind='stable')
+        })
     
     return content
 
+@perf.timed('generate.temps_poi')
+@_unless_empty('temps_poi')
 def generate_temps_poi_pdf(data):
     """Generate PDF for Temps POI"""
     content = []
     
     df = data['temps_poi'].copy()
-    vehicles = get_vehicles(data['duree_distance'])
-    df_poi = df[~df['Regroupement'].isin(vehicles)]
+    entities = get_entities(data)
+    df_poi = df[entities.mask(df['Regroupement'], 'poi')]
     
-    poi_stats = df_poi.groupby('Regroupement')['Visites'].sum().reset_index()
+    poi_stats = df_poi.groupby('Regroupement', observed=True)['Visites'].sum().reset_index()
     poi_stats.columns = ['POI', 'Visites']
-    poi_stats = poi_stats.sort_values('Visites', ascending=False)
+    top_poi_stats = aggregates.with_rest(*aggregates.top_n(poi_stats, 'Visites'))
     
     fig1 = px.bar(
-        poi_stats.head(15),
+        top_poi_stats,
         x='POI',
         y='Visites',
         title='Top 15 - Points d\'Intérêt les Plus Visités'
@@ -580,6 +643,8 @@ def generate_temps_poi_pdf(data):
     
     return content
 
+@perf.timed('generate.visites_poi')
+@_unless_empty('visites_poi')
 def generate_visites_poi_pdf(data):
     """Generate PDF for Visites POI"""
     content = []
@@ -592,14 +657,14 @@ def generate_visites_poi_pdf(data):
     })
     
     # Visites par véhicule
-    vehicles = get_vehicles(data['duree_distance'])
-    df_vehicles = df[df['Regroupement'].isin(vehicles)]
+    entities = get_entities(data)
+    df_vehicles = df[entities.mask(df['Regroupement'], 'vehicle')]
     
-    vehicle_visites = df_vehicles.groupby('Regroupement')['Visites'].sum().reset_index()
-    vehicle_visites = vehicle_visites.sort_values('Visites', ascending=False)
+    vehicle_visites = df_vehicles.groupby('Regroupement', observed=True)['Visites'].sum().reset_index()
+    top_vehicle_visites = aggregates.with_rest(*aggregates.top_n(vehicle_visites, 'Visites'))
     
     fig2 = px.bar(
-        vehicle_visites.head(15),
+        top_vehicle_visites,
         x='Regroupement',
         y='Visites',
         title='Visites POI par Véhicule',
@@ -640,6 +705,8 @@ def generate_visites_poi_pdf(data):
     
     return content
 
+@perf.timed('generate.vitesse')
+@_unless_empty('vitesse')
 def generate_vitesse_pdf(data):
     """Generate PDF for Vitesse"""
     content = []
@@ -647,8 +714,8 @@ def generate_vitesse_pdf(data):
     df = data['vitesse'].copy()
     df_v = df[~df['Regroupement'].str.startswith('202', na=False)]
     
-    vitesse_max = df_v.groupby('Regroupement')['Vitesse maxi'].max().reset_index()
-    vitesse_max = vitesse_max.sort_values('Vitesse maxi', ascending=False)
+    vitesse_max = df_v.groupby('Regroupement', observed=True)['Vitesse maxi'].max().reset_index()
+    top_vitesse_max = aggregates.with_rest(*aggregates.top_n(vitesse_max, 'Vitesse maxi', rest_agg='max'))
     
     infractions = len(vitesse_max[vitesse_max['Vitesse maxi'] > 50])
     
@@ -658,7 +725,7 @@ def generate_vitesse_pdf(data):
     })
     
     fig1 = px.bar(
-        vitesse_max.head(15),
+        top_vitesse_max,
         x='Regroupement',
         y='Vitesse maxi',
         title='Top 15 - Vitesse Maximale',
@@ -718,6 +785,97 @@ def generate_vitesse_pdf(data):
     
     return content
 
+@perf.timed('generate.vehicule')
+@_unless_empty('vehicule')
+def generate_vehicule_pdf(data, vehicle=None):
+    """Generate PDF for the drill-down of one vehicle (first vehicle if None)"""
+    content = []
+    
+    if vehicle is None:
+        choices = vehicle_choices(data)
+        if not choices:
+            return content
+        vehicle = choices[0]
+    
+    vdata = vehicle_data(data, vehicle, headers=False)
+    profile = aggregates.vehicle_profile(vdata, vdata.entities)
+    
+    # Deux rangées de 4 métriques (largeur de page A4)
+    content.append({
+        'title': f'Fiche Véhicule - {vehicle}',
+        'metrics': profile['metrics'][:4]
+    })
+    content.append({
+        'metrics': profile['metrics'][4:]
+    })
+    
+    daily = profile['daily']
+    fig1 = px.bar(
+        daily,
+        x='Jour',
+        y='Distance (km)',
+        title=f'Distance Parcourue par Jour - {vehicle}',
+        color='Trajets',
+        color_continuous_scale='Blues'
+    )
+    
+    interpretation1 = """
+**Analyse:**
+- La répartition journalière montre le rythme d'utilisation du véhicule sur la semaine
+- Les jours sans trajet peuvent correspondre à une immobilisation ou à une absence de mission
+"""
+    content.append({
+        'title': 'Activité Journalière',
+        'figure': fig1,
+        'text': interpretation1,
+        'table': daily.round(1)
+    })
+    
+    if daily['Vitesse Max'].notna().any():
+        fig2 = px.bar(
+            daily,
+            x='Jour',
+            y='Vitesse Max',
+            title=f'Vitesse Maximale par Jour - {vehicle}',
+            color='Vitesse Max',
+            color_continuous_scale='YlOrRd'
+        )
+        fig2.add_hline(y=50, line_dash="dash", line_color="red")
+        content.append({
+            'title': 'Vitesse Maximale',
+            'figure': fig2
+        })
+    
+    if len(profile['notifications']) > 0:
+        fig3 = px.bar(
+            profile['notifications'],
+            x='Type',
+            y='Nombre',
+            title=f'Notifications par Type - {vehicle}'
+        )
+        content.append({
+            'title': 'Notifications',
+            'figure': fig3
+        })
+    
+    if len(profile['pois']) > 0:
+        content.append({
+            'title': "Points d'Intérêt Visités",
+            'table': profile['pois']
+        })
+    
+    columns = ['Jour', 'Début', 'Emplacement initial', 'Fin', "Lieu d'arrivée", 'Kilométrage', 'Vitesse maxi']
+    for title, trips in (('Trajets Non Autorisés', profile['unauthorized']), ('Trajets de Nuit', profile['night'])):
+        if len(trips) > 0:
+            table = trips[columns].copy()
+            table['Kilométrage'] = table['Kilométrage'].round(2)
+            content.append({
+                'title': title,
+                'table': table
+            })
+    
+    return content
+
 # Map page names to generator functions
 PDF_GENERATORS = {
     'synthese': generate_synthese_pdf,
@@ -728,11 +886,52 @@ PDF_GENERATORS = {
     'notifications': generate_notifications_pdf,
     'temps_poi': generate_temps_poi_pdf,
     'visites_poi': generate_visites_poi_pdf,
-    'vitesse': generate_vitesse_pdf
+    'vitesse': generate_vitesse_pdf,
+    'vehicule': generate_vehicule_pdf
 }
 
+# Contenu des pages déjà générées, par (empreinte, filtre, page); évincé par memory_budget
+_page_cache = memory_budget.BudgetedCache('page_content')
+
+
+def _content_sizes(content):
+    """Budget categories of a page content: its tables and its figures"""
+    tables = sum(memory_budget.estimate_size(section['table']) for section in content
+                 if section.get('table') is not None)
+    figures = sum(memory_budget.estimate_size(section['figure']) for section in content
+                  if section.get('figure') is not None)
+    return {'aggregates': tables, 'figures': figures}
+
+
+def page_content(page, data):
+    """
+    Sections of a page generator, cached for the upload and filter of data
+
+    The page, full-report and structured-report exports of the same data
+    share one generation per page. Uploads without content hash (plain
+    dicts) and the vehicle page (whose vehicle is an extra argument) are
+    generated on every call.
+
+    Args:
+        page: Key of PDF_GENERATORS
+        data: FleetData
+
+    Returns:
+        List of section dictionaries (new list and dictionaries, shared tables and figures)
+    """
+    content_hash = getattr(data, 'content_hash', None)
+    if content_hash is None or page == 'vehicule':
+        return PDF_GENERATORS[page](data)
+    key = (content_hash, repr(getattr(data, 'filters', None)), page)
+    content = _page_cache.get(key)
+    if content is None:
+        content = PDF_GENERATORS[page](data)
+        _page_cache.put(key, content, _content_sizes(content))
+    return [dict(section) for section in content]
+
 
 
+@perf.timed('generate.full_report')
 def generate_full_report(data):
     """Generate comprehensive PDF with all sections"""
     full_content = []
@@ -759,11 +958,12 @@ def generate_full_report(data):
             })
             
             # Generate content for this section
-            section_content = PDF_GENERATORS[page_key](data)
+            section_content = page_content(page_key, data)
             full_content.extend(section_content)
             
     return full_content
 
+@perf.timed('generate.structured_report')
 def generate_structured_report(data):
     """Generate structured content dict for Excel export"""
     structured_content = {}
@@ -782,6 +982,6 @@ def generate_structured_report(data):
     
     for page_key, sheet_name in sections:
         if page_key in PDF_GENERATORS:
-            structured_content[sheet_name] = PDF_GENERATORS[page_key](data)
+            structured_content[sheet_name] = page_content(page_key, data)
             
     return structured_content
@@ -0,0 +1,135 @@
+"""
+Lightweight stage timing for load, aggregate, render and export
+
+Timings and counters are kept process-wide (all sessions) and can be appended
+as JSON lines to the file named by the PERF_LOG environment variable.
+
+Usage:
+    with perf.timer('export.pdf.build', page='duree'):
+        doc.build(elements)
+
+    @perf.timed('generate.duree')
+    def generate_duree_pdf(data): ...
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+_lock = threading.Lock()
+_stages = {}
+_counters = defaultdict(int)
+_log_path = os.environ.get('PERF_LOG')
+
+
+def set_log_path(path):
+    """Send every timing to a JSON lines file (None disables the sink)"""
+    global _log_path
+    _log_path = path
+
+
+def record(stage, seconds, **labels):
+    """Record one timing for a stage"""
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = {'count': 0, 'total': 0.0, 'min': seconds, 'max': seconds, 'last': seconds}
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['min'] = min(stats['min'], seconds)
+        stats['max'] = max(stats['max'], seconds)
+        stats['last'] = seconds
+
+        if _log_path:
+            entry = {'ts': round(time.time(), 3), 'stage': stage, 'ms': round(seconds * 1000, 2), **labels}
+            try:
+                with open(_log_path, 'a', encoding='utf-8') as log:
+                    log.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+            except OSError:
+                pass
+
+
+def incr(name, value=1):
+    """Increment a counter"""
+    with _lock:
+        _counters[name] += value
+
+
+class timer:
+    """Context manager (or start/stop pair) timing one stage"""
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+        self._start = None
+        self.elapsed = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        if self._start is None:
+            return None
+        self.elapsed = time.perf_counter() - self._start
+        self._start = None
+        record(self.stage, self.elapsed, **self.labels)
+        return self.elapsed
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.labels['error'] = exc_type.__name__
+        self.stop()
+        return False
+
+
+def timed(stage):
+    """Decorator timing every call of a function as one stage"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """
+    Snapshot of the recorded stages, slowest total first
+
+    Returns:
+        List of dicts with stage, count, total/avg/min/max/last in milliseconds
+    """
+    with _lock:
+        rows = [
+            {
+                'stage': stage,
+                'count': stats['count'],
+                'total_ms': round(stats['total'] * 1000, 1),
+                'avg_ms': round(stats['total'] / stats['count'] * 1000, 1),
+                'min_ms': round(stats['min'] * 1000, 1),
+                'max_ms': round(stats['max'] * 1000, 1),
+                'last_ms': round(stats['last'] * 1000, 1),
+            }
+            for stage, stats in _stages.items()
+        ]
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def counters():
+    """Snapshot of the counters"""
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    """Forget every timing and counter"""
+    with _lock:
+        _stages.clear()
+        _counters.clear()
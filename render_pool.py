@@ -0,0 +1,280 @@
+"""
+Pool of warm Kaleido renderer processes for chart image export
+
+Each renderer is a long-lived process that keeps Kaleido (and its headless
+browser) loaded, so pio.to_image does not pay the browser startup cost on every
+chart. The pool is created on the first export, shared by every session of the
+server process, and renderers are restarted when they crash, hang or grow past
+a memory threshold.
+
+Configuration (environment variables):
+    RENDER_POOL_SIZE: number of renderers (default 2, 0 renders in-process)
+    RENDER_POOL_MAX_RSS_MB: restart a renderer above this RSS (default 1024, where /proc exists)
+    RENDER_POOL_TIMEOUT: seconds before a render is considered hung (default 120)
+"""
+import atexit
+import glob
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import plotly.io as pio
+
+logger = logging.getLogger(__name__)
+
+_kaleido_configured = False
+
+
+def configure_kaleido():
+    """
+    Keep one headless browser alive for the renders of this process (Kaleido >= 1)
+
+    Importing Kaleido and starting its browser is deferred until a chart is
+    actually rasterized instead of happening at import. A warm-up render checks
+    that Chrome is available before the persistent server is started: without
+    it, a half-started server would block the following renders, which instead
+    fail one by one and are reported by the exporters.
+    """
+    global _kaleido_configured
+    if _kaleido_configured:
+        return
+    _kaleido_configured = True
+    try:
+        import kaleido
+        pio.to_image({'data': [], 'layout': {}}, format='png', width=10, height=10)
+        if hasattr(kaleido, 'start_sync_server'):
+            kaleido.start_sync_server(silence_warnings=True)
+            atexit.register(kaleido.stop_sync_server, silence_warnings=True)
+        else:
+            logger.warning("Kaleido < 1.0: chaque graphique relance le navigateur (pip install -U kaleido)")
+    except Exception as e:
+        logger.warning("Export des graphiques en image indisponible: %s", e)
+
+
+def _process_tree_rss_mb(pid):
+    """Resident memory of a process and its children (the Kaleido browser), in MB (None without /proc)"""
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+            for children_file in glob.glob(f"/proc/{current}/task/*/children"):
+                with open(children_file) as children:
+                    pending.extend(int(child) for child in children.read().split())
+        except (OSError, ValueError):
+            continue
+    # Pas de /proc (macOS, Windows): mémoire actuelle inconnue, pas de redémarrage sur seuil
+    return total_kb / 1024 if total_kb else None
+
+
+def _worker_main(conn):
+    """Renderer process loop: keep Kaleido warm and rasterize the figures sent over the pipe"""
+    # Démarre le navigateur avant la première requête
+    configure_kaleido()
+
+    pid = os.getpid()
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        fig, kwargs = message
+        try:
+            image = pio.to_image(fig, **kwargs)
+            conn.send(('ok', image, _process_tree_rss_mb(pid)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}", _process_tree_rss_mb(pid)))
+
+
+class _Renderer:
+    """One renderer process and the parent end of its pipe"""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.renders = 0
+        self.rss_mb = 0.0
+
+    def render(self, payload, timeout):
+        self.conn.send(payload)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"renderer did not answer within {timeout}s")
+        status, value, self.rss_mb = self.conn.recv()
+        self.renders += 1
+        return status, value
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=2)
+        self.conn.close()
+
+
+class RendererPool:
+    """
+    Bounded pool of persistent renderer processes
+
+    Args:
+        size: Number of renderer processes
+        max_rss_mb: Restart a renderer once its process tree exceeds this RSS
+        timeout: Seconds before a render is considered hung and the renderer killed
+    """
+
+    def __init__(self, size=2, max_rss_mb=1024, timeout=120):
+        self.size = size
+        self.max_rss_mb = max_rss_mb
+        self.timeout = timeout
+        # spawn: ne pas dupliquer les threads du serveur Streamlit dans les renderers
+        self._ctx = mp.get_context('spawn')
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._busy = 0
+        self._closed = False
+        self._latencies = deque(maxlen=500)
+        self._counters = {'renders': 0, 'errors': 0, 'restarts': 0}
+        for _ in range(size):
+            self._idle.put(_Renderer(self._ctx))
+
+    def _restart(self, renderer):
+        renderer.close()
+        with self._lock:
+            self._counters['restarts'] += 1
+        return _Renderer(self._ctx)
+
+    def render(self, fig, **kwargs):
+        """
+        Rasterize a figure on the next free renderer
+
+        Args:
+            fig: Plotly figure or figure dict
+            **kwargs: pio.to_image arguments (format, width, height, scale)
+
+        Returns:
+            Image bytes
+        """
+        if self._closed:
+            raise RuntimeError("renderer pool is shut down")
+        payload = (fig.to_dict() if hasattr(fig, 'to_dict') else fig, kwargs)
+
+        with self._lock:
+            self._waiting += 1
+        try:
+            renderer = self._idle.get()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self._busy += 1
+
+        start = time.perf_counter()
+        try:
+            try:
+                status, value = renderer.render(payload, self.timeout)
+            except (EOFError, OSError, TimeoutError):
+                # Renderer planté ou bloqué: on le remplace et on réessaie une fois
+                renderer = self._restart(renderer)
+                status, value = renderer.render(payload, self.timeout)
+            if renderer.rss_mb is not None and renderer.rss_mb > self.max_rss_mb:
+                renderer = self._restart(renderer)
+        except Exception:
+            renderer = self._restart(renderer)
+            with self._lock:
+                self._counters['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._busy -= 1
+            self._idle.put(renderer)
+
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+            self._counters['renders' if status == 'ok' else 'errors'] += 1
+        if status != 'ok':
+            raise RuntimeError(value)
+        return value
+
+    def metrics(self):
+        """Snapshot of queue depth, render latency and restart counters"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snapshot = {
+                'size': self.size,
+                'busy': self._busy,
+                'queue_depth': self._waiting,
+                **self._counters,
+            }
+        if latencies:
+            snapshot['latency_ms_avg'] = round(sum(latencies) / len(latencies) * 1000, 1)
+            snapshot['latency_ms_p95'] = round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1)
+        return snapshot
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_inprocess_stats = {'renders': 0, 'errors': 0}
+
+
+def get_pool():
+    """Return the process-wide renderer pool, starting it on first use (None if disabled)"""
+    global _pool
+    size = int(os.environ.get('RENDER_POOL_SIZE', '2'))
+    if size <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = RendererPool(
+                size=size,
+                max_rss_mb=int(os.environ.get('RENDER_POOL_MAX_RSS_MB', '1024')),
+                timeout=int(os.environ.get('RENDER_POOL_TIMEOUT', '120')),
+            )
+            atexit.register(_pool.shutdown)
+    return _pool
+
+
+def to_image(fig, **kwargs):
+    """Drop-in replacement for pio.to_image that goes through the renderer pool"""
+    pool = get_pool()
+    if pool is not None:
+        return pool.render(fig, **kwargs)
+    # Rendu dans le processus courant (CLI, pool désactivé)
+    configure_kaleido()
+    try:
+        image = pio.to_image(fig, **kwargs)
+    except Exception:
+        _inprocess_stats['errors'] += 1
+        raise
+    _inprocess_stats['renders'] += 1
+    return image
+
+
+def metrics():
+    """Renderer pool metrics, or in-process counters when the pool is disabled or not started"""
+    if _pool is not None:
+        return _pool.metrics()
+    return {'size': 0, **_inprocess_stats}
@@ -0,0 +1,92 @@
+"""
+Small markdown reader for the interpretation texts of the report sections
+
+The texts written in pdf_generators use a narrow markdown subset: '###'
+headings, '**bold**' (and '*italic*'), '- ' bullets, '1. ' numbered lists,
+'|' tables and plain lines. parse_markdown turns a text into a tuple of
+blocks once (memoized: the same texts come back for every export), and each
+exporter renders the blocks in its own format. inline_markup produces the
+<b>/<i> markup understood by both HTML and ReportLab paragraphs.
+
+Blocks:
+    ('heading', level, text)
+    ('paragraph', (line, ...))          consecutive lines, rendered with line breaks
+    ('bullets', (item, ...))
+    ('numbered', (item, ...))
+    ('table', (header, ...), ((cell, ...), ...))
+"""
+import re
+from functools import lru_cache
+from html import escape
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*)$')
+_BULLET = re.compile(r'^[-*•]\s+(.*)$')
+_NUMBERED = re.compile(r'^\d+[.)]\s+(.*)$')
+_TABLE_RULE = re.compile(r'^\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?$')
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC = re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])')
+
+
+def _cells(line):
+    return tuple(cell.strip() for cell in line.strip().strip('|').split('|'))
+
+
+@lru_cache(maxsize=512)
+def parse_markdown(text):
+    """
+    Blocks of a markdown text (see the module docstring)
+
+    Args:
+        text: Markdown text (leading indentation is ignored)
+
+    Returns:
+        Tuple of blocks (immutable, shared between calls with the same text)
+    """
+    blocks = []
+    kind, items = None, []
+
+    def flush():
+        nonlocal kind, items
+        if kind == 'table':
+            rows = [row for row in items if not _TABLE_RULE.match(row)]
+            header = _cells(rows[0])
+            body = tuple(_cells(row) for row in rows[1:])
+            blocks.append(('table', header, body))
+        elif kind is not None:
+            blocks.append((kind, tuple(items)))
+        kind, items = None, []
+
+    for raw in (text or '').splitlines():
+        line = raw.strip()
+        if not line:
+            flush()
+            continue
+        heading = _HEADING.match(line)
+        bullet = _BULLET.match(line)
+        numbered = _NUMBERED.match(line)
+        if heading:
+            flush()
+            blocks.append(('heading', len(heading.group(1)), heading.group(2).strip()))
+            continue
+        if line.startswith('|'):
+            line_kind, value = 'table', line
+        elif bullet:
+            line_kind, value = 'bullets', bullet.group(1)
+        elif numbered:
+            line_kind, value = 'numbered', numbered.group(1)
+        else:
+            line_kind, value = 'paragraph', line
+        if line_kind != kind:
+            flush()
+            kind = line_kind
+        items.append(value)
+    flush()
+    return tuple(blocks)
+
+
+@lru_cache(maxsize=2048)
+def inline_markup(text):
+    """Escaped text with **bold** and *italic* turned into <b>/<i> tags"""
+    text = escape(text, quote=False)
+    text = _BOLD.sub(r'<b>\1</b>', text)
+    return _ITALIC.sub(r'<i>\1</i>', text)
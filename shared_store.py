@@ -0,0 +1,185 @@
+"""
+Process-wide store of parsed uploads shared by every Streamlit session
+
+st.cache_data pickles the value it caches and unpickles a new copy for each
+call, so every session that uploads the weekly file holds its own copy of the
+sheets. Here the FleetData of an upload is parsed once, kept in memory under
+the content hash of the upload and handed to all the sessions that upload
+the same file:
+
+- acquire() returns a Lease; the first session parses the upload, the others
+  wait for it and reuse the result (no copy, no deserialization);
+- each lease exposes a read-only view of the sheets and of the trips table:
+  shallow copies of the frames, so with pandas copy-on-write (enabled below
+  on pandas 2.x, always on from pandas 3) a page writing to a frame only
+  changes its own view, never the shared data; the arrays of the FleetIndex
+  are shared as is but not writable;
+- leases are counted per upload and released explicitly (new upload) or when
+  the session is discarded (the lease is garbage collected with the session
+  state); the upload is evicted as soon as no session holds a lease on it;
+- uploads are accounted in the 'sheets' category of memory_budget: when the
+  budget evicts one, its leases are revoked and the sessions still using it
+  parse it again on their next rerun.
+"""
+import copy
+import threading
+import weakref
+
+import pandas as pd
+
+import memory_budget
+
+# Sans copy-on-write (pandas < 3), une vue copy(deep=False) partage ses écritures avec l'original
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+
+def read_only_view(data):
+    """Copy of a FleetData whose frames (sheets and trips) share the memory of data (pandas copy-on-write)"""
+    view = copy.copy(data)
+    for key, value in view.items():
+        if isinstance(value, pd.DataFrame):
+            view[key] = value.copy(deep=False)
+    if isinstance(getattr(view, 'trips', None), pd.DataFrame):
+        view.trips = view.trips.copy(deep=False)
+    return view
+
+
+class Lease:
+    """
+    One session's hold on a shared upload
+
+    Attributes:
+        key: Content hash of the upload
+        data: Read-only view of the shared FleetData
+        revoked: True once the memory budget evicted the upload (acquire it again)
+    """
+
+    def __init__(self, store, key, entry):
+        self.key = key
+        self.data = read_only_view(entry.value)
+        self.revoked = False
+        # Libération automatique quand la session (et donc le bail) disparaît
+        self._finalizer = weakref.finalize(self, store._release_entry, key, entry)
+        entry.leases.add(self)
+
+    def touch(self):
+        """Mark the upload as in use for the memory budget"""
+        memory_budget.get_budget().touch(('sheets', self.key))
+
+    def release(self):
+        """Give the upload back to the store (idempotent)"""
+        self._finalizer()
+
+
+class _Entry:
+    def __init__(self):
+        self.value = None
+        self.error = None
+        self.refs = 0
+        self.ready = threading.Event()
+        self.leases = weakref.WeakSet()
+
+
+class SharedStore:
+    """Reference-counted uploads keyed by content hash"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._counters = {'loads': 0, 'hits': 0, 'evictions': 0}
+
+    def acquire(self, key, load):
+        """
+        Lease on the upload of a content hash, parsing it if no session holds it
+
+        Args:
+            key: Content hash of the upload
+            load: Function without arguments returning the FleetData (called once
+                per key while it is held; concurrent callers wait for it)
+
+        Returns:
+            Lease
+
+        Raises:
+            Whatever load raises, for the loading session and the waiting ones
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _Entry()
+                self._counters['loads'] += 1
+            else:
+                self._counters['hits'] += 1
+            entry.refs += 1
+
+        if owner:
+            try:
+                entry.value = load()
+                memory_budget.get_budget().add(('sheets', key), {'sheets': _upload_size(entry.value)},
+                                               evict=lambda: self.evict(key))
+            except BaseException as e:
+                entry.error = e
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                raise
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+        return Lease(self, key, entry)
+
+    def _release_entry(self, key, entry):
+        """Drop one lease on an upload, evicting it when it was the last one"""
+        with self._lock:
+            # Upload déjà évincé (et peut-être rechargé depuis): le bail ne compte plus
+            if self._entries.get(key) is not entry:
+                return
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            del self._entries[key]
+            self._counters['evictions'] += 1
+        memory_budget.get_budget().remove(('sheets', key))
+
+    def evict(self, key):
+        """Drop an upload even if sessions hold it: their leases are revoked"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self._counters['evictions'] += 1
+            leases = list(entry.leases)
+        for lease in leases:
+            lease.revoked = True
+            lease.data = None
+
+    def metrics(self):
+        """Uploads in memory with their number of leases, and load/hit/eviction counters"""
+        with self._lock:
+            return {
+                'uploads': {key[:12]: entry.refs for key, entry in self._entries.items()},
+                **self._counters,
+            }
+
+
+def _upload_size(data):
+    """Bytes of the frames of a FleetData (sheets and trips table)"""
+    frames = list(data.values()) + [getattr(data, 'trips', None)]
+    return sum(memory_budget.estimate_size(frame) for frame in frames if isinstance(frame, pd.DataFrame))
+
+
+_store = SharedStore()
+
+
+def get_store():
+    """Return the process-wide shared store"""
+    return _store
+
+
+def metrics():
+    return _store.metrics()
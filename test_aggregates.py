@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import aggregates
+
+
+@pytest.fixture
+def per_vehicle():
+    return pd.DataFrame({
+        'Véhicule': pd.Categorical(['A', 'B', 'C', 'D', 'E']),
+        'Distance': [10.0, 50.0, 30.0, 50.0, 5.0],
+        'Vitesse maxi': [60, 95, 70, 80, 110],
+    })
+
+
+def test_top_n_matches_a_stable_full_sort(per_vehicle):
+    top, _ = aggregates.top_n(per_vehicle, 'Distance', n=3)
+
+    expected = per_vehicle.sort_values('Distance', ascending=False, kind='stable').head(3)
+    pd.testing.assert_frame_equal(top, expected)
+
+
+def test_rest_row_sums_the_rows_left_out(per_vehicle):
+    _, rest = aggregates.top_n(per_vehicle, 'Distance', n=3)
+
+    assert rest.to_dict('records') == [{'Véhicule': 'Autres', 'Distance': 15.0, 'Nb': 2}]
+
+
+def test_rest_row_of_a_speed_is_its_maximum(per_vehicle):
+    _, rest = aggregates.top_n(per_vehicle, 'Vitesse maxi', n=2, rest_agg='max')
+
+    assert rest['Vitesse maxi'].iloc[0] == 80
+
+
+def test_rest_row_aggregates_several_columns(per_vehicle):
+    _, rest = aggregates.top_n(per_vehicle, 'Distance', n=3, rest_agg={'Distance': 'sum', 'Vitesse maxi': 'max'})
+
+    assert rest[['Distance', 'Vitesse maxi']].iloc[0].tolist() == [15.0, 110]
+
+
+def test_no_rest_row_when_everything_fits_or_when_disabled(per_vehicle):
+    assert aggregates.top_n(per_vehicle, 'Distance', n=5)[1] is None
+    assert aggregates.top_n(per_vehicle, 'Distance', n=2, rest_agg=None)[1] is None
+
+
+def test_with_rest_appends_the_labelled_rest_bar(per_vehicle):
+    rows = aggregates.with_rest(*aggregates.top_n(per_vehicle, 'Distance', n=3))
+
+    assert rows['Véhicule'].tolist() == ['B', 'D', 'C', 'Autres (2)']
+    assert rows['Distance'].tolist() == [50.0, 50.0, 30.0, 15.0]
+    assert aggregates.with_rest(per_vehicle, None) is per_vehicle
+
+
+def test_sparse_counts_keeps_only_the_observed_cells():
+    df = pd.DataFrame({
+        'Regroupement': pd.Categorical(['G1', 'G1', 'G2', 'G3', 'G1'], categories=['G0', 'G1', 'G2', 'G3']),
+        'Nom de notification': ['Excès', 'Excès', 'Arrêt', 'Excès', 'Arrêt'],
+    })
+
+    matrix = aggregates.sparse_counts(df, 'Regroupement', 'Nom de notification')
+
+    assert matrix.shape == (3, 2)
+    assert matrix.nnz == 4
+    expected = pd.crosstab(df['Regroupement'].astype(str), df['Nom de notification'])
+    dense = matrix.to_dense()
+    dense.index = dense.index.astype(str)
+    pd.testing.assert_frame_equal(dense, expected, check_names=False, check_dtype=False)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlencode
+
+import pytest
+
+import api
+import data_loader
+import pdf_generators
+
+
+def call(method, path, query=None, body=b'', headers=None):
+    """(status, headers, body) of one request sent straight to the ASGI app"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': urlencode(query or [], doseq=True).encode(),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        'client': ('127.0.0.1', 1234), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {'body': b''}
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {name.decode(): value.decode() for name, value in message['headers']}
+        else:
+            response['body'] += message.get('body', b'')
+
+    asyncio.run(api.app(scope, receive, send))
+    return response['status'], response['headers'], response['body']
+
+
+@pytest.fixture
+def upload_id(sample_workbook):
+    with open(sample_workbook, 'rb') as source:
+        status, _, body = call('POST', '/uploads', {'name': 'semaine.xlsx'}, source.read())
+    assert status in (200, 201)
+    return json.loads(body)['id']
+
+
+EMPTY_FILTER = {'vehicle': 'BP 8718 RB', 'start': '2026-01-28', 'end': '2026-01-29'}
+
+
+def test_page_of_an_empty_selection_returns_the_no_data_message(upload_id):
+    status, _, body = call('GET', f'/uploads/{upload_id}/pages/synthese', EMPTY_FILTER)
+
+    assert status == 200
+    assert json.loads(body)['message'] == pdf_generators.NO_DATA_MESSAGE
+
+
+def test_matching_etag_answers_304_before_filtering(upload_id, monkeypatch):
+    path = f'/uploads/{upload_id}/pages/duree'
+    _, headers, _ = call('GET', path, {'vehicle': 'BP 8718 RB'})
+
+    def no_filter(*args, **kwargs):
+        raise AssertionError("filtre appliqué pour une réponse 304")
+
+    monkeypatch.setattr(data_loader, 'apply_filter', no_filter)
+    status, _, body = call('GET', path, {'vehicle': 'BP 8718 RB'}, headers={'If-None-Match': headers['etag']})
+
+    assert status == 304 and body == b''
+
+
+def test_idle_uploads_are_forgotten(upload_id):
+    api._uploads[upload_id]['used'] = time.time() - api.UPLOAD_TTL - 1
+
+    status, _, _ = call('GET', f'/uploads/{upload_id}')
+
+    assert status == 404
+    assert upload_id not in api._uploads
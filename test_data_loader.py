@@ -0,0 +1,40 @@
+import io
+import zipfile
+
+import pandas as pd
+
+import data_loader
+
+
+def zipped(sample_workbook):
+    """Archive holding the sample workbook twice, an Excel lock file and a junk file"""
+    with open(sample_workbook, 'rb') as source:
+        payload = source.read()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('S1/semaine.xlsx', payload)
+        archive.writestr('S1/copie/semaine (1).xlsx', payload)
+        archive.writestr('S1/~$semaine.xlsx', b'verrou')
+        archive.writestr('S1/notes.txt', b'pas un classeur')
+    buffer.name = 'trimestre.zip'
+    return buffer, payload
+
+
+def test_expand_uploads_keeps_only_the_workbooks_of_an_archive(sample_workbook):
+    archive, payload = zipped(sample_workbook)
+
+    workbooks = data_loader.expand_uploads([archive])
+
+    assert [name for name, _ in workbooks] == ['trimestre.zip/S1/semaine.xlsx', 'trimestre.zip/S1/copie/semaine (1).xlsx']
+    assert all(content == payload for _, content in workbooks)
+
+
+def test_read_workbooks_parses_duplicates_once(sample_workbook, fleet_data):
+    archive, payload = zipped(sample_workbook)
+
+    data = data_loader.read_workbooks([archive], jobs=1)
+
+    assert [workbook['duplicate'] for workbook in data.workbooks] == [False, True]
+    assert data.content_hash == fleet_data.content_hash == data_loader.merged_hash([data_loader.content_hash(payload)])
+    for key in data_loader.SHEET_NAMES:
+        pd.testing.assert_frame_equal(data[key], fleet_data[key])
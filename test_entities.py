@@ -0,0 +1,24 @@
+import entities
+
+
+def test_no_plate_is_classified_as_poi(fleet_data):
+    registry = fleet_data.entities
+
+    assert not [value for value in registry.values_of(entities.POI) if entities.is_plate(value)]
+    assert registry.kind('BS 8091 RB') == entities.VEHICLE
+    assert 'BS 8091 RB' in registry.vehicles
+
+
+def test_visites_poi_counts_only_points_of_interest(fleet_data):
+    column = fleet_data['visites_poi']['Regroupement']
+
+    assert fleet_data.entities.mask(column, entities.POI).sum() == 37
+
+
+def test_classify_recognizes_each_kind():
+    vehicles = {'AU 1176 RB'}
+
+    assert entities.classify('AU 1176 RB', vehicles) == entities.VEHICLE
+    assert entities.classify('BP - Abomey', vehicles) == entities.POI
+    assert entities.classify('2026-01-27', vehicles) == entities.DATE
+    assert entities.classify('Total', vehicles) == entities.SEPARATOR
@@ -0,0 +1,37 @@
+import os
+import re
+import subprocess
+import sys
+
+import export_delivery
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_get_filename_is_timestamped_and_path_safe():
+    name = export_delivery.get_filename("Durée / Distance", "pdf")
+
+    assert re.fullmatch(r"Rapport_Durée___Distance_\d{8}_\d{6}\.pdf", name)
+
+
+def test_spooled_output_is_read_once_and_closed():
+    output = export_delivery.spooled_output()
+    output.write(b'rapport')
+
+    assert export_delivery.read_all(output) == b'rapport'
+    assert output.closed
+
+
+def test_app_startup_modules_do_not_load_the_export_stack():
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    try:
+        import import_time
+    finally:
+        sys.path.pop(0)
+    modules = [module for module in import_time.startup_modules() if module != 'streamlit']
+    code = "; ".join(f"import {module}" for module in modules)
+    code += "; import sys; print(sorted({'reportlab', 'xlsxwriter', 'kaleido', 'export_utils'} & set(sys.modules)))"
+
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == '[]'
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+import export_queue
+import memory_budget
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """Private memory budget (1 MB) so the tests do not touch the process-wide one"""
+    budget = memory_budget.MemoryBudget(1024 * 1024)
+    monkeypatch.setattr(memory_budget, '_budget', budget)
+    return budget
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition non atteinte"
+        time.sleep(0.005)
+
+
+def wait(job):
+    wait_for(lambda: not job.pending)
+    return job
+
+
+def registered(budget, job):
+    """Wait until the worker accounted the job's file (after marking it done)"""
+    wait_for(lambda: ('exports', job.id) in [entry['name'] for entry in budget.entries()])
+    return job
+
+
+def test_a_busy_session_does_not_starve_another(budget):
+    scheduler = export_queue.ExportScheduler(workers=1)
+    gate, order = threading.Event(), []
+
+    def build(name):
+        def run():
+            if name == 'occupe':
+                gate.wait(5)
+            order.append(name)
+            return name.encode()
+        return run
+
+    blocker = scheduler.submit('autre', 'occupe', build('occupe'))
+    wait_for(lambda: blocker.status == 'running')
+    heavy = [scheduler.submit('A', f'a{number}', build(f'a{number}')) for number in range(1, 4)]
+    light = scheduler.submit('B', 'b1', build('b1'))
+
+    assert scheduler.position(heavy[0]) == 1
+    assert scheduler.position(light) == 2
+    assert scheduler.position(heavy[2]) == 4
+    gate.set()
+    for job in heavy + [light]:
+        wait(job)
+    assert order == ['occupe', 'a1', 'b1', 'a2', 'a3']
+
+
+def test_identical_requests_share_one_job(budget):
+    scheduler = export_queue.ExportScheduler(workers=1)
+    calls = []
+
+    first = scheduler.submit('A', ('hash', 'pdf_all', None), lambda: calls.append(1) or b'%PDF')
+    second = scheduler.submit('B', ('hash', 'pdf_all', None), lambda: calls.append(2) or b'%PDF')
+
+    assert second is first
+    assert wait(first).result == b'%PDF'
+    assert scheduler.submit('C', ('hash', 'pdf_all', None), lambda: b'') is first
+    assert calls == [1]
+    assert scheduler.metrics()['deduplicated'] == 2
+
+
+def test_failed_job_is_not_shared(budget):
+    scheduler = export_queue.ExportScheduler(workers=1)
+
+    def broken():
+        raise OSError("disque plein")
+
+    failed = wait(scheduler.submit('A', 'clé', broken))
+    retried = scheduler.submit('A', 'clé', lambda: b'ok')
+
+    assert failed.status == 'error' and failed.error == "disque plein"
+    assert retried is not failed and wait(retried).result == b'ok'
+
+
+def test_expired_results_are_swept(budget):
+    scheduler = export_queue.ExportScheduler(workers=1, result_ttl=0)
+    job = registered(budget, wait(scheduler.submit('A', 'clé', lambda: b'x' * 100)))
+    time.sleep(0.01)
+
+    again = scheduler.submit('A', 'clé', lambda: b'y')
+
+    assert again is not job
+    assert ('exports', job.id) not in [entry['name'] for entry in budget.entries()]
+
+
+def test_budget_eviction_drops_the_oldest_file(budget):
+    scheduler = export_queue.ExportScheduler(workers=1)
+    old = registered(budget, wait(scheduler.submit('A', 'ancien', lambda: b'x' * 700 * 1024)))
+
+    new = registered(budget, wait(scheduler.submit('A', 'nouveau', lambda: b'y' * 700 * 1024)))
+
+    assert new.status == 'done'
+    assert old.status == 'error' and old.result is None
+    assert "relancez l'export" in old.error
+    assert scheduler.submit('A', 'ancien', lambda: b'z') is not old
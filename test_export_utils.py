@@ -0,0 +1,92 @@
+import json
+import re
+
+import pandas as pd
+import plotly.express as px
+import pytest
+from reportlab import rl_config
+from reportlab.platypus import Paragraph, Table
+
+import export_utils
+
+
+def html_report(sections, page_name="Durée - Distance"):
+    return export_utils.create_html_report(page_name, sections).getvalue().decode('utf-8')
+
+
+def test_html_report_is_self_contained():
+    figure = px.bar(pd.DataFrame({'Véhicule': ['AU 1176 RB'], 'Distance': [120.5]}), x='Véhicule', y='Distance')
+
+    html = html_report([{'title': "Top véhicules", 'figure': figure, 'text': "**Analyse**"}])
+
+    assert not re.search(r'<script[^>]+src=', html)
+    assert not re.search(r'<link[^>]+href=["\']https?:', html)
+    # Un seul bundle plotly.js, inclus dans la page
+    assert html.count(export_utils._plotly_js()) == 1
+    figure_json = re.search(r'<script type="application/json" data-figure="figure-0">(.*?)</script>', html, re.S)
+    assert json.loads(figure_json.group(1))['data'][0]['x'] == ['AU 1176 RB']
+
+
+def test_html_report_embeds_full_tables():
+    table = pd.DataFrame({'Véhicule': [f"AU {1000 + i} RB" for i in range(500)], 'Distance': range(500)})
+
+    html = html_report([{'title': "Distances", 'table': table},
+                        {'title': "Script", 'table': pd.DataFrame({'Lieu': ['</script><b>x</b>']})}])
+
+    tables = re.findall(r'<script type="application/json" data-table="table-\d+">(.*?)</script>', html, re.S)
+    assert len(tables) == 2
+    assert json.loads(tables[0]) == json.loads(table.to_json(orient='split', index=False))
+    # '</' échappé: la cellule ne ferme pas le bloc JSON
+    assert json.loads(tables[1])['data'] == [['</script><b>x</b>']]
+
+
+def test_fit_widths_keeps_natural_widths_that_fit():
+    assert export_utils._fit_widths([40, 120, 80], 500) == [40, 120, 80]
+
+
+def test_fit_widths_narrows_only_the_wide_columns():
+    widths = export_utils._fit_widths([50, 300, 400], 500)
+
+    assert widths[0] == 50
+    assert sum(widths) == pytest.approx(500)
+    assert widths[1] / widths[2] == pytest.approx(300 / 400)
+
+
+def test_long_table_spans_several_pages_with_its_header(monkeypatch):
+    # Flux de page non compressés: le texte dessiné se lit dans le PDF
+    monkeypatch.setattr(rl_config, 'pageCompression', 0)
+    table = pd.DataFrame({'Plaque': [f"AU {1000 + i} RB" for i in range(120)], 'Distance': range(120)})
+
+    pdf = export_utils.create_pdf_report("Distances", [{'title': "Distances", 'table': table}]).getvalue()
+
+    pages = len(re.findall(rb'/Type /Page\b', pdf))
+    headers = pdf.count(b'(Plaque) Tj')
+    assert headers >= 3
+    assert pages == headers + 1  # page de titre puis une page par tranche du tableau
+    assert all(pdf.count(f"({plate}) Tj".encode()) == 1 for plate in table['Plaque'])
+
+
+def test_paged_table_split_hands_the_remaining_rows_over():
+    table = export_utils.paged_table(pd.DataFrame({'Plaque': [f"AU {1000 + i} RB" for i in range(100)]}), 500)
+
+    first, rest = table.split(500, 26 + 16 * 40)
+
+    assert first._cellvalues[0] == ['Plaque'] and len(first._cellvalues) == 41
+    assert isinstance(rest, export_utils.PagedTable) and rest.start == 40
+    assert table.split(500, 26 + 16 * 2) == []
+
+
+def test_markdown_flowables_render_each_block():
+    text = "### Analyse\n- **Grave**: 81-100 km/h\n1. Former\n\n| Catégorie | Sanction |\n|---|---|\n| Légère | Avertissement |"
+
+    flowables = export_utils.markdown_flowables(text)
+
+    paragraphs = [item for item in flowables if isinstance(item, Paragraph)]
+    assert [item.style.name for item in paragraphs] == ['TextHeading', 'TextBullet', 'TextBullet']
+    assert [item.bulletText for item in paragraphs[1:]] == ['•', '1.']
+    assert paragraphs[1].getPlainText() == 'Grave: 81-100 km/h'
+    assert paragraphs[1].frags[0].fontName == 'Helvetica-Bold'
+    [table] = [item for item in flowables if isinstance(item, Table)]
+    assert [cell.getPlainText() for cell in table._cellvalues[1]] == ['Légère', 'Avertissement']
+    # Nouveaux objets à chaque appel: platypus garde l'état de mise en page sur les flowables
+    assert export_utils.markdown_flowables(text)[0] is not flowables[0]
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fleet_index
+from entities import DATE, SEPARATOR, VEHICLE
+
+
+def owners_and_days(key, df, registry):
+    """Owner plate and day of every row, one row at a time (reference for the FleetIndex)"""
+    date_column, fill = fleet_index.SHEET_LAYOUT[key]
+    values = df['Regroupement'].tolist()
+    kinds = [registry.kind(value) for value in values]
+
+    owners = [None] * len(df)
+    current = None
+    for row in (range(len(df)) if fill == 'ffill' else reversed(range(len(df)))):
+        if kinds[row] == VEHICLE:
+            current = values[row]
+        elif kinds[row] == SEPARATOR:
+            current = None
+        owners[row] = current
+
+    block_start = [row == 0 or owners[row] != owners[row - 1] for row in range(len(df))]
+    if date_column is not None:
+        days = [None if pd.isna(stamp) else stamp.date()
+                for stamp in pd.to_datetime(df[date_column].astype(object), errors='coerce')]
+    else:
+        days, current = [], None
+        for row in range(len(df)):
+            if kinds[row] == DATE:
+                current = pd.to_datetime(str(values[row]), errors='coerce')
+                current = None if pd.isna(current) else current.date()
+            elif block_start[row]:
+                current = None
+            days.append(current)
+    headers = [key in fleet_index.SUMMARY_COLUMNS and block_start[row] and kinds[row] == VEHICLE
+               for row in range(len(df))]
+    blocks = np.cumsum(block_start)
+    return owners, days, headers, blocks
+
+
+def mask_filter(key, df, registry, vehicles, start, end):
+    """Rows of the vehicles within [start, end] with a plain boolean mask, headers recomputed"""
+    owners, days, headers, blocks = owners_and_days(key, df, registry)
+    dated = np.array([owner in vehicles and day is not None and start <= day <= end and not header
+                      for owner, day, header in zip(owners, days, headers)])
+    kept_blocks = set(blocks[dated])
+    is_header = np.array(headers) & np.isin(blocks, list(kept_blocks))
+    expected = df[dated | is_header].copy()
+    header_rows = is_header[dated | is_header]
+    if not header_rows.any():
+        return expected
+
+    date_column, _ = fleet_index.SHEET_LAYOUT[key]
+    children = ~header_rows
+    if date_column is None:
+        children &= expected['Regroupement'].astype(str).str.startswith('202').to_numpy()
+    kept = blocks[dated | is_header]
+    for column, agg in fleet_index.SUMMARY_COLUMNS[key].items():
+        totals = expected[column][children].groupby(kept[children]).agg(agg)
+        values = totals.reindex(kept[header_rows]).fillna(0).astype(expected[column].dtype).to_numpy()
+        expected.iloc[np.flatnonzero(header_rows), expected.columns.get_loc(column)] = values
+    return expected
+
+
+@pytest.mark.parametrize('key', sorted(fleet_index.SHEET_LAYOUT))
+def test_filter_sheets_matches_a_boolean_mask(fleet_data, key):
+    vehicles = fleet_data.entities.vehicles[:3]
+    start = fleet_data.index.first_day + timedelta(days=1)
+    end = start + timedelta(days=1)
+
+    filtered = fleet_index.filter_sheets({key: fleet_data[key]}, fleet_data.index, vehicles, start, end)[key]
+
+    expected = mask_filter(key, fleet_data[key], fleet_data.entities, vehicles, start, end)
+    assert len(filtered) > 0
+    pd.testing.assert_frame_equal(filtered, expected)
@@ -0,0 +1,24 @@
+import os
+import shutil
+
+import main
+
+
+def test_collect_inputs_skips_excel_lock_files(tmp_path):
+    for name in ('b.xlsx', 'a.xlsx', '~$a.xlsx', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+
+    assert main.collect_inputs([str(tmp_path)]) == [str(tmp_path / 'a.xlsx'), str(tmp_path / 'b.xlsx')]
+
+
+def test_build_reports_writes_pdf_and_excel(sample_workbook, tmp_path):
+    source = tmp_path / 'semaine.xlsx'
+    shutil.copy(sample_workbook, source)
+
+    written = main.build_reports(source, tmp_path / 'rapports')
+
+    assert [os.path.basename(path) for path in written] == ['semaine_Rapport_Complet.pdf', 'semaine_Rapport_Complet.xlsx']
+    with open(written[0], 'rb') as pdf:
+        assert pdf.read(5) == b'%PDF-'
+    with open(written[1], 'rb') as xlsx:
+        assert xlsx.read(2) == b'PK'
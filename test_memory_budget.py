@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+import memory_budget
+
+
+@pytest.fixture
+def evicted():
+    return []
+
+
+@pytest.fixture
+def budget():
+    return memory_budget.MemoryBudget(1000)
+
+
+def add(budget, evicted, name, size, category='aggregates'):
+    budget.add(name, {category: size}, evict=lambda: evicted.append(name))
+
+
+def test_least_recently_used_entries_go_first(budget, evicted):
+    for name in ('a', 'b', 'c', 'd'):
+        add(budget, evicted, name, 300)
+
+    assert evicted == ['a']
+    add(budget, evicted, 'e', 500)
+    assert evicted == ['a', 'b', 'c']
+    assert [entry['name'] for entry in budget.entries()] == ['d', 'e']
+
+
+def test_touch_protects_an_entry(budget, evicted):
+    for name in ('a', 'b', 'c'):
+        add(budget, evicted, name, 300)
+
+    budget.touch('a')
+    add(budget, evicted, 'd', 300)
+
+    assert evicted == ['b']
+    assert [entry['name'] for entry in budget.entries()] == ['c', 'a', 'd']
+
+
+def test_entry_just_added_is_kept_even_if_too_large(budget, evicted):
+    add(budget, evicted, 'a', 300)
+
+    add(budget, evicted, 'énorme', 5000)
+
+    assert evicted == ['a']
+    assert [entry['name'] for entry in budget.entries()] == ['énorme']
+
+
+def test_usage_is_accounted_per_category_and_goes_back_down(budget, evicted):
+    add(budget, evicted, 'feuilles', 400, 'sheets')
+    budget.add('page', {'aggregates': 200, 'figures': 100}, evict=lambda: evicted.append('page'))
+
+    usage = budget.usage()
+    assert usage['total'] == 700
+    assert usage['categories']['aggregates']['bytes'] == 200
+    assert usage['categories']['figures']['entries'] == 1
+
+    add(budget, evicted, 'image', 600, 'images')
+    usage = budget.usage()
+    assert evicted == ['feuilles']
+    assert usage['total'] == 900 and usage['categories']['sheets']['bytes'] == 0
+    assert usage['categories']['sheets']['evictions'] == 1
+
+    budget.set_limit(650)
+    assert evicted == ['feuilles', 'page']
+    assert budget.usage()['total'] == 600
+    budget.remove('image')
+    assert budget.usage()['total'] == 0 and evicted == ['feuilles', 'page']
+
+
+def test_clear_evicts_one_category(budget, evicted):
+    add(budget, evicted, 'feuilles', 100, 'sheets')
+    add(budget, evicted, 'image', 100, 'images')
+
+    budget.clear('images')
+
+    assert evicted == ['image']
+    assert [entry['name'] for entry in budget.entries()] == ['feuilles']
+
+
+def test_budgeted_cache_drops_evicted_values(monkeypatch):
+    budget = memory_budget.MemoryBudget(1000)
+    monkeypatch.setattr(memory_budget, '_budget', budget)
+    cache = memory_budget.BudgetedCache('test')
+
+    cache.put('a', pd.DataFrame({'x': [1]}), {'aggregates': 600})
+    cache.put('b', pd.DataFrame({'x': [2]}), {'aggregates': 600})
+
+    assert cache.get('a') is None
+    assert cache.get('b')['x'].tolist() == [2]
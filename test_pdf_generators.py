@@ -0,0 +1,39 @@
+from datetime import date
+
+import pytest
+
+import aggregates
+import data_loader
+import pdf_generators
+
+
+@pytest.fixture
+def empty_selection(fleet_data):
+    """Vehicle without any trip over the filtered days"""
+    return data_loader.apply_filter(fleet_data, ['BP 8718 RB'], date(2026, 1, 28), date(2026, 1, 29))
+
+
+def test_percent_of_zero_total_is_zero():
+    assert aggregates.percent(3, 4) == 75.0
+    assert aggregates.percent(0, 0) == 0.0
+
+
+@pytest.mark.parametrize('page', sorted(pdf_generators.PDF_GENERATORS))
+def test_generators_report_an_empty_selection(empty_selection, page):
+    content = pdf_generators.PDF_GENERATORS[page](empty_selection)
+
+    assert content == [{'title': 'Aucune donnée', 'text': pdf_generators.NO_DATA_MESSAGE}]
+
+
+def test_reports_build_on_an_empty_selection(empty_selection):
+    full = pdf_generators.generate_full_report(empty_selection)
+    structured = pdf_generators.generate_structured_report(empty_selection)
+
+    assert any(section['text'] == pdf_generators.NO_DATA_MESSAGE for section in full)
+    assert all(sections[0]['text'] == pdf_generators.NO_DATA_MESSAGE for sections in structured.values())
+
+
+def test_synthese_without_trips_on_the_selected_day(fleet_data):
+    for vehicle in data_loader.vehicle_choices(fleet_data):
+        for day in (date(2026, 1, 28), date(2026, 1, 29)):
+            pdf_generators.generate_synthese_pdf(data_loader.apply_filter(fleet_data, [vehicle], day, day))
@@ -0,0 +1,28 @@
+import logging
+import os
+
+import plotly.io as pio
+
+import render_pool
+
+
+def test_process_tree_rss_is_current_memory_or_unknown():
+    rss_mb = render_pool._process_tree_rss_mb(os.getpid())
+    if os.path.exists('/proc/self/status'):
+        assert 1 < rss_mb < 100_000
+    # Processus inexistant: aucune valeur inventée
+    assert render_pool._process_tree_rss_mb(2 ** 30) is None
+
+
+def test_configure_kaleido_logs_instead_of_failing(monkeypatch, caplog):
+    def no_browser(*args, **kwargs):
+        raise RuntimeError("Chrome introuvable")
+
+    monkeypatch.setattr(render_pool, '_kaleido_configured', False)
+    monkeypatch.setattr(pio, 'to_image', no_browser)
+    with caplog.at_level(logging.WARNING, logger='render_pool'):
+        render_pool.configure_kaleido()
+        render_pool.configure_kaleido()
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "Export des graphiques en image indisponible: Chrome introuvable"]
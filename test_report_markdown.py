@@ -0,0 +1,58 @@
+from report_markdown import inline_markup, parse_markdown
+
+SANCTIONS = """
+**Classification des Infractions:**
+- ✅ **Conforme**: Respect de la limite 50 km/h
+- 🔴 **Grave**: 81-100 km/h - Sanction majeure
+
+**Barème de Sanctions Recommandé:**
+| Catégorie | Sanction |
+|-----------|----------|
+| Légère | Avertissement verbal |
+| Très Grave | Suspension 1 mois |
+"""
+
+RECOMMANDATIONS = """
+### 📊 Synthèse
+Trajets de jour: 120 (80.0%)
+Trajets de nuit: 30 (20.0%)
+
+**Recommandations:**
+1. **Optimisation de la flotte**: Réévaluer l'affectation des véhicules
+2. **Suivi des infractions**: Mettre en place un suivi plus strict
+"""
+
+
+def test_bullets_paragraphs_and_table():
+    assert parse_markdown(SANCTIONS) == (
+        ('paragraph', ('**Classification des Infractions:**',)),
+        ('bullets', ('✅ **Conforme**: Respect de la limite 50 km/h', '🔴 **Grave**: 81-100 km/h - Sanction majeure')),
+        ('paragraph', ('**Barème de Sanctions Recommandé:**',)),
+        ('table', ('Catégorie', 'Sanction'), (('Légère', 'Avertissement verbal'), ('Très Grave', 'Suspension 1 mois'))),
+    )
+
+
+def test_heading_consecutive_lines_and_numbered_list():
+    assert parse_markdown(RECOMMANDATIONS) == (
+        ('heading', 3, '📊 Synthèse'),
+        ('paragraph', ('Trajets de jour: 120 (80.0%)', 'Trajets de nuit: 30 (20.0%)')),
+        ('paragraph', ('**Recommandations:**',)),
+        ('numbered', ("**Optimisation de la flotte**: Réévaluer l'affectation des véhicules",
+                      '**Suivi des infractions**: Mettre en place un suivi plus strict')),
+    )
+
+
+def test_indented_text_and_empty_text():
+    assert parse_markdown("    - un\n    - deux") == (('bullets', ('un', 'deux')),)
+    assert parse_markdown('') == ()
+    assert parse_markdown(None) == ()
+
+
+def test_inline_markup_escapes_before_adding_tags():
+    assert inline_markup('**Vitesse** > 100 km/h & *nuit*') == '<b>Vitesse</b> &gt; 100 km/h &amp; <i>nuit</i>'
+    assert inline_markup('<script>') == '&lt;script&gt;'
+
+
+def test_inline_markup_leaves_lone_asterisks():
+    assert inline_markup('2 * 3 * 4') == '2 * 3 * 4'
+    assert inline_markup("l'**Analyse**: *Top 15*") == "l'<b>Analyse</b>: <i>Top 15</i>"
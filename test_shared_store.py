@@ -0,0 +1,115 @@
+import gc
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+import memory_budget
+import shared_store
+
+
+def test_writes_to_a_view_leave_the_shared_upload_intact(fleet_data):
+    view = shared_store.read_only_view(fleet_data)
+    sheet_column = view['vitesse'].select_dtypes('number').columns[0]
+    trips_column = view.trips.select_dtypes('number').columns[0]
+    before = fleet_data['vitesse'][sheet_column].copy()
+    trips_before = fleet_data.trips[trips_column].copy()
+
+    view['vitesse'].loc[:, sheet_column] = -1
+    view.trips.loc[:, trips_column] = -1
+
+    assert fleet_data['vitesse'][sheet_column].equals(before)
+    assert fleet_data.trips[trips_column].equals(trips_before)
+    assert view.trips is not fleet_data.trips
+
+
+def test_shared_index_arrays_are_not_writable(fleet_data):
+    sheet_index = next(iter(shared_store.read_only_view(fleet_data).index.sheets.values()))
+
+    with pytest.raises(ValueError):
+        sheet_index.days[:] = np.int64(0)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Empty store with its own memory budget"""
+    monkeypatch.setattr(memory_budget, '_budget', memory_budget.MemoryBudget(1024 * 1024 * 1024))
+    return shared_store.SharedStore()
+
+
+def small_upload():
+    return data_loader.FleetData({'vitesse': pd.DataFrame({'Vitesse maxi': [52, 97]})},
+                                 trips=pd.DataFrame({'Kilométrage': [3.5, 12.0]}))
+
+
+def test_concurrent_acquires_load_once(store):
+    started, loads = threading.Event(), []
+
+    def load():
+        loads.append(1)
+        started.set()
+        time.sleep(0.05)
+        return small_upload()
+
+    leases = []
+    first = threading.Thread(target=lambda: leases.append(store.acquire('clé', load)))
+    first.start()
+    started.wait(5)
+    leases.append(store.acquire('clé', load))
+    first.join()
+
+    assert loads == [1]
+    assert store.metrics() == {'uploads': {'clé': 2}, 'loads': 1, 'hits': 1, 'evictions': 0}
+    assert leases[0].data is not leases[1].data
+
+
+def test_upload_is_freed_with_its_last_lease(store):
+    first = store.acquire('clé', small_upload)
+    second = store.acquire('clé', small_upload)
+
+    first.release()
+    first.release()
+    assert store.metrics()['uploads'] == {'clé': 1}
+    second.release()
+
+    assert store.metrics()['uploads'] == {}
+    assert memory_budget.get_budget().entries() == []
+
+
+def test_garbage_collected_lease_releases_the_upload(store):
+    lease = store.acquire('clé', small_upload)
+    assert [entry['name'] for entry in memory_budget.get_budget().entries()] == [('sheets', 'clé')]
+
+    del lease
+    gc.collect()
+
+    assert store.metrics()['uploads'] == {}
+    assert memory_budget.get_budget().entries() == []
+
+
+def test_budget_eviction_revokes_the_leases(store):
+    lease = store.acquire('clé', small_upload)
+
+    memory_budget.get_budget().clear('sheets')
+
+    assert lease.revoked and lease.data is None
+    assert store.metrics()['uploads'] == {}
+    # Le bail révoqué ne décompte plus rien sur l'upload rechargé
+    again = store.acquire('clé', small_upload)
+    lease.release()
+    assert store.metrics()['uploads'] == {'clé': 1} and store.metrics()['loads'] == 2
+    again.release()
+
+
+def test_failed_load_is_not_kept(store):
+    def broken():
+        raise ValueError("classeur illisible")
+
+    with pytest.raises(ValueError, match="illisible"):
+        store.acquire('clé', broken)
+
+    assert store.metrics()['uploads'] == {}
+    assert store.acquire('clé', small_upload).data['vitesse']['Vitesse maxi'].tolist() == [52, 97]
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import main
+import watcher
+
+
+def fake_build(excel_path, output_dir, formats=main.FORMATS, name=None):
+    """Copy the workbook bytes into one file per format (no Kaleido, no reportlab)"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for fmt in formats:
+        path = output_dir / f"{name}_Rapport_Complet.{fmt}"
+        path.write_bytes(Path(excel_path).read_bytes())
+        written.append(str(path))
+    return written
+
+
+def scan(folder, state, **kwargs):
+    return watcher.scan(folder, folder / 'rapports', state, folder / 'state.json', settle=0, **kwargs)
+
+
+def test_changed_workbook_keeps_the_reports_of_its_previous_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'build_reports', fake_build)
+    depot = tmp_path / 'depot'
+    depot.mkdir()
+    workbook = depot / 'semaine.xlsx'
+    state = watcher.load_state(tmp_path / 'state.json')
+
+    workbook.write_bytes(b'semaine 1')
+    [(_, first)] = scan(depot, state)
+    workbook.write_bytes(b'semaine 2, corrigee')
+    [(_, second)] = scan(depot, state)
+
+    assert first['outputs']['pdf'] != second['outputs']['pdf']
+    old_hash, new_hash = list(state['reports'])
+    old_reports = watcher.prebuilt_reports(old_hash, depot / 'state.json')
+    assert open(old_reports['pdf'], 'rb').read() == b'semaine 1'
+    assert open(watcher.prebuilt_reports(new_hash, depot / 'state.json')['pdf'], 'rb').read() == b'semaine 2, corrigee'
+    assert scan(depot, state) == []
+
+
+def test_failed_workbook_is_retried_after_the_delay(tmp_path, monkeypatch):
+    def broken_build(*args, **kwargs):
+        raise OSError("disque plein")
+
+    monkeypatch.setattr(main, 'build_reports', broken_build)
+    depot = tmp_path / 'depot'
+    depot.mkdir()
+    (depot / 'semaine.xlsx').write_bytes(b'semaine 1')
+    state = watcher.load_state(tmp_path / 'state.json')
+
+    [(_, failed)] = scan(depot, state)
+    assert failed['error'] == "disque plein"
+    assert scan(depot, state) == []
+
+    monkeypatch.setattr(main, 'build_reports', fake_build)
+    [(_, retried)] = scan(depot, state, retry_delay=0)
+    assert not retried.get('error') and set(retried['outputs']) == {'pdf', 'xlsx'}
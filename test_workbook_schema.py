@@ -0,0 +1,81 @@
+import io
+import pickle
+
+import openpyxl
+import pytest
+
+from data_loader import SHEET_NAMES
+from workbook_schema import REQUIRED_COLUMNS, SchemaError, match_sheet, validate_workbook
+
+
+def workbook(sheets):
+    """In-memory .xlsx with one header row per sheet ({sheet name: columns})"""
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for name, columns in sheets.items():
+        book.create_sheet(name).append(columns)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def complete_sheets():
+    return {SHEET_NAMES[key]: list(columns) for key, columns in REQUIRED_COLUMNS.items()}
+
+
+def test_schema_error_survives_pickling():
+    error = SchemaError(["RAPPORT: feuille 'Vitesse' manquante", "colonne 'Distance' manquante"])
+
+    restored = pickle.loads(pickle.dumps(error))
+
+    assert restored.problems == error.problems
+    assert str(restored) == "RAPPORT: feuille 'Vitesse' manquante; colonne 'Distance' manquante"
+
+
+def test_match_sheet_ignores_case_accents_and_punctuation():
+    assert match_sheet('Conduite en Journée', ['Notifications', 'CONDUITE EN JOURNEE']) == 'CONDUITE EN JOURNEE'
+
+
+def test_match_sheet_accepts_a_truncated_or_completed_name():
+    assert match_sheet('Temps passé dans POI et ...', ['Visites POI', 'Temps passé dans POI et visites']) \
+        == 'Temps passé dans POI et visites'
+    assert match_sheet('Trajets Non Autorisé', ['Trajets Non Autorisés (semaine)']) == 'Trajets Non Autorisés (semaine)'
+
+
+def test_match_sheet_accepts_a_close_spelling_only():
+    assert match_sheet('Vitesse de conduite', ['Vitese de conduite']) == 'Vitese de conduite'
+    assert match_sheet('Vitesse de conduite', ['Notifications', 'Visites POI']) is None
+
+
+def test_validate_workbook_accepts_the_sample(sample_workbook):
+    layout = validate_workbook(sample_workbook, SHEET_NAMES)
+
+    assert set(layout) == set(SHEET_NAMES)
+
+
+def test_validate_workbook_renames_columns_spelled_differently():
+    sheets = complete_sheets()
+    sheets['Notifications'] = ['regroupement', 'Nom de notification', 'HEURE DE DECLENCHEMENT']
+
+    layout = validate_workbook(workbook(sheets), SHEET_NAMES)
+
+    assert layout['notifications'] == ('Notifications', {'regroupement': 'Regroupement',
+                                                         'HEURE DE DECLENCHEMENT': 'Heure de déclenchement'})
+
+
+def test_validate_workbook_lists_missing_sheets_and_columns():
+    sheets = complete_sheets()
+    del sheets['Visites POI']
+    sheets['Vitesse de conduite'].remove('Vitesse maxi')
+
+    with pytest.raises(SchemaError) as error:
+        validate_workbook(workbook(sheets), SHEET_NAMES)
+
+    assert error.value.problems == ["feuille « Visites POI » introuvable",
+                                    "feuille « Vitesse de conduite »: colonne(s) manquante(s) Vitesse maxi"]
+
+
+def test_validate_workbook_rejects_a_file_that_is_not_a_workbook():
+    with pytest.raises(SchemaError, match="classeur Excel"):
+        validate_workbook(io.BytesIO(b'pas un classeur'), SHEET_NAMES)
@@ -0,0 +1,71 @@
+"""
+Reusable Streamlit widgets for the analysis pages
+"""
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+def paginated_dataframe(df, key, page_size=25, sort_by=None, ascending=False, search_columns=None,
+                        materialize=None):
+    """
+    Show a table one page at a time, with server-side search and sort
+
+    Search, sort and slicing run in Python on the aggregate already in memory;
+    only the visible page is sent to the browser grid.
+
+    Args:
+        df: Table to display (the index is not shown, reset it first if needed)
+        key: Unique widget key prefix
+        page_size: Rows per page
+        sort_by: Initial sort column (defaults to the first column)
+        ascending: Initial sort order
+        search_columns: Columns searched by the text box (defaults to the non-numeric ones)
+        materialize: Optional function turning the visible page of df into the frame
+            actually displayed (e.g. densifying a sparse table for these rows only)
+
+    Returns:
+        The searched and sorted table (all pages)
+    """
+    df = df.set_axis([str(column) for column in df.columns], axis=1)
+    columns = list(df.columns)
+    if search_columns is None:
+        search_columns = [column for column in columns if not pd.api.types.is_numeric_dtype(df[column])]
+
+    col_search, col_sort, col_order, col_page = st.columns([3, 2, 1, 1])
+    with col_search:
+        query = st.text_input("Rechercher", key=f"{key}_search", placeholder="Véhicule, lieu...")
+    with col_sort:
+        sort_column = st.selectbox("Trier par", columns,
+                                   index=columns.index(sort_by) if sort_by in columns else 0,
+                                   key=f"{key}_sort")
+    with col_order:
+        descending = st.toggle("Décroissant", value=not ascending, key=f"{key}_desc")
+
+    if query and search_columns:
+        mask = np.zeros(len(df), dtype=bool)
+        for column in search_columns:
+            mask |= df[column].astype(str).str.contains(query, case=False, regex=False, na=False).to_numpy()
+        df = df[mask]
+    df = df.sort_values(sort_column, ascending=not descending, kind='stable', na_position='last')
+
+    # Revenir à la dernière page si la recherche a réduit le nombre de pages
+    page_count = max(1, math.ceil(len(df) / page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    with col_page:
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key=page_key)
+
+    start = (page - 1) * page_size
+    visible = df.iloc[start:start + page_size]
+    if materialize is not None:
+        visible = materialize(visible)
+    st.dataframe(visible, use_container_width=True, hide_index=True)
+    if len(df):
+        st.caption(f"Lignes {start + 1}–{min(start + page_size, len(df))} sur {len(df)} · page {page}/{page_count}")
+    else:
+        st.caption("Aucune ligne ne correspond à la recherche.")
+    return df
@@ -0,0 +1,202 @@
+"""
+Watched-folder service: pre-builds the weekly reports as soon as they are dropped
+
+The GPS provider drops the "RAPPORT HEBDOMADAIRE" workbook into a shared folder
+every Monday. This service polls the folder and, for every new or changed
+workbook, builds the full PDF and the structured Excel report with
+main.build_reports, so they are ready before anyone opens the app.
+
+Ingestion is incremental. A JSON state file remembers the size, mtime and
+content hash of every workbook seen, and the reports built per upload content
+hash (data_loader.merged_hash, the key the app and the shared store use):
+
+- unchanged files are skipped without being read;
+- a renamed or copied workbook is recognized by its hash and not rebuilt;
+- a file modified less than --settle seconds ago (still being copied) waits
+  for the next scan;
+- the reports are named after the workbook and the start of its content hash,
+  so a new version dropped under the same name never overwrites the reports
+  of the previous one (still served for the previous upload);
+- a workbook that fails (wrong file, missing sheet) is recorded with its error
+  and retried after --retry-delay seconds (code fix, disk full) or as soon as
+  its content changes;
+- the state is rewritten after each workbook, so an interrupted run resumes
+  where it stopped.
+
+The app offers the pre-built files for an upload when WATCHER_STATE points to
+the state file (prebuilt_reports).
+
+Usage:
+    python watcher.py depot/ -o rapports/                  # scan every 60 s
+    python watcher.py depot/ -o rapports/ --once            # single scan (cron)
+    python watcher.py depot/ -o rapports/ --interval 300 --formats pdf
+    python watcher.py depot/ -o rapports/ --once --retry-delay 0   # réessaie les échecs
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import data_loader
+
+STATE_FILE = '.watcher_state.json'
+FORMATS = ('pdf', 'xlsx')
+RETRY_DELAY = 3600
+HASH_PREFIX = 12
+
+
+def load_state(state_path):
+    """State of a previous run ({'files': {...}, 'reports': {...}}), empty if there is none"""
+    try:
+        with open(state_path, encoding='utf-8') as source:
+            state = json.load(source)
+    except FileNotFoundError:
+        state = {}
+    state.setdefault('files', {})
+    state.setdefault('reports', {})
+    return state
+
+
+def save_state(state, state_path):
+    """Write the state atomically (a crash never leaves a truncated file)"""
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = state_path.with_name(state_path.name + '.tmp')
+    with open(temporary, 'w', encoding='utf-8') as target:
+        json.dump(state, target, ensure_ascii=False, indent=2)
+    os.replace(temporary, state_path)
+
+
+def _file_hash(path, stat, files):
+    """Content hash of a workbook, read only when its size or mtime changed since the last scan"""
+    known = files.get(path)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['hash']
+    digest = data_loader.content_hash(Path(path).read_bytes())
+    files[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+    return digest
+
+
+def _is_built(report, formats, retry_delay=RETRY_DELAY):
+    if report is None:
+        return False
+    if report.get('error'):
+        # Échec récent: pas de nouvel essai avant retry_delay secondes (ou un changement de contenu)
+        retry_after = datetime.fromisoformat(report['built_at']) + timedelta(seconds=retry_delay)
+        return datetime.now() < retry_after
+    return all(fmt in report['outputs'] and os.path.exists(report['outputs'][fmt]) for fmt in formats)
+
+
+def scan(folder, output_dir, state, state_path, formats=FORMATS, settle=10, retry_delay=RETRY_DELAY):
+    """
+    Build the reports of the new or changed workbooks of a folder
+
+    Args:
+        folder: Watched directory
+        output_dir: Directory where the reports are written
+        state: State dictionary (load_state), updated in place
+        state_path: Where the state is saved after each workbook
+        formats: Formats to produce ('pdf', 'xlsx')
+        settle: Seconds since the last modification before a file is read
+        retry_delay: Seconds before a failed workbook is built again
+
+    Returns:
+        List of (workbook path, report entry) built or failed during this scan
+    """
+    # Pile d'export (reportlab, xlsxwriter, kaleido) chargée seulement par le service, pas par l'app
+    from main import build_reports, collect_inputs
+
+    files, reports = state['files'], state['reports']
+    present = set()
+    processed = []
+    for path in collect_inputs([str(folder)]):
+        path = os.path.abspath(path)
+        present.add(path)
+        stat = os.stat(path)
+        if time.time() - stat.st_mtime < settle:
+            continue
+        key = data_loader.merged_hash([_file_hash(path, stat, files)])
+        if _is_built(reports.get(key), formats, retry_delay):
+            continue
+
+        report = {'source': path, 'built_at': datetime.now().isoformat(timespec='seconds'), 'outputs': {}}
+        try:
+            # Empreinte dans le nom: une nouvelle version du même fichier n'écrase pas les rapports de l'ancienne
+            name = f"{Path(path).stem}_{key[:HASH_PREFIX]}"
+            for written in build_reports(path, output_dir, formats, name=name):
+                report['outputs'][Path(written).suffix.lstrip('.')] = os.path.abspath(written)
+        except Exception as e:
+            report['error'] = str(e)
+        reports[key] = report
+        processed.append((path, report))
+        save_state(state, state_path)
+
+    # Fichiers retirés du dossier: on oublie leur signature, les rapports restent disponibles
+    for path in set(files) - present:
+        del files[path]
+    save_state(state, state_path)
+    return processed
+
+
+def prebuilt_reports(content_hash, state_path):
+    """
+    Pre-built reports of an upload
+
+    Args:
+        content_hash: FleetData.content_hash of the upload
+        state_path: State file of the watcher
+
+    Returns:
+        Dictionary format ('pdf', 'xlsx') -> path of the existing files (empty if none)
+    """
+    report = load_state(state_path)['reports'].get(content_hash)
+    if not report or report.get('error'):
+        return {}
+    return {fmt: path for fmt, path in report['outputs'].items() if os.path.exists(path)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Surveille un dossier et pré-génère les rapports hebdomadaires (PDF/Excel) des nouveaux fichiers."
+    )
+    parser.add_argument('folder', help="Dossier surveillé (dépôt des fichiers XLSX)")
+    parser.add_argument('-o', '--output-dir', default='rapports', help="Dossier de sortie (défaut: rapports)")
+    parser.add_argument('--state', help=f"Fichier d'état (défaut: <dossier de sortie>/{STATE_FILE})")
+    parser.add_argument('--interval', type=float, default=60, help="Secondes entre deux passages (défaut: 60)")
+    parser.add_argument('--settle', type=float, default=10,
+                        help="Secondes sans modification avant de lire un fichier (défaut: 10)")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS),
+                        help="Formats à produire (défaut: pdf xlsx)")
+    parser.add_argument('--retry-delay', type=float, default=RETRY_DELAY,
+                        help=f"Secondes avant de réessayer un fichier en échec (défaut: {RETRY_DELAY})")
+    parser.add_argument('--once', action='store_true', help="Un seul passage puis arrêt (cron)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"dossier introuvable: {args.folder}")
+    # Service à un seul processus: Kaleido reste chaud dans le processus, pas de pool de renderers
+    os.environ.setdefault('RENDER_POOL_SIZE', '0')
+    state_path = args.state or os.path.join(args.output_dir, STATE_FILE)
+    state = load_state(state_path)
+
+    try:
+        while True:
+            for path, report in scan(args.folder, args.output_dir, state, state_path, args.formats, args.settle,
+                                     args.retry_delay):
+                if report.get('error'):
+                    print(f"❌ {path}: {report['error']}", file=sys.stderr)
+                else:
+                    for output in report['outputs'].values():
+                        print(f"✅ {output}")
+            if args.once:
+                return 0
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
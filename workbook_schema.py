@@ -0,0 +1,217 @@
+"""
+Pre-flight validation of an uploaded workbook, before any sheet is parsed
+
+An .xlsx file is a zip of XML parts. Only the small ones are read here: the
+sheet list (xl/workbook.xml and its relationships), the first row of each
+worksheet (streamed, parsing stops at the end of the row) and the shared
+strings it references. A wrong or renamed file is therefore rejected in
+milliseconds instead of after pandas has parsed the earlier sheets.
+
+Sheets are matched on a normalized name (case, accents and punctuation
+ignored), then by prefix (the export truncates long names: "Temps passé dans
+POI et ..."), then by close spelling. Columns are matched on the same
+normalized form and renamed to the expected spelling after parsing.
+"""
+import difflib
+import posixpath
+import re
+import unicodedata
+import zipfile
+import xml.etree.ElementTree as ET
+
+_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_TRIP_COLUMNS = ['Regroupement', 'Début', 'Emplacement initial', 'Fin', "Lieu d'arrivée",
+                 'Durée', 'Kilométrage', 'Vitesse maxi']
+
+# Colonnes lues par les pages et les exports, par feuille
+REQUIRED_COLUMNS = {
+    'duree_distance': ['Regroupement', 'Début', 'Distance Parcourue'],
+    'trajets_non_autorises': _TRIP_COLUMNS,
+    'conduite_journee': _TRIP_COLUMNS,
+    'conduite_nocturne': _TRIP_COLUMNS,
+    'notifications': ['Regroupement', 'Nom de notification', 'Heure de déclenchement'],
+    'temps_poi': ['Regroupement', "Heure d'entrée", 'Visites'],
+    'visites_poi': ['Regroupement', "Heure d'entrée", 'Visites'],
+    'vitesse': ['Regroupement', 'Emplacement initial', "Lieu d'arrivée", 'Vitesse maxi'],
+}
+
+
+class SchemaError(ValueError):
+    """
+    The workbook does not have the expected sheets or columns
+
+    Attributes:
+        problems: List of human-readable problems (one per missing sheet/column)
+    """
+
+    def __init__(self, problems):
+        self.problems = list(problems)
+        # problems reste dans args: pickle (ProcessPoolExecutor) rappelle SchemaError(*args)
+        super().__init__(self.problems)
+
+    def __str__(self):
+        return "; ".join(self.problems)
+
+
+def normalize(name):
+    """Comparison form of a sheet or column name: no accents, case, punctuation or extra spaces"""
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', text).split())
+
+
+def _column_number(reference):
+    """Zero-based column of a cell reference ("C1" -> 2)"""
+    number = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        number = number * 26 + ord(char.upper()) - 64
+    return number - 1
+
+
+def _first_row(archive, part):
+    """Cells of the first row of a worksheet part as {column: (type, raw value)}"""
+    cells = {}
+    with archive.open(part) as stream:
+        for event, element in ET.iterparse(stream, events=('end',)):
+            if element.tag == f'{_MAIN}c':
+                kind = element.get('t', 'n')
+                if kind == 'inlineStr':
+                    value = ''.join(text.text or '' for text in element.iter(f'{_MAIN}t'))
+                else:
+                    node = element.find(f'{_MAIN}v')
+                    value = node.text if node is not None else None
+                cells[_column_number(element.get('r', ''))] = (kind, value)
+            elif element.tag == f'{_MAIN}row':
+                break
+    return cells
+
+
+def _shared_strings(archive, needed):
+    """Shared strings of the given indexes (the table is read up to the largest one only)"""
+    strings = {}
+    if not needed or 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    last = max(needed)
+    position = 0
+    with archive.open('xl/sharedStrings.xml') as stream:
+        for event, element in ET.iterparse(stream, events=('end',)):
+            if element.tag != f'{_MAIN}si':
+                continue
+            if position in needed:
+                strings[position] = ''.join(text.text or '' for text in element.iter(f'{_MAIN}t'))
+            element.clear()
+            position += 1
+            if position > last:
+                break
+    return strings
+
+
+def read_headers(source):
+    """
+    Header row of every sheet of a workbook, without parsing the data
+
+    Args:
+        source: Path or binary file-like object of an .xlsx file
+
+    Returns:
+        Dictionary sheet name -> list of header strings, in workbook order
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise SchemaError(["le fichier n'est pas un classeur Excel (.xlsx) valide"])
+    with archive:
+        try:
+            workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+            relations = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        except KeyError:
+            raise SchemaError(["le fichier n'est pas un classeur Excel (.xlsx) valide"])
+        targets = {relation.get('Id'): relation.get('Target')
+                   for relation in relations.iter(f'{_PACKAGE_REL}Relationship')}
+
+        rows = {}
+        for sheet in workbook.iter(f'{_MAIN}sheet'):
+            target = targets.get(sheet.get(f'{_REL}id'), '')
+            part = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            rows[sheet.get('name')] = _first_row(archive, part) if part in archive.namelist() else {}
+
+        needed = {int(value) for cells in rows.values() for kind, value in cells.values() if kind == 's' and value}
+        strings = _shared_strings(archive, needed)
+
+    headers = {}
+    for name, cells in rows.items():
+        width = max(cells) + 1 if cells else 0
+        header = [''] * width
+        for column, (kind, value) in cells.items():
+            header[column] = strings.get(int(value), '') if kind == 's' and value else (value or '')
+        headers[name] = header
+    return headers
+
+
+def match_sheet(expected, available):
+    """
+    Actual sheet name matching an expected one (None if nothing is close enough)
+
+    Args:
+        expected: Sheet name used by the application
+        available: Sheet names of the workbook not matched yet
+    """
+    target = normalize(expected)
+    normalized = {normalize(name): name for name in available}
+    if target in normalized:
+        return normalized[target]
+    # Noms tronqués par l'export ("... et ...") ou complétés dans une autre version
+    prefixes = [name for key, name in normalized.items()
+                if key.startswith(target) or (len(key) * 2 >= len(target) and target.startswith(key))]
+    if len(prefixes) == 1:
+        return prefixes[0]
+    close = difflib.get_close_matches(target, list(normalized), n=1, cutoff=0.8)
+    return normalized[close[0]] if close else None
+
+
+def validate_workbook(source, sheet_names, required_columns=REQUIRED_COLUMNS):
+    """
+    Check that a workbook has the expected sheets and columns
+
+    Args:
+        source: Path or binary file-like object of an .xlsx file
+        sheet_names: Dictionary key -> expected sheet name (data_loader.SHEET_NAMES)
+        required_columns: Dictionary key -> columns the application reads
+
+    Returns:
+        Dictionary key -> (actual sheet name, {actual column: expected column}
+        renames for the columns spelled differently)
+
+    Raises:
+        SchemaError: listing every missing sheet and column
+    """
+    headers = read_headers(source)
+    available = list(headers)
+    layout, problems = {}, []
+    for key, expected in sheet_names.items():
+        sheet = match_sheet(expected, available)
+        if sheet is None:
+            problems.append(f"feuille « {expected} » introuvable")
+            continue
+        available.remove(sheet)
+
+        columns = {normalize(column): column for column in headers[sheet] if column}
+        renames, missing = {}, []
+        for column in required_columns.get(key, []):
+            actual = columns.get(normalize(column))
+            if actual is None:
+                missing.append(column)
+            elif actual != column:
+                renames[actual] = column
+        if missing:
+            problems.append(f"feuille « {sheet} »: colonne(s) manquante(s) {', '.join(missing)}")
+        layout[key] = (sheet, renames)
+
+    if problems:
+        raise SchemaError(problems)
+    return layout